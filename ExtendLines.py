@@ -2,54 +2,27 @@ import os
 from typing import Dict, List
 import typing
 import arcpy
+import numpy as np
 from arcpy import Parameter
 from arcpy import ValueTable
-from math import hypot
-import collections
-from operator import add
+from feature_table_arcpy import read_features, update_geometries
+from line_extension import extend_lines
+from linear_units import to_spatial_reference_units
+from stage_metrics import StageRecorder
+from tool_parameters import TOOLS
 
 
 class ExtendLines(object):
     def __init__(self):
         """Define the tool (tool name is the name of the class)."""
-        self.label = "Extend Lines"
-        self.description = "Extends input lines by a specified distance. Distances can be positive or negative."
+        info = TOOLS["ExtendLines"]
+        self.label = info.label
+        self.description = info.description
         self.canRunInBackground = False
 
     def getParameterInfo(self):
         """Define parameter definitions"""
-
-        paramPolylineLayer = arcpy.Parameter(
-            displayName="Polyline Layer (modified by this tool)",
-            name="INPUT_POLYLINE_LAYER",
-            datatype="GPFeatureLayer",
-            parameterType="Required",
-            direction="Input",
-        )
-
-        paramDistance = arcpy.Parameter(
-            displayName="Distance To Extend Line",
-            name="INPUT_LINE_EXTEND_DISTANCE",
-            datatype="GPLinearUnit",
-            parameterType="Required",
-            direction="Input",
-        )
-
-        paramBothDirections = arcpy.Parameter(
-            displayName="Extend in Both Directions",
-            name="INPUT_EXTEND_BOTH_DIRECTIONS",
-            datatype="GPBoolean",
-            parameterType="Required",
-            direction="Input",
-        )
-        paramBothDirections.value = False
-
-        params = [
-            paramPolylineLayer,
-            paramDistance,
-            paramBothDirections,
-        ]
-        return params
+        return TOOLS["ExtendLines"].parameter_info()
 
     def isLicensed(self):
         """Set whether tool is licensed to execute."""
@@ -59,6 +32,11 @@ class ExtendLines(object):
         """Modify the values and properties of parameters before internal
         validation is performed.  This method is called whenever a parameter
         has been changed."""
+
+        # a separate start distance only applies when both ends are extended;
+        # when it is left empty the start uses the same distance as the end
+        parameters[3].enabled = bool(parameters[2].value)
+
         return
 
     def updateMessages(self, parameters: List[Parameter]):
@@ -77,88 +55,111 @@ class ExtendLines(object):
             if elem.altered:
                 params[elem.name] = elem.valueAsText
 
+        # every stage reports its time, row counts and memory use
+        recorder = StageRecorder(
+            type(self).__name__,
+            arcpy.AddMessage,
+            lambda dataset: int(arcpy.management.GetCount(dataset)[0]),
+        )
+
+        # the run report is written also when the run fails
+        try:
+            self.extend_layer(params, recorder)
+        finally:
+            if params.get("OUTPUT_RUN_REPORT"):
+                recorder.write_report(params.get("OUTPUT_RUN_REPORT"))
+
+    def extend_layer(self, params: Dict[str, str], recorder: StageRecorder):
+        """Extend the lines of the input layer in place."""
         # adapted from https://gis.stackexchange.com/questions/71645/extending-line-by-specified-distance-in-arcgis-for-desktop
 
         layer = params.get("INPUT_POLYLINE_LAYER")
-        extend_distance = params.get("INPUT_LINE_EXTEND_DISTANCE")
-        extend_both_directions = params.get("INPUT_EXTEND_BOTH_DIRECTIONS")
-
-        distance = float(extend_distance.split()[0])
-        unit = extend_distance.split()[1]
-
-        linearUnit = arcpy.Describe(layer).spatialReference.linearUnitName
-
-        if linearUnit == "Foot_US" and unit == "Meters":
-            distance *= 3.2808399
-        elif linearUnit == "Meter" and unit == "Feet":
-            distance *= 0.3048006096012192
-
-        # Computes new coordinates x3,y3 at a specified distance
-        # along the prolongation of the line from x1,y1 to x2,y2
-        def newcoord(coords, dist):
-            (x1, y1), (x2, y2) = coords
-            dx = x2 - x1
-            dy = y2 - y1
-            linelen = hypot(dx, dy)
-
-            x3 = x2 + dx / linelen * dist
-            y3 = y2 + dy / linelen * dist
-            return x3, y3
-
-        # accumulate([1,2,3,4,5]) --> 1 3 6 10 15
-        # Equivalent to itertools.accumulate() which isn't present in Python 2.7
-        def accumulate(iterable):
-            it = iter(iterable)
-            total = next(it)
-            yield total
-            for element in it:
-                total = add(total, element)
-                yield total
-
-        def extend_line(input_layer):
-            # OID is needed to determine how to break up flat list of data by feature.
-            coordinates = [
-                [row[0], row[1]]
-                for row in arcpy.da.SearchCursor(
-                    input_layer, ["OID@", "SHAPE@XY"], explode_to_points=True
+        extend_both_directions = params.get("INPUT_EXTEND_BOTH_DIRECTIONS") == "true"
+
+        description = arcpy.Describe(layer)
+        spatial_reference = description.spatialReference
+        if spatial_reference.type != "Projected":
+            arcpy.AddError(
+                "   ❌ The polyline layer must use a projected coordinate system"
+            )
+            raise arcpy.ExecuteError
+
+        meters_per_unit = spatial_reference.metersPerUnit
+        fixed_distance = to_spatial_reference_units(
+            params.get("INPUT_LINE_EXTEND_DISTANCE"), meters_per_unit
+        )
+        fixed_start_distance = (
+            to_spatial_reference_units(
+                params.get("INPUT_LINE_START_EXTEND_DISTANCE"), meters_per_unit
+            )
+            if params.get("INPUT_LINE_START_EXTEND_DISTANCE")
+            else None
+        )
+
+        # values in the distance field use the unit of the fixed distance,
+        # which is also used for features where the field is null
+        distance_field = params.get("INPUT_LINE_EXTEND_DISTANCE_FIELD")
+        field_unit = params.get("INPUT_LINE_EXTEND_DISTANCE").split()[1]
+        field_factor = to_spatial_reference_units(f"1 {field_unit}", meters_per_unit)
+
+        def oid_batches() -> typing.Iterator[typing.Optional[str]]:
+            batch_size = int(params.get("INPUT_BATCH_SIZE") or 0)
+            if batch_size <= 0:
+                yield None
+                return
+
+            # the batches split the OIDs that exist (8 bytes per feature), so
+            # gaps left by edits and appends do not produce empty batches
+            with arcpy.da.SearchCursor(layer, ["OID@"]) as rows:
+                oids = np.fromiter((oid for (oid,) in rows), dtype=np.int64)
+            if not oids.size:
+                return
+            oids.sort()
+
+            oid_field = arcpy.AddFieldDelimiters(layer, description.OIDFieldName)
+            lowers = oids[::batch_size].tolist()
+            for lower, upper in zip(lowers, lowers[1:] + [None]):
+                yield (
+                    f"{oid_field} >= {lower} AND {oid_field} < {upper}"
+                    if upper is not None
+                    else f"{oid_field} >= {lower}"
                 )
-            ]
-
-            oid, vert = zip(*coordinates)
-
-            # Construct list of numbers that mark the start of a new feature class.
-            # This is created by counting OIDS and then accumulating the values.
-            vertcounts = list(accumulate(collections.Counter(oid).values()))
-
-            # Grab the last two vertices of each feature
-            lastpoint = [
-                point
-                for x, point in enumerate(vert)
-                if x + 1 in vertcounts or x + 2 in vertcounts
-            ]
-
-            # Convert flat list of tuples to list of lists of tuples.
-            # Obtain list of tuples of new end coordinates.
-            newvert = [newcoord(y, distance) for y in zip(*[iter(lastpoint)] * 2)]
-
-            j = 0
-            with arcpy.da.UpdateCursor(
-                input_layer, "SHAPE@XY", explode_to_points=True
-            ) as rows:
-                for i, row in enumerate(rows):
-                    if i + 1 in vertcounts:
-                        row[0] = newvert[j]
-                        j += 1
-                        rows.updateRow(row)
-
-        extend_line(layer)
-
-        if extend_both_directions:
-            arcpy.FlipLine_edit(layer)
-            extend_line(layer)
-            arcpy.FlipLine_edit(layer)
 
-        return
+        # each batch is read into a feature table, extended in one vectorized
+        # pass and only the extended features are written back, so peak
+        # memory does not grow with the size of the layer
+        with recorder.stage("Extend lines") as stage:
+            skipped = 0
+            extended_count = 0
+            for where_clause in oid_batches():
+                table = read_features(
+                    layer, [distance_field] if distance_field else [], where_clause
+                )
+                end_distance = np.full(table.feature_count, fixed_distance)
+                if distance_field:
+                    # null values fall back to the fixed distance
+                    values = np.array(
+                        table.columns[distance_field].tolist(), dtype=np.float64
+                    )
+                    has_value = ~np.isnan(values)
+                    end_distance[has_value] = values[has_value] * field_factor
+                start_distance = (
+                    fixed_start_distance
+                    if fixed_start_distance is not None
+                    else end_distance
+                )
+
+                table, extended = extend_lines(
+                    table, start_distance, end_distance, extend_both_directions
+                )
+                extended_count += update_geometries(
+                    layer, table, extended, where_clause
+                )
+                skipped += table.feature_count - int(extended.sum())
+            stage.rows_in, stage.rows_out = extended_count + skipped, extended_count
+
+        if skipped:
+            arcpy.AddWarning(f"   ⚠️ Skipped {skipped} degenerate feature(s)")
 
     def postExecute(self, parameters: List[Parameter]):
         """This method takes place after outputs are processed and
@@ -1,46 +1,66 @@
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Dict, List
 import typing
 import arcpy
+import numpy as np
 from arcpy import Parameter
 from arcpy import ValueTable
+from attribute_aggregation import AttributeAggregator, text_lengths
+from change_detection import content_hash, diff_hashes, regroup_scope
+from feature_table_arcpy import geometry, read_features
+from geometry_io import to_wkb
+from linear_units import to_spatial_reference_units
+from intermediate_workspace import IntermediateWorkspace
+from partitioning import balanced_batches, spawn_context
+from stage_metrics import StageRecorder
+from tool_parameters import TOOLS
+from trail_network import connected_groups, features_near
+
+# fields from the Rails to Trails OpenTrails data that are not carried over
+# to the merged trails
+EXCLUDED_FIELDS = [
+    "ACCT_ID",
+    "ACCT_TYPE",
+    "ACCT_CLASS",
+    "ACCT_CAT",
+    "Length_DMS",
+    "FY",
+    "DateAdded",
+    "DateUpdated",
+    "STATUS",
+]
+
+# rough number of bytes the intermediate datasets need per input vertex
+INTERMEDIATE_BYTES_PER_VERTEX = 1024
+
+# arcpy.Describe field types -> AddField field types
+FIELD_TYPES = {
+    "String": "TEXT",
+    "SmallInteger": "SHORT",
+    "Integer": "LONG",
+    "BigInteger": "BIGINTEGER",
+    "Single": "FLOAT",
+    "Double": "DOUBLE",
+    "Date": "DATE",
+    "DateOnly": "DATEONLY",
+    "TimeOnly": "TIMEONLY",
+    "TimestampOffset": "TIMESTAMPOFFSET",
+    "GUID": "GUID",
+}
 
 
 class MergeConnectingTrails(object):
     def __init__(self):
         """Define the tool (tool name is the name of the class)."""
-        self.label = (
-            "Merge Connecting Trails (Designed for Rails to Trails OpenTrails Data)"
-        )
-        self.description = "Merges trails from the Rails to Trails Conservancy's OpenTrails data that are next to each other but not seen as a single multipart line. This tool currently is hardcoded to work with the Rails to Trails OpenTrails dataset and may need to be expanded to support generic line inputs."
+        info = TOOLS["MergeConnectingTrails"]
+        self.label = info.label
+        self.description = info.description
         self.canRunInBackground = False
 
     def getParameterInfo(self):
         """Define parameter definitions"""
-
-        paramInput = arcpy.Parameter(
-            displayName="Census Polygons",
-            name="INPUT",
-            datatype="GPFeatureLayer",
-            parameterType="Required",
-            direction="Input",
-        )
-
-        paramOutput = arcpy.Parameter(
-            displayName="Census Data",
-            name="OUTPUT",
-            datatype="GPFeatureLayer",
-            multiValue=True,
-            parameterType="Required",
-            direction="Output",
-        )
-        paramOutput.parameterDependencies = [paramInput.name]
-
-        params = [
-            paramInput,
-            paramOutput,
-        ]
-        return params
+        return TOOLS["MergeConnectingTrails"].parameter_info()
 
     def isLicensed(self):
         """Set whether tool is licensed to execute."""
@@ -50,11 +70,38 @@ class MergeConnectingTrails(object):
         """Modify the values and properties of parameters before internal
         validation is performed.  This method is called whenever a parameter
         has been changed."""
+
+        # the snap tolerance and incremental updates are only supported by
+        # the endpoint graph method
+        parameters[3].enabled = parameters[2].valueAsText == "ENDPOINT_GRAPH"
+        parameters[7].enabled = parameters[2].valueAsText == "ENDPOINT_GRAPH"
+        parameters[8].enabled = parameters[2].valueAsText == "ENDPOINT_GRAPH" and bool(
+            parameters[7].value
+        )
+
+        # only the centerline method creates (parallel) intermediates
+        parameters[4].enabled = parameters[2].valueAsText == "CENTERLINE"
+        parameters[5].enabled = parameters[2].valueAsText == "CENTERLINE"
+
         return
 
     def updateMessages(self, parameters: List[Parameter]):
         """Modify the messages created by internal validation for each tool
         parameter.  This method is called after internal validation."""
+
+        # PolygonToCenterline belongs to the Topographic Production toolbox;
+        # CENTERLINE always ran without checking for the extension, so a
+        # missing extension only points out the alternative
+        if (
+            parameters[2].valueAsText == "CENTERLINE"
+            and arcpy.CheckExtension("Foundation") != "Available"
+        ):
+            parameters[2].setWarningMessage(
+                "The CENTERLINE method uses Polygon To Centerline, which may "
+                "require the ArcGIS Topographic Production extension. Use "
+                "ENDPOINT_GRAPH if the centerline stage fails."
+            )
+
         return
 
     def execute(self, parameters: List[Parameter], messages):
@@ -68,153 +115,695 @@ class MergeConnectingTrails(object):
             if elem.altered:
                 params[elem.name] = elem.valueAsText
 
-        arcpy.analysis.Buffer(
-            params.get("INPUT"), "SC_T_Buffer", "2 Meters", "FULL", "ROUND"
+        # every stage reports its time, row counts and memory use
+        recorder = StageRecorder(
+            type(self).__name__,
+            arcpy.AddMessage,
+            lambda dataset: int(arcpy.management.GetCount(dataset)[0]),
         )
 
-        arcpy.management.Dissolve(
-            "SC_T_Buffer",
-            "SC_T_Buffer__Dissolve",
-            "",
-            "",
-            "SINGLE_PART",
-            "DISSOLVE_LINES",
-        )
+        # the run report is written also when the run fails
+        try:
+            if params.get("MERGE_METHOD") == "ENDPOINT_GRAPH":
+                self.merge_by_endpoints(params, recorder)
+            else:
+                self.merge_by_centerlines(params, recorder)
+        finally:
+            if params.get("OUTPUT_RUN_REPORT"):
+                recorder.write_report(params.get("OUTPUT_RUN_REPORT"))
 
-        arcpy.management.AddField("SC_T_Buffer__Dissolve", "BUFFERID", "LONG")
-        arcpy.management.CalculateField(
-            "SC_T_Buffer__Dissolve", "BUFFERID", "!OBJECTID!"
-        )
+    def merge_by_centerlines(self, params: Dict[str, str], recorder: StageRecorder):
+        """Merge trails by buffering them and creating centerlines of the
+        buffers (the CENTERLINE method)."""
+        # in AUTO mode, estimate the size of the intermediates from the number
+        # of trail vertices; each stage keeps roughly one buffered copy of the
+        # trails (the other modes do not need the estimate)
+        workspace_mode = params.get("INTERMEDIATE_WORKSPACE") or "AUTO"
+        vertex_count = 0
+        if workspace_mode == "AUTO":
+            with arcpy.da.SearchCursor(params.get("INPUT"), ["SHAPE@"]) as rows:
+                for (shape,) in rows:
+                    vertex_count += shape.pointCount if shape else 0
 
-        # create a new fieldmappings
-        fieldmappings = arcpy.FieldMappings()
-
-        # add the BUFFERID field
-        BUFFERID_field_map = arcpy.FieldMap()
-        BUFFERID_field_map.addInputField("SC_T_Buffer__Dissolve", "BUFFERID")
-        fieldmappings.addFieldMap(BUFFERID_field_map)
-
-        # add the trails input feature classes
-        fieldmappings.addTable(params.get("INPUT"))
-
-        # delete
-        if fieldmappings.findFieldMapIndex("ACCT_ID") >= 0:
-            fieldmappings.removeFieldMap(fieldmappings.findFieldMapIndex("ACCT_ID"))
-        if fieldmappings.findFieldMapIndex("ACCT_TYPE") >= 0:
-            fieldmappings.removeFieldMap(fieldmappings.findFieldMapIndex("ACCT_TYPE"))
-        if fieldmappings.findFieldMapIndex("ACCT_CLASS") >= 0:
-            fieldmappings.removeFieldMap(fieldmappings.findFieldMapIndex("ACCT_CLASS"))
-        if fieldmappings.findFieldMapIndex("ACCT_CAT") >= 0:
-            fieldmappings.removeFieldMap(fieldmappings.findFieldMapIndex("ACCT_CAT"))
-        if fieldmappings.findFieldMapIndex("Length_DMS") >= 0:
-            fieldmappings.removeFieldMap(fieldmappings.findFieldMapIndex("Length_DMS"))
-        if fieldmappings.findFieldMapIndex("FY") >= 0:
-            fieldmappings.removeFieldMap(fieldmappings.findFieldMapIndex("FY"))
-        if fieldmappings.findFieldMapIndex("DateAdded") >= 0:
-            fieldmappings.removeFieldMap(fieldmappings.findFieldMapIndex("DateAdded"))
-        if fieldmappings.findFieldMapIndex("DateUpdated") >= 0:
-            fieldmappings.removeFieldMap(fieldmappings.findFieldMapIndex("DateUpdated"))
-        if fieldmappings.findFieldMapIndex("STATUS") >= 0:
-            fieldmappings.removeFieldMap(fieldmappings.findFieldMapIndex("STATUS"))
-
-        for _fieldmap in fieldmappings:
-            if _fieldmap.outputField.type == "String":
-                index = fieldmappings.findFieldMapIndex(_fieldmap.outputField.name)
-                fieldmap = fieldmappings.getFieldMap(index)
-
-                fieldmap.mergeRule = "Join"
-                fieldmap.joinDelimiter = ", "
-
-                outputField = fieldmap.outputField
-                outputField.length = 9999
-                fieldmap.outputField = outputField
-
-                fieldmappings.replaceFieldMap(index, fieldmap)
-
-        arcpy.analysis.SpatialJoin(
-            "SC_T_Buffer__Dissolve",
-            params.get("INPUT"),
-            "SC_T_B",
-            "JOIN_ONE_TO_ONE",
-            "KEEP_ALL",
-            fieldmappings,
-        )
+        with IntermediateWorkspace(
+            workspace_mode,
+            estimated_bytes=vertex_count * INTERMEDIATE_BYTES_PER_VERTEX,
+        ) as workspace:
+            arcpy.AddMessage(f"⏳ Using {workspace.mode} intermediate workspace...")
+            buffer = workspace.dataset("SC_T_Buffer")
+            dissolved = workspace.dataset("SC_T_Buffer__Dissolve")
 
-        arcpy.topographic.PolygonToCenterline(
-            in_features="SC_T_B",
-            out_feature_class="SC_T_B__Centerline_Original",
-            connecting_features=None,
-        )
+            with workspace.stage("Buffer"), recorder.stage(
+                "Buffer", [params.get("INPUT")], [buffer]
+            ):
+                arcpy.analysis.Buffer(
+                    params.get("INPUT"), buffer, "2 Meters", "FULL", "ROUND"
+                )
 
-        arcpy.analysis.SpatialJoin(
-            target_features="SC_T_B__Centerline_Original",
-            join_features="SC_T_B",
-            out_feature_class="SC_T_B__Centerline_BUFFERID",
-            join_operation="JOIN_ONE_TO_MANY",
-            join_type="KEEP_ALL",
-            field_mapping='BUFFERID "BUFFERID" true true false 255 Text 0 0,First,#,SC_T_B,BUFFERID,-1,-1',
-            match_option="INTERSECT",
-            search_radius=None,
-            distance_field_name="",
-        )
+            with workspace.stage("Dissolve"), recorder.stage(
+                "Dissolve", [buffer], [dissolved]
+            ):
+                arcpy.management.Dissolve(
+                    buffer,
+                    dissolved,
+                    "",
+                    "",
+                    "SINGLE_PART",
+                    "DISSOLVE_LINES",
+                )
 
-        arcpy.analysis.PairwiseDissolve(
-            in_features="SC_T_B__Centerline_BUFFERID",
-            out_feature_class="SC_T_B__Centerline_Dissolved",
-            dissolve_field="BUFFERID",
-            statistics_fields=None,
-            multi_part="MULTI_PART",
-        )
+                arcpy.management.AddField(dissolved, "BUFFERID", "LONG")
+                arcpy.management.CalculateField(dissolved, "BUFFERID", "!OBJECTID!")
 
-        arcpy.analysis.SpatialJoin(
-            target_features="SC_T_B__Centerline_Dissolved",
-            join_features="SC_T_B",
-            out_feature_class=params.get("OUTPUT"),
-            join_operation="JOIN_ONE_TO_ONE",
-            join_type="KEEP_ALL",
-            field_mapping='BUFFERID "BUFFERID" true true false 255 Text 0 0,First,#,SC_T_B__Centerline_Dissolved,BUFFERID,0,255;SHAPE_Length "SHAPE_Length" false true true 8 Double 0 0,First,#,SC_T_B__Centerline_Dissolved,SHAPE_Length,-1,-1;Join_Count "Join_Count" true true false 4 Long 0 0,First,#,SC_T_B,Join_Count,-1,-1;TARGET_FID "TARGET_FID" true true false 4 Long 0 0,First,#,SC_T_B,TARGET_FID,-1,-1;BUFFERID_1 "BUFFERID" true true false 4 Long 0 0,First,#,SC_T_B,BUFFERID,-1,-1;SOURCE "SOURCE" true true false 9999 Text 0 0,First,#,SC_T_B,SOURCE,0,9999;QC "QC" true true false 9999 Text 0 0,First,#,SC_T_B,QC,0,9999;TRAIL_NAME "TRAIL_NAME" true true false 9999 Text 0 0,First,#,SC_T_B,TRAIL_NAME,0,9999;STATE "STATE" true true false 9999 Text 0 0,First,#,SC_T_B,STATE,0,9999;COUNTY "COUNTY" true true false 9999 Text 0 0,First,#,SC_T_B,COUNTY,0,9999;ORIG_FID "ORIG_FID" true true false 4 Long 0 0,First,#,SC_T_B,ORIG_FID,-1,-1;Shape_Length_1 "Shape_Length" false true true 8 Double 0 0,First,#,SC_T_B,Shape_Length,-1,-1;Shape_Area "Shape_Area" false true true 8 Double 0 0,First,#,SC_T_B,Shape_Area,-1,-1',
-            match_option="INTERSECT",
-            search_radius=None,
-        )
+            trail_buffers = workspace.dataset("SC_T_TrailBUFFERID")
+            with workspace.stage("Trail BUFFERIDs"), recorder.stage(
+                "Trail BUFFERIDs", [params.get("INPUT")], [trail_buffers]
+            ):
+                arcpy.analysis.SpatialJoin(
+                    target_features=params.get("INPUT"),
+                    join_features=dissolved,
+                    out_feature_class=trail_buffers,
+                    join_operation="JOIN_ONE_TO_ONE",
+                    join_type="KEEP_ALL",
+                    field_mapping=single_field_mapping(dissolved, "BUFFERID"),
+                    match_option="INTERSECT",
+                )
 
-        arcpy.management.Delete("SC_T_Buffer")
-        arcpy.management.Delete("SC_T_Dissolve")
-        arcpy.management.Delete("SC_T_Buffer__Dissolve")
-        arcpy.management.Delete("SC_T_B")
-        arcpy.management.Delete("SC_T_B__Centerline_Original")
-        arcpy.management.Delete("SC_T_B__Centerline_BUFFERID")
-        arcpy.management.Delete("SC_T_B__Centerline_Dissolved")
-
-        arcpy.management.CalculateField(
-            in_table=params.get("OUTPUT"),
-            field="SOURCE",
-            expression='", ".join([*set(!SOURCE!.split(", "))])',
-        )
-        arcpy.management.CalculateField(
-            in_table=params.get("OUTPUT"),
-            field="QC",
-            expression='", ".join([*set(!QC!.split(", "))])',
-        )
-        arcpy.management.CalculateField(
-            in_table=params.get("OUTPUT"),
-            field="TRAIL_NAME",
-            expression='", ".join([*set(!TRAIL_NAME!.split(", "))])',
+            arcpy.SetProgressorLabel("Aggregating trail attributes...")
+            arcpy.AddMessage("⏳ Aggregating trail attributes...")
+            with recorder.stage("Aggregate attributes") as stage:
+                buffer_of_trail = {}
+                with arcpy.da.SearchCursor(
+                    trail_buffers, ["TARGET_FID", "BUFFERID"]
+                ) as rows:
+                    for trail_id, buffer_id in rows:
+                        buffer_of_trail[trail_id] = buffer_id
+
+                rules = attribute_rules(
+                    params.get("INPUT"), params.get("ATTRIBUTE_RULES")
+                )
+                aggregator = AttributeAggregator([rule for _, rule in rules])
+                with arcpy.da.SearchCursor(
+                    params.get("INPUT"), ["OID@", *[field.name for field, _ in rules]]
+                ) as rows:
+                    for row in rows:
+                        aggregator.add(buffer_of_trail.get(row[0]), row[1:])
+                stage.rows_in = len(buffer_of_trail)
+                stage.rows_out = len(aggregator.keys())
+            arcpy.AddMessage("   ✅ Done")
+
+            workers = int(params.get("PARALLEL_WORKERS") or 1)
+            with workspace.stage("Centerlines"), recorder.stage(
+                "Centerlines", [dissolved]
+            ):
+                if workers > 1:
+                    centerlines = create_centerlines_in_parallel(
+                        dissolved, workspace, workers
+                    )
+                else:
+                    centerlines = create_centerlines(dissolved, workspace)
+
+            arcpy.SetProgressorLabel("Writing merged trails...")
+            arcpy.AddMessage("⏳ Writing merged trails...")
+            with recorder.stage(
+                "Write merged trails", [centerlines], [params.get("OUTPUT")]
+            ):
+                arcpy.conversion.ExportFeatures(centerlines, params.get("OUTPUT"))
+
+        with recorder.stage("Write attributes"):
+            write_aggregated_attributes(params.get("OUTPUT"), rules, aggregator)
+        arcpy.AddMessage("   ✅ Done")
+
+    def merge_by_endpoints(self, params: Dict[str, str], recorder: StageRecorder):
+        """Merge trails whose endpoints are within the snap tolerance of each
+        other into multipart lines built from the original geometries.
+
+        Unlike the CENTERLINE method, this does not change the geometry and
+        does not require the Topographic Production extension.
+
+        In incremental mode, a content hash of every input trail is stored in
+        a table next to the output, with the snap tolerance and attribute
+        rules. When the tool runs again with the same settings, every trail
+        is read and hashed to find the added, removed and modified ones, but
+        only the trails near them and the groups they touch are grouped,
+        aggregated and rewritten in the existing output. Other settings
+        rewrite the whole output.
+        """
+        input_layer = params.get("INPUT")
+        output = params.get("OUTPUT")
+        incremental = params.get("INCREMENTAL") == "true"
+        hash_table = trail_hash_table(output)
+
+        description = arcpy.Describe(input_layer)
+        spatial_reference = description.spatialReference
+        if spatial_reference.type != "Projected":
+            arcpy.AddError(
+                "   ❌ The ENDPOINT_GRAPH method requires a projected coordinate system"
+            )
+            raise arcpy.ExecuteError
+
+        tolerance = to_spatial_reference_units(
+            params.get("SNAP_TOLERANCE") or "2 Meters",
+            spatial_reference.metersPerUnit,
         )
-        arcpy.management.CalculateField(
-            in_table=params.get("OUTPUT"),
-            field="STATE",
-            expression='", ".join([*set(!STATE!.split(", "))])',
+
+        rules = attribute_rules(input_layer, params.get("ATTRIBUTE_RULES"))
+        field_names = [field.name for field, _ in rules]
+        id_field = params.get("TRAIL_ID_FIELD") or "OID@"
+
+        settings = content_hash(
+            b"", [tolerance, [(field.name, rule) for field, rule in rules]]
         )
-        arcpy.management.CalculateField(
-            in_table=params.get("OUTPUT"),
-            field="COUNTY",
-            expression='", ".join([*set(!COUNTY!.split(", "))])',
+
+        arcpy.SetProgressorLabel("Reading trails...")
+        arcpy.AddMessage("⏳ Reading trail endpoints...")
+        with recorder.stage("Read trails") as stage:
+            trails = read_features(input_layer, field_names, id_field=id_field)
+            trail_values = list(trails.rows(field_names))
+            trail_ids = []
+            trail_hashes = []
+            if incremental:
+                trail_ids = [str(trail_id) for trail_id in trails.ids.tolist()]
+                trail_hashes = [
+                    content_hash(to_wkb(trails, index), values)
+                    for index, values in enumerate(trail_values)
+                ]
+            stage.rows_out = trails.feature_count
+        arcpy.AddMessage("   ✅ Done")
+
+        # the hashes of the previous run are only valid with the same
+        # grouping settings
+        previous = None
+        if incremental and arcpy.Exists(output) and arcpy.Exists(hash_table):
+            arcpy.AddMessage("⏳ Comparing trails with the previous run...")
+            with recorder.stage("Compare with previous run", [hash_table]):
+                previous = read_trail_hashes(hash_table, settings)
+                if previous is not None:
+                    added, removed, modified = diff_hashes(
+                        {
+                            trail_id: trail_hash
+                            for trail_id, (trail_hash, _) in previous.items()
+                        },
+                        dict(zip(trail_ids, trail_hashes)),
+                    )
+            if previous is None:
+                arcpy.AddWarning(
+                    "   ⚠️ The snap tolerance or attribute rules changed since the "
+                    "previous run; rewriting the whole output"
+                )
+            else:
+                arcpy.AddMessage(
+                    f"   ✅ {len(added)} added, {len(removed)} removed and "
+                    f"{len(modified)} modified trails"
+                )
+
+        endpoint_features, endpoint_x, endpoint_y = trails.part_endpoints()
+
+        def group(
+            indexes: np.ndarray,
+        ) -> typing.Tuple[List[int], Dict[int, List[int]]]:
+            """Group the given trails by their endpoints. Returns the group
+            label of each of them and the trails of each group."""
+            arcpy.SetProgressorLabel("Grouping connected trails...")
+            arcpy.AddMessage(
+                f"⏳ Grouping {len(indexes)} of {trails.feature_count} trails..."
+            )
+            with recorder.stage("Group connected trails") as stage:
+                position = np.full(trails.feature_count, -1, dtype=np.int64)
+                position[indexes] = np.arange(len(indexes))
+                endpoint_positions = position[endpoint_features]
+                selected = endpoint_positions >= 0
+                labels = connected_groups(
+                    zip(
+                        endpoint_positions[selected].tolist(),
+                        endpoint_x[selected].tolist(),
+                        endpoint_y[selected].tolist(),
+                    ),
+                    len(indexes),
+                    tolerance,
+                )
+                members: Dict[int, List[int]] = {}
+                for index, label in zip(indexes.tolist(), labels):
+                    members.setdefault(label, []).append(index)
+                stage.rows_in, stage.rows_out = len(indexes), len(members)
+            arcpy.AddMessage(f"   ✅ Found {len(members)} groups")
+            return labels, members
+
+        # in incremental mode, only the trails near a change and the trails
+        # of the previous groups they touch are grouped again; every other
+        # trail keeps the group (and BUFFERID) of the previous run
+        bufferids_to_delete = None
+        regrouped = np.arange(trails.feature_count)
+        if previous is not None:
+            previous_groups = [
+                previous[trail_id][1] if trail_id in previous else -1
+                for trail_id in trail_ids
+            ]
+            changed = [
+                index
+                for index, trail_id in enumerate(trail_ids)
+                if trail_id in added or trail_id in modified
+            ]
+            near = features_near(
+                endpoint_features,
+                endpoint_x,
+                endpoint_y,
+                changed,
+                trails.feature_count,
+                tolerance,
+            )
+            indexes, bufferids_to_delete = regroup_scope(
+                previous_groups,
+                set(changed) | set(np.flatnonzero(near).tolist()),
+                [previous[trail_id][1] for trail_id in removed | modified],
+            )
+            regrouped = np.array(indexes, dtype=np.int64)
+        labels, members = group(regrouped)
+
+        # regrouped groups get BUFFERIDs that were not used before
+        first_bufferid = (
+            max([bufferid for _, bufferid in previous.values()] + [0]) + 1
+            if previous is not None
+            else 1
         )
+        bufferids = {label: first_bufferid + label for label in members}
+        groups_to_write = set(members)
+
+        def aggregate() -> typing.Tuple[AttributeAggregator, Dict[int, list]]:
+            arcpy.SetProgressorLabel("Aggregating trail attributes...")
+            arcpy.AddMessage(f"⏳ Aggregating {len(groups_to_write)} groups...")
+            with recorder.stage("Aggregate attributes") as stage:
+                aggregator = AttributeAggregator([rule for _, rule in rules])
+                for label in sorted(groups_to_write):
+                    for index in members[label]:
+                        aggregator.add(label, trail_values[index])
+                results = {
+                    label: aggregator.result(label) for label in aggregator.keys()
+                }
+                stage.rows_out = len(results)
+            return aggregator, results
+
+        aggregator, results = aggregate()
+        lengths = text_lengths(results.values(), len(rules))
+
+        # text fields of an existing output cannot be widened, so the whole
+        # output is rewritten when the new values do not fit
+        if bufferids_to_delete is not None:
+            existing_lengths = {
+                field.name: field.length for field in arcpy.ListFields(output)
+            }
+            if any(
+                length > existing_lengths.get(field.name, 0)
+                for (field, _), length in zip(rules, lengths)
+                if length
+            ):
+                arcpy.AddWarning(
+                    "   ⚠️ Values no longer fit the output fields; "
+                    "rewriting the whole output"
+                )
+                bufferids_to_delete = None
+                regrouped = np.arange(trails.feature_count)
+                labels, members = group(regrouped)
+                bufferids = {label: label + 1 for label in members}
+                groups_to_write = set(members)
+                aggregator, results = aggregate()
+                lengths = text_lengths(results.values(), len(rules))
+
+        if bufferids_to_delete is not None:
+            arcpy.AddMessage(
+                f"   ⌛ Deleting {len(bufferids_to_delete)} outdated groups..."
+            )
+            stale = sorted(bufferids_to_delete)
+            for start in range(0, len(stale), 1000):
+                where_clause = "BUFFERID IN ({})".format(
+                    ", ".join(str(bufferid) for bufferid in stale[start : start + 1000])
+                )
+                with arcpy.da.UpdateCursor(output, ["BUFFERID"], where_clause) as rows:
+                    for _ in rows:
+                        rows.deleteRow()
+        else:
+            out_path, out_name = os.path.split(output)
+            arcpy.management.CreateFeatureclass(
+                out_path=out_path or arcpy.env.workspace,
+                out_name=out_name,
+                geometry_type="POLYLINE",
+                has_m="ENABLED" if description.hasM else "DISABLED",
+                has_z="ENABLED" if description.hasZ else "DISABLED",
+                spatial_reference=spatial_reference,
+            )
+            arcpy.management.AddFields(
+                output,
+                [["BUFFERID", "LONG"], *output_field_definitions(rules, lengths)],
+            )
+
+        arcpy.SetProgressorLabel("Writing merged trails...")
+        arcpy.AddMessage("⏳ Writing merged trails...")
+        with recorder.stage("Write merged trails") as stage:
+            # the parts of the trails of each group, in the order of the groups
+            groups = trails.take(regrouped).merge(labels)
+            with arcpy.da.InsertCursor(
+                output, ["SHAPE@", "BUFFERID", "Join_Count", *field_names]
+            ) as rows:
+                for index, label in enumerate(groups.ids.tolist()):
+                    if label not in groups_to_write:
+                        continue
+                    rows.insertRow(
+                        [
+                            geometry(
+                                groups,
+                                index,
+                                "POLYLINE",
+                                spatial_reference,
+                                description.hasZ,
+                                description.hasM,
+                            ),
+                            bufferids[label],
+                            aggregator.counts[label],
+                            *results[label],
+                        ]
+                    )
+            stage.rows_out = len(groups_to_write)
         arcpy.AddMessage("   ✅ Done")
 
-        return
+        if incremental:
+            # trails that were not grouped again keep their previous BUFFERID
+            trail_bufferids = [
+                previous[trail_id][1] if previous and trail_id in previous else 0
+                for trail_id in trail_ids
+            ]
+            for index, label in zip(regrouped.tolist(), labels):
+                trail_bufferids[index] = bufferids[label]
+
+            arcpy.AddMessage("⏳ Saving trail hashes for the next run...")
+            with recorder.stage("Save trail hashes", outputs=[hash_table]):
+                write_trail_hashes(
+                    hash_table, settings, trail_ids, trail_hashes, trail_bufferids
+                )
+            arcpy.AddMessage("   ✅ Done")
 
     def postExecute(self, parameters: List[Parameter]):
         """This method takes place after outputs are processed and
         added to the display."""
         return
+
+
+def attribute_rules(
+    input_layer: str, rules_text: typing.Optional[str]
+) -> List[typing.Tuple[arcpy.Field, str]]:
+    """Return the fields of the input trails and the rule used to combine
+    their values for the merged trails.
+
+    `rules_text` is the text value of the ATTRIBUTE_RULES value table, e.g.
+    "TRAIL_NAME UNIQUE_JOIN;LENGTH SUM". Without rules, text fields are
+    joined and other fields keep their first value, except for the
+    EXCLUDED_FIELDS of the OpenTrails data.
+    """
+    fields = {field.name: field for field in arcpy.ListFields(input_layer)}
+
+    if rules_text:
+        rules = [item.split() for item in rules_text.split(";") if item.strip()]
+        return [(fields[name], rule) for name, rule in rules]
+
+    return [
+        (field, "UNIQUE_JOIN" if field.type == "String" else "FIRST")
+        for field in fields.values()
+        if field.editable
+        and field.type in FIELD_TYPES
+        and field.name not in EXCLUDED_FIELDS
+    ]
+
+
+def output_field_definitions(
+    rules: List[typing.Tuple[arcpy.Field, str]], lengths: List[int]
+) -> List[list]:
+    """Return the AddFields definitions of the Join_Count field and the
+    aggregated fields, with text fields sized to the given lengths."""
+    output_fields = [["Join_Count", "LONG"]]
+    for (field, rule), length in zip(rules, lengths):
+        if rule == "SUM":
+            field_type = "DOUBLE"
+        elif rule in ["UNIQUE_JOIN", "LONGEST"]:
+            field_type = "TEXT"
+        else:
+            field_type = FIELD_TYPES[field.type]
+
+        output_fields.append(
+            [
+                field.name,
+                field_type,
+                field.aliasName,
+                max(length, 1) if field_type == "TEXT" else None,
+            ]
+        )
+    return output_fields
+
+
+def trail_hash_table(output: str) -> str:
+    """Return the path of the table that stores the trail content hashes
+    used by the incremental mode next to the output. Tables cannot be in a
+    feature dataset, so for an output in one the table is in its
+    geodatabase."""
+    folder, name = os.path.split(output)
+    folder = folder or arcpy.env.workspace or ""
+    if (
+        folder
+        and arcpy.Exists(folder)
+        and arcpy.Describe(folder).dataType == "FeatureDataset"
+    ):
+        folder = os.path.dirname(folder)
+    base, extension = os.path.splitext(name)
+    return os.path.join(
+        folder, f"{base}__TrailHashes" + (".dbf" if extension == ".shp" else "")
+    )
+
+
+def read_trail_hashes(
+    hash_table: str, settings: str
+) -> typing.Optional[Dict[str, typing.Tuple[str, int]]]:
+    """Read the content hash and BUFFERID of every trail of the previous run.
+    Returns None when they were saved with other grouping settings (or
+    without settings, by an earlier version of the tool)."""
+    if not {"TRAIL_HASH", "SETTINGS"} <= {
+        field.name.upper() for field in arcpy.ListFields(hash_table)
+    }:
+        return None
+
+    previous = {}
+    with arcpy.da.SearchCursor(
+        hash_table, ["TRAIL_ID", "TRAIL_HASH", "BUFFERID", "SETTINGS"]
+    ) as rows:
+        for trail_id, trail_hash, bufferid, saved_settings in rows:
+            if saved_settings != settings:
+                return None
+            previous[trail_id] = (trail_hash, bufferid)
+    return previous
+
+
+def write_trail_hashes(
+    hash_table: str,
+    settings: str,
+    trail_ids: List[str],
+    trail_hashes: List[str],
+    bufferids: List[int],
+):
+    """Replace the hash table with the trails of this run. The table is
+    recreated instead of truncated, which also works for the dBASE table
+    next to a shapefile output; field names fit the ten characters of
+    dBASE."""
+    if arcpy.Exists(hash_table):
+        arcpy.management.Delete(hash_table)
+    arcpy.management.CreateTable(*os.path.split(hash_table))
+    arcpy.management.AddFields(
+        hash_table,
+        [
+            ["TRAIL_ID", "TEXT", None, 254],
+            ["TRAIL_HASH", "TEXT", None, 32],
+            ["BUFFERID", "LONG"],
+            ["SETTINGS", "TEXT", None, 32],
+        ],
+    )
+    with arcpy.da.InsertCursor(
+        hash_table, ["TRAIL_ID", "TRAIL_HASH", "BUFFERID", "SETTINGS"]
+    ) as rows:
+        for trail_id, trail_hash, bufferid in zip(trail_ids, trail_hashes, bufferids):
+            rows.insertRow([trail_id, trail_hash, bufferid, settings])
+
+
+def write_aggregated_attributes(
+    output: str,
+    rules: List[typing.Tuple[arcpy.Field, str]],
+    aggregator: AttributeAggregator,
+):
+    """Add the aggregated fields (and a Join_Count field with the number of
+    trails in each group) to `output` and fill them in one UpdateCursor pass.
+    The aggregator must be keyed by BUFFERID.
+
+    Text fields are sized to fit the longest aggregated value, which is found
+    in a pass over the aggregated results before the fields are created.
+    """
+    results = {group: aggregator.result(group) for group in aggregator.keys()}
+    lengths = text_lengths(results.values(), len(rules))
+
+    output_fields = output_field_definitions(rules, lengths)
+    arcpy.management.AddFields(output, output_fields)
+
+    empty = [None] * len(rules)
+    with arcpy.da.UpdateCursor(
+        output, ["BUFFERID", *[field[0] for field in output_fields]]
+    ) as rows:
+        for row in rows:
+            group = int(row[0])
+            rows.updateRow(
+                [row[0], aggregator.counts.get(group, 0), *results.get(group, empty)]
+            )
+
+
+def single_field_mapping(table: str, field_name: str) -> arcpy.FieldMappings:
+    """Build field mappings that only carry `field_name` of `table` over to
+    the output of a tool such as SpatialJoin."""
+    field_map = arcpy.FieldMap()
+    field_map.addInputField(table, field_name)
+
+    fieldmappings = arcpy.FieldMappings()
+    fieldmappings.addFieldMap(field_map)
+    return fieldmappings
+
+
+def create_centerlines(buffers: str, workspace: IntermediateWorkspace) -> str:
+    """Create the centerlines of the dissolved trail buffers in `buffers` and
+    dissolve them by BUFFERID.
+
+    Returns the path to the dissolved centerlines in `workspace`.
+    """
+    original = workspace.dataset("SC_T_B__Centerline_Original")
+    with_bufferid = workspace.dataset("SC_T_B__Centerline_BUFFERID")
+    dissolved = workspace.dataset("SC_T_B__Centerline_Dissolved")
+
+    arcpy.topographic.PolygonToCenterline(
+        in_features=buffers,
+        out_feature_class=original,
+        connecting_features=None,
+    )
+
+    arcpy.analysis.SpatialJoin(
+        target_features=original,
+        join_features=buffers,
+        out_feature_class=with_bufferid,
+        join_operation="JOIN_ONE_TO_MANY",
+        join_type="KEEP_ALL",
+        field_mapping=single_field_mapping(buffers, "BUFFERID"),
+        match_option="INTERSECT",
+        search_radius=None,
+        distance_field_name="",
+    )
+
+    arcpy.analysis.PairwiseDissolve(
+        in_features=with_bufferid,
+        out_feature_class=dissolved,
+        dissolve_field="BUFFERID",
+        statistics_fields=None,
+        multi_part="MULTI_PART",
+    )
+
+    return dissolved
+
+
+def create_centerlines_batch(buffers: str, batch_id: int) -> str:
+    """Run `create_centerlines` for the buffers with the given BATCHID in a
+    scratch file geodatabase of their own. This is the entry point of the
+    worker processes used by `create_centerlines_in_parallel`.
+
+    Returns the path to the dissolved centerlines of the batch. The caller is
+    responsible for deleting its geodatabase.
+    """
+    arcpy.env.overwriteOutput = True
+
+    # the result must outlive the worker, so the workspace is not used as a
+    # context manager; the caller deletes the geodatabase of the result
+    workspace = IntermediateWorkspace("SCRATCH_GDB")
+    workspace.create()
+    try:
+        batch_buffers = workspace.dataset("SC_T_B")
+        arcpy.conversion.ExportFeatures(
+            in_features=buffers,
+            out_features=batch_buffers,
+            where_clause=f"BATCHID = {batch_id}",
+        )
+        dissolved = create_centerlines(batch_buffers, workspace)
+    except Exception:
+        workspace.delete()
+        raise
+
+    workspace.delete(keep=[dissolved])
+    return dissolved
+
+
+def create_centerlines_in_parallel(
+    buffers: str, workspace: IntermediateWorkspace, workers: int
+) -> str:
+    """Same as `create_centerlines`, but the dissolved buffers are split into
+    batches with a similar number of vertices that are processed in a pool of
+    worker processes.
+
+    Buffers with different BUFFERIDs do not overlap, so each buffer is handled
+    by exactly one worker and the merged result matches the serial run.
+    """
+    arcpy.AddMessage(f"   ⌛ Splitting buffers into {workers} batches...")
+    vertex_counts = {}
+    with arcpy.da.SearchCursor(buffers, ["BUFFERID", "SHAPE@"]) as rows:
+        for buffer_id, shape in rows:
+            vertex_counts[buffer_id] = shape.pointCount if shape else 0
+
+    batch_of_buffer = {
+        buffer_id: batch_id
+        for batch_id, batch in enumerate(balanced_batches(vertex_counts, workers))
+        for buffer_id in batch
+    }
+
+    # worker processes cannot read the memory workspace of this process and
+    # the BATCHID field should not end up in the buffers, so the workers read
+    # a copy in a scratch geodatabase
+    with IntermediateWorkspace("SCRATCH_GDB") as shared_workspace:
+        shared_buffers = shared_workspace.dataset("SC_T_B")
+        arcpy.conversion.ExportFeatures(buffers, shared_buffers)
+
+        arcpy.management.AddField(shared_buffers, "BATCHID", "LONG")
+        with arcpy.da.UpdateCursor(shared_buffers, ["BUFFERID", "BATCHID"]) as rows:
+            for row in rows:
+                row[1] = batch_of_buffer[row[0]]
+                rows.updateRow(row)
+
+        arcpy.AddMessage("   ⌛ Creating centerlines in parallel...")
+        batch_outputs: Dict[int, str] = {}
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=spawn_context()
+            ) as executor:
+                shared_path = arcpy.Describe(shared_buffers).catalogPath
+                futures = {}
+                for batch_id in sorted(set(batch_of_buffer.values())):
+                    future = executor.submit(
+                        create_centerlines_batch, shared_path, batch_id
+                    )
+                    futures[future] = batch_id
+                # every batch is collected before a failure is raised, so the
+                # geodatabases of the batches that finished are deleted too
+                failure = None
+                for future in as_completed(futures):
+                    try:
+                        batch_outputs[futures[future]] = future.result()
+                    except Exception as exception:
+                        failure = failure or exception
+                if failure is not None:
+                    raise failure
+
+            dissolved = workspace.dataset("SC_T_B__Centerline_Dissolved")
+            arcpy.management.Merge(
+                [batch_outputs[batch_id] for batch_id in sorted(batch_outputs)],
+                dissolved,
+            )
+        finally:
+            for batch_output in batch_outputs.values():
+                arcpy.management.Delete(os.path.dirname(batch_output))
+
+    return dissolved
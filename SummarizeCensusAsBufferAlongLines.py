@@ -1,108 +1,47 @@
+import itertools
+import math
 import os
-from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
 import typing
 import arcpy
+import numpy as np
 from arcpy import Parameter
 from arcpy import ValueTable
+from census_cache import CensusTableCache, table_signature
+from census_tables import CensusTableCombiner, csv_chunks, row_chunks, to_python
+from linear_units import to_spatial_reference_units
+from intermediate_workspace import IntermediateWorkspace
+from membership import MembershipMatrix, distance_band_matrix
+from partitioning import balanced_batches, spawn_context, tile_keys
+from resources import format_bytes
+from spatial_index import STRTree
+from stage_cache import StageCache, cache_key, default_folder, fingerprint
+from stage_metrics import StageRecorder
+from summary_statistics import StreamingSummary
+from tool_parameters import TOOLS
+
+# AddField types of the numeric census field types that can be summarized
+NUMERIC_FIELD_TYPES = {
+    "SmallInteger": "SHORT",
+    "Integer": "LONG",
+    "BigInteger": "BIGINTEGER",
+    "Single": "FLOAT",
+    "Double": "DOUBLE",
+}
 
 
 class SummarizeCensusAsBufferAlongLines(object):
     def __init__(self):
         """Define the tool (tool name is the name of the class)."""
-        self.label = "Summarize Census As Buffer Along Lines"
-        self.description = "Creates centroids for census areas and summarizes chosen attributes to a buffer around the input feature class."
+        info = TOOLS["SummarizeCensusAsBufferAlongLines"]
+        self.label = info.label
+        self.description = info.description
         self.canRunInBackground = False
 
     def getParameterInfo(self):
         """Define parameter definitions"""
-
-        paramCensus = arcpy.Parameter(
-            displayName="Census Polygons",
-            name="INPUT_CENSUS",
-            datatype="GPFeatureLayer",
-            parameterType="Required",
-            direction="Input",
-        )
-
-        paramCensusData = arcpy.Parameter(
-            displayName="Census Data",
-            name="INPUT_CENSUS_DATA",
-            datatype="GPTableView",
-            multiValue=True,
-            parameterType="Required",
-            direction="Input",
-        )
-
-        paramLines = arcpy.Parameter(
-            displayName="Lines",
-            name="INPUT_LINES",
-            datatype="GPFeatureLayer",
-            parameterType="Required",
-            direction="Input",
-        )
-
-        paramBufferDistance = arcpy.Parameter(
-            displayName="Buffer Distance",
-            name="INPUT_BUFFER_DISTANCE",
-            datatype="GPLinearUnit",
-            parameterType="Required",
-            direction="Input",
-        )
-        paramBufferDistance.value = "1 Kilometers"
-
-        paramBufferDissolve = arcpy.Parameter(
-            displayName="Buffer Dissolve Field",
-            name="INPUT_BUFFER_DISSOLVE",
-            datatype="Field",
-            parameterType="Optional",
-            direction="Input",
-        )
-        paramBufferDissolve.parameterDependencies = [paramLines.name]
-
-        paramCensusFields = arcpy.Parameter(
-            displayName="Summary Fields",
-            name="INPUT_SUMMARY_FIELDS",
-            datatype="GPValueTable",
-            parameterType="Required",
-            direction="Input",
-        )
-        paramCensusFields.parameterDependencies = [paramCensusData.name]
-        paramCensusFields.columns = [
-            ["Field", "Field"],
-            ["GPString", "Label"],
-            ["GPString", "Statistic Type"],
-        ]
-        paramCensusFields.filters[2].type = "ValueList"
-        paramCensusFields.filters[2].list = ["SUM", "MEAN", "MIN", "MAX", "STDEV"]
-
-        paramSummaryBuffer = arcpy.Parameter(
-            displayName="Summary Buffer",
-            name="OUTPUT_SUMMARY_BUFFER",
-            datatype="DEFeatureClass",
-            parameterType="Required",
-            direction="Output",
-        )
-
-        paramCentroids = arcpy.Parameter(
-            displayName="Centroids",
-            name="OUTPUT_I_CENTROIDS",
-            datatype="DEFeatureClass",
-            parameterType="Optional",
-            direction="Output",
-            category="Intermediate Outputs",
-        )
-
-        params = [
-            paramCensus,
-            paramCensusData,
-            paramLines,
-            paramBufferDistance,
-            paramBufferDissolve,
-            paramCensusFields,
-            paramSummaryBuffer,
-            paramCentroids,
-        ]
-        return params
+        return TOOLS["SummarizeCensusAsBufferAlongLines"].parameter_info()
 
     def isLicensed(self):
         """Set whether tool is licensed to execute."""
@@ -122,11 +61,46 @@ class SummarizeCensusAsBufferAlongLines(object):
 
             parameters[6].value = f"{census_shape_name}__SummaryBuffer"
 
+        parameters[10].enabled = bool(parameters[9].value)
+        parameters[12].enabled = len(distance_texts(parameters[3].valueAsText)) > 1
+        parameters[13].enabled = bool(parameters[4].valueAsText)
+        parameters[14].enabled = bool(parameters[4].valueAsText) and bool(
+            parameters[13].value
+        )
+        parameters[16].enabled = (parameters[15].value or 1) > 1
+        parameters[17].enabled = (parameters[15].value or 1) > 1 and not (
+            parameters[16].valueAsText
+        )
+
         return
 
     def updateMessages(self, parameters: List[Parameter]):
         """Modify the messages created by internal validation for each tool
         parameter.  This method is called after internal validation."""
+        several_distances = len(distance_texts(parameters[3].valueAsText)) > 1
+        if several_distances:
+            try:
+                buffer_distances(parameters[3].valueAsText)
+            except ValueError as error:
+                parameters[3].setErrorMessage(
+                    f"{error}; several buffer distances must use linear units"
+                )
+        if several_distances and parameters[11].valueAsText == "AREA":
+            parameters[11].setErrorMessage(
+                "AREA membership is not supported with several buffer distances"
+            )
+        if (
+            parameters[4].valueAsText
+            and parameters[13].value
+            and parameters[11].valueAsText == "AREA"
+        ):
+            parameters[11].setErrorMessage("AREA membership requires dissolved buffers")
+        if not parameters[18].valueAsText and any(
+            row[2] == "POP_MEAN" for row in parameters[5].values or []
+        ):
+            parameters[18].setErrorMessage(
+                "A population field is required for the POP_MEAN statistic"
+            )
         return
 
     def execute(self, parameters: List[Parameter], messages):
@@ -140,187 +114,1182 @@ class SummarizeCensusAsBufferAlongLines(object):
             if elem.altered:
                 params[elem.name] = elem.valueAsText
 
-        arcpy.SetProgressorLabel("Buffering lines...")
-        arcpy.AddMessage("⏳ Buffering input lines...")
-        if params.get("INPUT_BUFFER_DISSOLVE"):
-            arcpy.AddMessage(
-                "   ⌛ Creating buffer with dissolve (this may take a very long time)..."
-            )
-        else:
-            arcpy.AddMessage("   ⌛ Creating buffer...")
-        arcpy.analysis.Buffer(
-            in_features=params.get("INPUT_LINES"),
-            out_feature_class="TrailsBuffer",
-            buffer_distance_or_field=params.get("INPUT_BUFFER_DISTANCE"),
-            line_side="FULL",
-            line_end_type="ROUND",
-            dissolve_option="LIST" if params.get("INPUT_BUFFER_DISSOLVE") else None,
-            dissolve_field=params.get("INPUT_BUFFER_DISSOLVE"),
-            method="PLANAR",
+        # every stage reports its time, row counts and memory use
+        recorder = StageRecorder(
+            type(self).__name__,
+            arcpy.AddMessage,
+            lambda dataset: int(arcpy.management.GetCount(dataset)[0]),
         )
-        arcpy.AddMessage("   ✅ Done")
 
-        arcpy.SetProgressorLabel("Identifying census areas intersected by lines...")
-        arcpy.AddMessage("⏳ Identifying census areas intersected by lines...")
-        arcpy.AddMessage("   ⌛ Indentifying...")
-        arcpy.analysis.SpatialJoin(
-            target_features=params.get("INPUT_CENSUS"),
-            join_features="TrailsBuffer",
-            out_feature_class="LinesIntersectionSpatialJoin",
-            join_operation="JOIN_ONE_TO_MANY",
-            join_type="KEEP_ALL",
-            field_mapping=None,
-            match_option="INTERSECT",
-        )
+        # the run report is written also when the run fails
+        try:
+            self.summarize(parameters, params, recorder)
+        finally:
+            if params.get("OUTPUT_RUN_REPORT"):
+                recorder.write_report(params.get("OUTPUT_RUN_REPORT"))
 
-        arcpy.SetProgressorLabel("Saving census areas intersected by lines...")
-        arcpy.AddMessage("   ⌛ Exporting to new feature class...")
-        arcpy.conversion.ExportFeatures(
-            in_features="LinesIntersectionSpatialJoin",
-            out_features="LinesIntersectionAreaPlain",
-            where_clause="Join_Count > 0",
-            use_field_alias_as_name="NOT_USE_ALIAS",
-            field_mapping=None,
-            sort_field=None,
-        )
+    def summarize(
+        self,
+        parameters: List[Parameter],
+        params: Dict[str, str],
+        recorder: StageRecorder,
+    ):
+        """Buffer the lines and summarize the census data of the census areas
+        in each buffer."""
+        # with several distances the census areas are found once for the
+        # largest one and then assigned to distance bands
+        try:
+            distances = buffer_distances(parameters[3].valueAsText)
+        except ValueError as error:
+            arcpy.AddError(f"   ❌ {error}")
+            raise arcpy.ExecuteError
+        cumulative = params.get("INPUT_DISTANCE_BANDS", "CUMULATIVE") == "CUMULATIVE"
 
-        arcpy.SetProgressorLabel(
-            "Adding census details to census areas intersected by lines..."
-        )
-        arcpy.AddMessage("   ⌛ Adding census details...")
-        arcpy.analysis.SpatialJoin(
-            target_features="LinesIntersectionAreaPlain",
-            join_features=params.get("INPUT_CENSUS"),
-            out_feature_class="LinesIntersectionArea",
-            join_operation="JOIN_ONE_TO_ONE",
-            join_type="KEEP_ALL",
-            match_option="INTERSECT",
+        # grouped summaries buffer every line on its own and combine the census
+        # units of a group's buffers instead of dissolving the buffers
+        dissolve_field = params.get("INPUT_BUFFER_DISSOLVE")
+        grouped = bool(dissolve_field) and (
+            params.get("INPUT_GROUP_WITHOUT_DISSOLVE") == "true"
         )
-        arcpy.AddMessage("   ✅ Done")
+        buffer_dissolve_field = None if grouped else dissolve_field
 
-        arcpy.SetProgressorLabel("Creating centroids...")
-        arcpy.AddMessage("⏳ Creating centroids for census areas...")
-        arcpy.AddMessage("   ⌛ Creating centroids...")
         centroids_layer = (
             params.get("OUTPUT_I_CENTROIDS")
             if params.get("OUTPUT_I_CENTROIDS")
             else "LinesIntersectionAreaCentroids"
         )
-        arcpy.management.FeatureToPoint(
-            in_features="LinesIntersectionArea",
-            out_feature_class=centroids_layer,
-            point_location="CENTROID",
-        )
 
-        arcpy.AddMessage("   ⌛ Combining data tables (this may take a while)...")
+        # the buffer and intersection stages do not depend on the summary
+        # fields, so their outputs can be reused when only those change
+        stage_cache = None
+        stages_path = None
+        buffer_features = "TrailsBuffer"
+        stage_areas = "LinesIntersectionArea"
+        stage_centroids = centroids_layer
+        stage_key = ""
+        if params.get("INPUT_STAGE_CACHE") == "true":
+            arcpy.SetProgressorLabel("Fingerprinting inputs...")
+            arcpy.AddMessage(
+                "⏳ Looking for reusable buffer and intersection results..."
+            )
+            # the cache is kept next to the census data cache, or in a folder
+            # of the user, since the scratch folder does not outlive a run
+            stage_cache = StageCache(
+                (
+                    os.path.join(params.get("INPUT_CACHE_FOLDER"), "stage_cache")
+                    if params.get("INPUT_CACHE_FOLDER")
+                    else default_folder()
+                ),
+                int(params.get("INPUT_STAGE_CACHE_SIZE") or 2048) * 1024 * 1024,
+            )
+            with recorder.stage("Fingerprint inputs"):
+                stage_key = cache_key(
+                    layer_fingerprint(
+                        params.get("INPUT_LINES"),
+                        [dissolve_field] if dissolve_field else [],
+                    ),
+                    layer_fingerprint(params.get("INPUT_CENSUS"), ["GISJOIN"]),
+                    distances[-1],
+                    buffer_dissolve_field,
+                )
+                stages_path = stage_cache.lookup(stage_key)
+                entry = stage_cache.reserve(stage_key) if stages_path is None else None
+                if stages_path is not None:
+                    arcpy.AddMessage(f"   ✅ Reusing results from {stages_path}")
+                    stages_gdb = os.path.join(stages_path, "stages.gdb")
+                elif entry is not None:
+                    arcpy.AddMessage("   ⌛ No reusable results found")
+                    stages_gdb = arcpy.management.CreateFileGDB(entry, "stages.gdb")[0]
+                else:
+                    arcpy.AddMessage(
+                        "   ⌛ Another run is computing these results; "
+                        "they are not cached by this run"
+                    )
+                    stage_cache = None
+            if stage_cache is not None:
+                buffer_features = os.path.join(stages_gdb, "TrailsBuffer")
+                stage_areas = os.path.join(stages_gdb, "Areas")
+                stage_centroids = os.path.join(stages_gdb, "Centroids")
+
+        if stages_path is None:
+            try:
+                workers = int(params.get("PARALLEL_WORKERS") or 1)
+                if workers > 1:
+                    arcpy.SetProgressorLabel(
+                        "Buffering lines and identifying census areas in parallel..."
+                    )
+                    arcpy.AddMessage(
+                        "⏳ Buffering lines and identifying census areas in parallel..."
+                    )
+                    with recorder.stage(
+                        "Buffer and select census areas in parallel",
+                        inputs=[params.get("INPUT_LINES")],
+                    ) as stage:
+                        census_count, candidate_count, area_count = (
+                            buffer_and_select_in_parallel(
+                                params.get("INPUT_LINES"),
+                                params.get("INPUT_CENSUS"),
+                                distances[-1],
+                                buffer_dissolve_field,
+                                params.get("INPUT_PARTITION_FIELD"),
+                                params.get("INPUT_PARTITION_TILE_SIZE"),
+                                workers,
+                                buffer_features,
+                                stage_areas,
+                            )
+                        )
+                        stage.rows_out = area_count
+                else:
+                    arcpy.SetProgressorLabel("Buffering lines...")
+                    arcpy.AddMessage("⏳ Buffering input lines...")
+                    if buffer_dissolve_field:
+                        arcpy.AddMessage(
+                            "   ⌛ Creating buffer with dissolve (this may take a very long time)..."
+                        )
+                    else:
+                        arcpy.AddMessage("   ⌛ Creating buffer...")
+                    with recorder.stage(
+                        "Buffer", [params.get("INPUT_LINES")], [buffer_features]
+                    ):
+                        buffer_lines(
+                            params.get("INPUT_LINES"),
+                            buffer_features,
+                            distances[-1],
+                            buffer_dissolve_field,
+                        )
+                    arcpy.AddMessage("   ✅ Done")
+
+                    arcpy.SetProgressorLabel(
+                        "Identifying census areas intersected by lines..."
+                    )
+                    arcpy.AddMessage(
+                        "⏳ Identifying census areas intersected by lines..."
+                    )
+                    arcpy.AddMessage("   ⌛ Indentifying...")
+                    with recorder.stage("Select census areas") as stage:
+                        census_count, candidate_count, area_count = select_intersecting(
+                            params.get("INPUT_CENSUS"), buffer_features, stage_areas
+                        )
+                        stage.rows_in, stage.rows_out = census_count, area_count
+                arcpy.AddMessage(
+                    f"         {census_count} census areas read, {candidate_count} "
+                    f"tested exactly, {area_count} intersected by lines"
+                )
+                arcpy.AddMessage("   ✅ Done")
+
+                arcpy.SetProgressorLabel("Creating centroids...")
+                arcpy.AddMessage("⏳ Creating centroids for census areas...")
+                arcpy.AddMessage("   ⌛ Creating centroids...")
+                with recorder.stage("Centroids", [stage_areas], [stage_centroids]):
+                    arcpy.management.FeatureToPoint(
+                        in_features=stage_areas,
+                        out_feature_class=stage_centroids,
+                        point_location="CENTROID",
+                    )
+                arcpy.AddMessage("   ✅ Done")
+            except Exception:
+                if stage_cache is not None:
+                    stage_cache.discard(stage_key)
+                raise
+
+            if stage_cache is not None:
+                evicted = stage_cache.commit(stage_key, params.get("INPUT_LINES"))
+                if evicted:
+                    arcpy.AddMessage(
+                        f"   💾 Removed {len(evicted)} older cached result(s) to stay "
+                        f"under {format_bytes(stage_cache.size_limit_bytes)}"
+                    )
+
+        if stage_centroids != centroids_layer:
+            arcpy.conversion.ExportFeatures(
+                in_features=stage_centroids, out_features=centroids_layer
+            )
+
+        arcpy.SetProgressorLabel("Combining data tables...")
+        arcpy.AddMessage("   ⌛ Combining data tables...")
         census_data_tables: List[str] = (
             params.get("INPUT_CENSUS_DATA").replace("'", "").replace('"', "").split(";")
         )
-        for index, table_path in enumerate(census_data_tables):
-            if index == 0:
-                arcpy.MakeTableView_management(table_path, "CensusTableView")
-            else:
-                arcpy.MakeTableView_management(table_path, f"CensusTableView{index}")
-                arcpy.conversion.TableToTable(  # this ensures that tables have unique names
-                    f"CensusTableView{index}", out_name=f"CensusTable{index}"
+        summary_fields: ValueTable = parameters[5].value
+        # a field can be listed once per statistic, but is read once
+        summary_field_names = list(dict.fromkeys(info[0] for info in summary_fields))
+        population_field = params.get("INPUT_POPULATION_FIELD")
+        if population_field and population_field not in summary_field_names:
+            summary_field_names.append(population_field)
+
+        # read only GISJOIN and the summary fields of each table, in chunks,
+        # from the columnar cache when a cache folder is set
+        cache = (
+            CensusTableCache(params.get("INPUT_CACHE_FOLDER"))
+            if params.get("INPUT_CACHE_FOLDER")
+            else None
+        )
+        combiner = CensusTableCombiner(summary_field_names)
+        source_types: Dict[str, str] = {}
+        with recorder.stage("Read census data tables"):
+            for table_path in census_data_tables:
+                table_fields = arcpy.ListFields(table_path)
+                table_field_names = {field.name for field in table_fields}
+                for field in table_fields:
+                    source_types.setdefault(field.name, field.type)
+                field_names = [
+                    name for name in summary_field_names if name in table_field_names
+                ]
+                if not field_names:
+                    continue
+
+                def read_chunks(
+                    names: List[str],
+                    table_path: str = table_path,
+                    csv_path: typing.Optional[str] = csv_source(table_path),
+                ):
+                    arcpy.AddMessage(
+                        f"         Reading {len(names)} field(s) from {table_path}"
+                    )
+                    if csv_path:
+                        yield from csv_chunks(csv_path, names)
+                        return
+                    with arcpy.da.SearchCursor(table_path, ["GISJOIN", *names]) as rows:
+                        yield from row_chunks(names, rows)
+
+                if cache is None:
+                    combiner.add_chunks(field_names, read_chunks(field_names))
+                    continue
+
+                catalog_path = arcpy.Describe(table_path).catalogPath
+                signature = table_signature(
+                    catalog_path,
+                    modified_time(catalog_path),
+                    [(field.name, field.type) for field in table_fields],
                 )
-                arcpy.AddJoin_management(
-                    in_layer_or_view="CensusTableView",
-                    in_field="GISJOIN",
-                    join_table=f"CensusTable{index}",
-                    join_field="GISJOIN",
-                    join_type="KEEP_ALL",
+                combiner.add_columns(
+                    *cache.columns(catalog_path, signature, field_names, read_chunks)
                 )
 
-        arcpy.SetProgressorLabel("Mapping fields...")
-        arcpy.AddMessage("   ⌛ Preparing summary fields to be joined...")
-        fieldmappings = arcpy.FieldMappings()
-        summary_fields: ValueTable = parameters[5].value
-        for info in summary_fields:
-            field_name = info[0]
-            field_label = info[1]
-            statistic = info[2]
+        if cache is not None:
+            arcpy.AddMessage(
+                f"         Census data cache: {cache.hits} table(s) reused, "
+                f"{cache.misses} table(s) read"
+            )
+
+        if combiner.unmatched_fields():
+            arcpy.AddError(
+                "   ❌ Summary field(s) not found in the census data tables: "
+                + ", ".join(combiner.unmatched_fields())
+            )
+            raise arcpy.ExecuteError
+        text_fields = [
+            name
+            for name in summary_field_names
+            if source_types[name] not in NUMERIC_FIELD_TYPES
+        ]
+        if text_fields:
+            arcpy.AddError(
+                "   ❌ Summary field(s) must be numeric: " + ", ".join(text_fields)
+            )
+            raise arcpy.ExecuteError
+        if combiner.duplicate_count:
+            arcpy.AddWarning(
+                f"   ⚠️ {combiner.duplicate_count} GISJOIN row(s) appear more than once "
+                "in a census data table; the first row was used"
+            )
 
-            field_map = arcpy.FieldMap()
-            field_map.addInputField("CensusTableView", field_name)
+        arcpy.SetProgressorLabel("Joining fields...")
+        arcpy.AddMessage("   ⌛ Joining summary fields to centroids...")
+        existing_fields = {field.name for field in arcpy.ListFields(centroids_layer)}
+        labels = {
+            field_name: field_label for field_name, field_label, _ in summary_fields
+        }
+        new_fields = [
+            [
+                field_name,
+                NUMERIC_FIELD_TYPES[source_types[field_name]],
+                labels.get(field_name, field_name),
+            ]
+            for field_name in summary_field_names
+            if field_name not in existing_fields
+        ]
+        if new_fields:
+            arcpy.management.AddFields(centroids_layer, new_fields)
 
-            arcpy.AddMessage(field_map)
-            outputField = field_map.outputField
-            outputField.aliasName = field_label
-            outputField.type = "Integer"
-            field_map.outputField = outputField
+        with recorder.stage("Join summary fields") as stage:
+            # the GISJOINs are read first so all of them can be looked up at once
+            with arcpy.da.SearchCursor(centroids_layer, ["GISJOIN"]) as rows:
+                gisjoins = [row[0] or "" for row in rows]
+            values, table_counts = combiner.join(gisjoins)
+            missing = int((table_counts == 0).sum())
+            incomplete = int(
+                ((table_counts > 0) & (table_counts < combiner.table_count)).sum()
+            )
 
-            fieldmappings.addFieldMap(field_map)
+            with arcpy.da.UpdateCursor(
+                centroids_layer, ["GISJOIN", *summary_field_names]
+            ) as rows:
+                for row, row_values in zip(rows, values):
+                    rows.updateRow([row[0], *row_values])
+            stage.rows_in, stage.rows_out = len(gisjoins), len(gisjoins) - missing
 
-        arcpy.SetProgressorLabel("Joining fields...")
-        arcpy.AddMessage(
-            "   ⌛ Joining summary fields to centroids (this may take a while)..."
-        )
-        arcpy.AddMessage("         Using field mappings:")
-        arcpy.AddMessage(f"         {fieldmappings.exportToString()}")
-        arcpy.management.JoinField(
-            in_data=centroids_layer,
-            in_field="GISJOIN",
-            join_table="CensusTableView",
-            join_field="GISJOIN",
-            fields=None,
-            fm_option="USE_FM",
-            field_mapping=fieldmappings,
-        )
+        if missing:
+            arcpy.AddWarning(
+                f"   ⚠️ {missing} census area(s) have a GISJOIN that is missing "
+                "from every census data table"
+            )
+        if incomplete:
+            arcpy.AddWarning(
+                f"   ⚠️ {incomplete} census area(s) have a GISJOIN that is missing "
+                "from some of the census data tables"
+            )
         arcpy.AddMessage("   ✅ Done")
 
         arcpy.SetProgressorLabel("Summarizing to buffer...")
         arcpy.AddMessage("⌛ Summarizing centroids to buffer...")
-        arcpy.AddMessage("   ⌛ Preparing summary fields...")
-        summary_fields_str = ""
-        for info in summary_fields:
-            field_name = info[0]
-            statistic = info[2]
-            summary_fields_str += f"{field_name} {statistic};"
-        arcpy.AddMessage("   ⌛ Summarizing...")
-        arcpy.AddMessage(
-            f'         Using summary field configuration: "{summary_fields_str}"'
+        output = params.get("OUTPUT_SUMMARY_BUFFER")
+        weighting = params.get("INPUT_MEMBERSHIP_WEIGHTS") or "CENTROID"
+
+        # each row of the summary is a buffer (band by band), identified by
+        # the ORIG_FID of its line or by its dissolve value
+        row_keys, row_of_buffer, row_of_line = buffer_rows(
+            buffer_features, params.get("INPUT_LINES"), dissolve_field, grouped
         )
-        arcpy.analysis.SummarizeWithin(
-            in_polygons="TrailsBuffer",
-            in_sum_features=centroids_layer,
-            out_feature_class=params.get("OUTPUT_SUMMARY_BUFFER"),
-            keep_all_polygons="KEEP_ALL",
-            sum_fields=summary_fields_str,
-            sum_shape="ADD_SHAPE_SUM",
-            shape_unit="SQUAREKILOMETERS",
-            group_field=None,
-            add_min_maj="NO_MIN_MAJ",
-            add_group_percent="NO_PERCENT",
-            out_group_table=None,
+
+        # with the stage cache, the buffer x census unit membership matrix is
+        # kept next to the output and reused while the buffer and
+        # intersection results are reused
+        matrix_key = (
+            cache_key(stage_key, weighting, distances, cumulative, grouped)
+            if stage_cache is not None
+            else ""
         )
+        matrix_path = membership_path(output) if matrix_key else None
+        matrix = None
+        if matrix_path and os.path.exists(matrix_path):
+            matrix = MembershipMatrix.load(matrix_path)
+            if matrix.key == matrix_key:
+                arcpy.AddMessage(
+                    f"   ✅ Reusing census areas per buffer: {matrix_path}"
+                )
+            else:
+                matrix = None
+        if matrix is None:
+            with recorder.stage("Census areas per buffer") as stage:
+                arcpy.AddMessage("   ⌛ Finding the census areas in each buffer...")
+                if len(distances) > 1:
+                    matrix = build_distance_bands(
+                        params.get("INPUT_LINES"),
+                        stage_centroids,
+                        distances,
+                        cumulative,
+                        row_keys,
+                        row_of_line,
+                        matrix_key,
+                    )
+                else:
+                    matrix = build_membership(
+                        buffer_features,
+                        stage_centroids if weighting == "CENTROID" else stage_areas,
+                        weighting,
+                        row_keys,
+                        row_of_buffer,
+                        matrix_key,
+                    )
+                if matrix_path:
+                    matrix.save(matrix_path)
+                stage.rows_out = len(matrix.indices)
 
-        # rename summary field alias to match alias
-        arcpy.SetProgressorLabel("Renaming summary field aliases...")
-        for info in summary_fields:
-            field_name = info[0]
-            field_label = info[1]
-            statistic = info[2]
-            summary_field_name = f"{statistic.lower()}_{field_name}"
-            alias_name = f"{field_label}{statistic}"
-            arcpy.AddMessage(
-                f'   ⌛ Renaming field: "{summary_field_name}" -> alias: "{alias_name}"...'
+        arcpy.AddMessage("   ⌛ Summarizing...")
+        with recorder.stage("Summarize") as stage:
+            with arcpy.da.SearchCursor(
+                centroids_layer, ["GISJOIN", *summary_field_names]
+            ) as rows:
+                census_values = {row[0]: row[1:] for row in rows}
+            empty_values = [None] * len(summary_field_names)
+            values = np.array(
+                [
+                    census_values.get(gisjoin, empty_values)
+                    for gisjoin in matrix.column_ids.tolist()
+                ],
+                dtype=np.float64,
+            ).reshape(len(matrix.column_ids), len(summary_field_names))
+
+            # every statistic of every field is computed in a single pass over the
+            # (buffer, census unit) members of the matrix
+            populations = (
+                values[:, summary_field_names.index(population_field)]
+                if population_field
+                else None
             )
-            try:
-                arcpy.AlterField_management(
-                    in_table=params.get("OUTPUT_SUMMARY_BUFFER"),
-                    field=summary_field_name,
-                    new_field_alias=alias_name,
+            summary = StreamingSummary(matrix.shape[0], len(summary_field_names))
+            for rows, columns, weights in matrix.records():
+                summary.add(
+                    rows,
+                    values[columns],
+                    weights,
+                    populations[columns] if populations is not None else None,
                 )
-            except Exception:
-                # ignore error
-                False
+            stage.rows_in, stage.rows_out = len(matrix.indices), matrix.shape[0]
 
-        arcpy.AddMessage("   ✅ Done")
+        # there is one output field per field and statistic, named like
+        # SummarizeWithin names them, typed to fit the statistic
+        output_fields: Dict[str, Tuple[str, str, np.ndarray]] = {}
+        big_integers = supports_big_integers(output)
+        for field_name, field_label, statistic in summary_fields:
+            column = summary_field_names.index(field_name)
+            output_fields[f"{statistic.lower()}_{field_name}"] = (
+                f"{field_label}{statistic}",
+                statistic_field_type(
+                    statistic, source_types[field_name], weighting, big_integers
+                ),
+                summary.result(statistic)[:, column],
+            )
 
-        return
+        if len(distances) > 1:
+            arcpy.AddMessage(f"   ⌛ Writing {len(distances)} distance bands...")
+        if grouped and params.get("INPUT_GROUP_SHAPES") == "BUFFERS":
+            arcpy.AddMessage("   ⌛ Dissolving group buffers...")
+        with recorder.stage("Write output", outputs=[output]):
+            write_output_shapes(
+                params.get("INPUT_LINES"),
+                buffer_features,
+                dissolve_field,
+                grouped,
+                params.get("INPUT_GROUP_SHAPES") or "LINES",
+                distances,
+                cumulative,
+                output,
+            )
+            arcpy.management.AddFields(
+                output,
+                [["Point_Count", "LONG", "Count of Points"]]
+                + [
+                    [name, field_type, alias]
+                    for name, (alias, field_type, _) in output_fields.items()
+                ],
+            )
+
+            key_fields = [dissolve_field or "ORIG_FID"]
+            if len(distances) > 1:
+                key_fields.append("BUFF_DISTANCE")
+            band_of_distance = {
+                distance: band for band, distance in enumerate(distances)
+            }
+            row_of_key = {key: row for row, key in enumerate(row_keys)}
+            counts = matrix.member_counts().tolist()
+            # statistics of integer type are rounded, as they are computed as doubles
+            columns = [
+                (
+                    to_python(result)
+                    if field_type in ("FLOAT", "DOUBLE")
+                    else [
+                        None if value != value else round(value)
+                        for value in result.tolist()
+                    ]
+                )
+                for _, field_type, result in output_fields.values()
+            ]
+            with arcpy.da.UpdateCursor(
+                output, [*key_fields, "Point_Count", *output_fields.keys()]
+            ) as rows:
+                for row in rows:
+                    band = band_of_distance[row[1]] if len(distances) > 1 else 0
+                    index = band * len(row_keys) + row_of_key[row[0]]
+                    rows.updateRow(
+                        [
+                            *row[: len(key_fields)],
+                            counts[index],
+                            *(column[index] for column in columns),
+                        ]
+                    )
+
+        arcpy.AddMessage("   ✅ Done")
 
     def postExecute(self, parameters: List[Parameter]):
         """This method takes place after outputs are processed and
         added to the display."""
         return
+
+
+def distance_texts(value_text: typing.Optional[str]) -> List[str]:
+    """Split the buffer distances parameter into distances such as
+    "500 Meters", in the order they were entered."""
+    if not value_text:
+        return []
+    distances = [text.strip("'\" ") for text in value_text.split(";")]
+    return [text for text in distances if text]
+
+
+def buffer_distances(value_text: typing.Optional[str]) -> List[str]:
+    """Split the buffer distances parameter into distances such as
+    "500 Meters", from the smallest to the largest.
+
+    Several distances are compared in meters, which raises a ValueError for
+    units that cannot be converted to meters; a single distance is returned
+    as it is.
+    """
+    distances = distance_texts(value_text)
+    if len(distances) > 1:
+        distances.sort(key=lambda text: to_spatial_reference_units(text, 1.0))
+    return distances
+
+
+def statistic_field_type(
+    statistic: str, source_type: str, weighting: str, big_integers: bool = True
+) -> str:
+    """Return the AddField type of a summary statistic of a census field.
+
+    MIN and MAX keep the type of the census field, and SUM of an integer field
+    with CENTROID membership is a big integer. Counts are integers; means,
+    standard deviations and area weighted sums are doubles. Without
+    `big_integers` (see supports_big_integers), doubles are used instead of
+    big integers.
+    """
+    if statistic == "COUNT":
+        field_type = "LONG"
+    elif statistic in ("MIN", "MAX"):
+        field_type = NUMERIC_FIELD_TYPES[source_type]
+    elif statistic == "SUM" and weighting == "CENTROID":
+        field_type = "DOUBLE" if source_type in ("Single", "Double") else "BIGINTEGER"
+    else:
+        field_type = "DOUBLE"
+    if field_type == "BIGINTEGER" and not big_integers:
+        return "DOUBLE"
+    return field_type
+
+
+def install_version() -> Tuple[int, ...]:
+    """Return the major and minor version of ArcGIS Pro, or (0, 0) when it
+    cannot be read."""
+    version = arcpy.GetInstallInfo().get("Version", "")
+    try:
+        return tuple(int(part) for part in version.split(".")[:2])
+    except ValueError:
+        return (0, 0)
+
+
+def supports_big_integers(output: str) -> bool:
+    """Return whether big integer fields can be added to an output: they
+    were added in ArcGIS Pro 3.2 and shapefiles do not have them."""
+    if os.path.splitext(output)[1].lower() in (".shp", ".dbf"):
+        return False
+    return install_version() >= (3, 2)
+
+
+def buffer_rows(
+    buffers: str, lines: str, dissolve_field: typing.Optional[str], grouped: bool
+) -> Tuple[list, Dict[int, int], Dict[int, int]]:
+    """Return the summary rows: their keys (the ORIG_FID of each buffer's
+    line, or the dissolve values) and the row index of every buffer and line
+    OID.
+
+    Buffers are either one per line, one per dissolve value or (`grouped`)
+    one per line with each line belonging to the row of its dissolve value.
+    """
+    if dissolve_field:
+        with arcpy.da.SearchCursor(lines, ["OID@", dissolve_field]) as rows:
+            line_values = {row[0]: row[1] for row in rows}
+
+    if grouped:
+        row_keys = list(dict.fromkeys(line_values.values()))
+        row_of_key = {key: row for row, key in enumerate(row_keys)}
+        row_of_line = {oid: row_of_key[value] for oid, value in line_values.items()}
+        with arcpy.da.SearchCursor(buffers, ["OID@", "ORIG_FID"]) as rows:
+            row_of_buffer = {row[0]: row_of_line[row[1]] for row in rows}
+        return row_keys, row_of_buffer, row_of_line
+
+    key_field = dissolve_field or "ORIG_FID"
+    with arcpy.da.SearchCursor(buffers, ["OID@", key_field]) as rows:
+        buffer_keys = [(row[0], row[1]) for row in rows]
+    row_keys = [key for _, key in buffer_keys]
+    row_of_buffer = {oid: row for row, (oid, _) in enumerate(buffer_keys)}
+    row_of_key = {key: row for row, key in enumerate(row_keys)}
+    if dissolve_field:
+        row_of_line = {oid: row_of_key[value] for oid, value in line_values.items()}
+    else:
+        row_of_line = dict(row_of_key)
+    return row_keys, row_of_buffer, row_of_line
+
+
+def build_distance_bands(
+    lines: str,
+    centroids: str,
+    distances: List[str],
+    cumulative: bool,
+    row_keys: list,
+    row_of_line: Dict[int, int],
+    key: str,
+) -> MembershipMatrix:
+    """Assign the census centroids in the largest buffers to distance bands.
+
+    The distance of each centroid to every line within the largest distance
+    is measured once; a centroid belongs to a row's band when the nearest
+    line of that row is within the band's distance.
+    """
+    spatial_reference = arcpy.Describe(centroids).spatialReference
+    if spatial_reference.type != "Projected":
+        arcpy.AddError(
+            "   ❌ Several buffer distances require census polygons in a projected "
+            "coordinate system"
+        )
+        raise arcpy.ExecuteError
+    bands = [
+        to_spatial_reference_units(distance, spatial_reference.metersPerUnit)
+        for distance in distances
+    ]
+
+    with arcpy.da.SearchCursor(centroids, ["OID@", "GISJOIN"]) as rows:
+        centroid_gisjoins = {row[0]: row[1] for row in rows}
+    column_ids = sorted(set(centroid_gisjoins.values()))
+    column_index = {gisjoin: index for index, gisjoin in enumerate(column_ids)}
+
+    near_table = "memory/CentroidLineDistances"
+    try:
+        arcpy.analysis.GenerateNearTable(
+            in_features=centroids,
+            near_features=lines,
+            out_table=near_table,
+            search_radius=distances[-1],
+            closest="ALL",
+            method="PLANAR",
+        )
+        with arcpy.da.SearchCursor(
+            near_table, ["IN_FID", "NEAR_FID", "NEAR_DIST"]
+        ) as rows:
+            near = [
+                (row_of_line[row[1]], column_index[centroid_gisjoins[row[0]]], row[2])
+                for row in rows
+                if row[1] in row_of_line
+            ]
+    finally:
+        if arcpy.Exists(near_table):
+            arcpy.management.Delete(near_table)
+
+    return distance_band_matrix(
+        [row for row, _, _ in near],
+        [column for _, column, _ in near],
+        [distance for _, _, distance in near],
+        row_keys,
+        column_ids,
+        bands,
+        cumulative,
+        key,
+    )
+
+
+def buffer_lines(
+    lines: str, out_buffers: str, distance: str, dissolve_field: typing.Optional[str]
+):
+    """Buffer the lines, dissolved by `dissolve_field` when it is set."""
+    arcpy.analysis.Buffer(
+        in_features=lines,
+        out_feature_class=out_buffers,
+        buffer_distance_or_field=distance,
+        line_side="FULL",
+        line_end_type="ROUND",
+        dissolve_option="LIST" if dissolve_field else None,
+        dissolve_field=dissolve_field,
+        method="PLANAR",
+    )
+
+
+def buffer_and_select_batch(
+    lines: str,
+    census: str,
+    partition_ids: List[int],
+    distance: str,
+    dissolve_field: typing.Optional[str],
+) -> Tuple[str, str, Tuple[int, int, int]]:
+    """Buffer the lines of the given partitions (by PARTITIONID) and select
+    the census polygons they intersect, partition by partition, in a scratch
+    file geodatabase of their own. This is the entry point of the worker
+    processes used by `buffer_and_select_in_parallel`.
+
+    Returns the paths to the buffers and census areas of the batch and the
+    counts of `select_intersecting`. The caller is responsible for deleting
+    their geodatabase.
+    """
+    arcpy.env.overwriteOutput = True
+
+    # the results must outlive the worker, so the workspace is not used as a
+    # context manager; the caller deletes the geodatabase of the results
+    workspace = IntermediateWorkspace("SCRATCH_GDB")
+    workspace.create()
+    counts = (0, 0, 0)
+    try:
+        partition_buffers = []
+        partition_areas = []
+        for partition_id in partition_ids:
+            partition_lines = arcpy.management.MakeFeatureLayer(
+                lines,
+                f"partition_lines_{partition_id}",
+                f"PARTITIONID = {partition_id}",
+            )[0]
+            partition_buffers.append(workspace.dataset(f"TrailsBuffer{partition_id}"))
+            buffer_lines(
+                partition_lines, partition_buffers[-1], distance, dissolve_field
+            )
+            arcpy.management.Delete(partition_lines)
+
+            partition_areas.append(workspace.dataset(f"Areas{partition_id}"))
+            partition_counts = select_intersecting(
+                census, partition_buffers[-1], partition_areas[-1]
+            )
+            counts = tuple(a + b for a, b in zip(counts, partition_counts))
+
+        buffers = workspace.dataset("TrailsBuffer")
+        arcpy.management.Merge(partition_buffers, buffers)
+        areas = workspace.dataset("Areas")
+        arcpy.management.Merge(partition_areas, areas)
+    except Exception:
+        workspace.delete()
+        raise
+
+    workspace.delete(keep=[buffers, areas])
+    return buffers, areas, counts
+
+
+def buffer_and_select_in_parallel(
+    lines: str,
+    census: str,
+    distance: str,
+    dissolve_field: typing.Optional[str],
+    partition_field: typing.Optional[str],
+    tile_size: typing.Optional[str],
+    workers: int,
+    out_buffers: str,
+    out_areas: str,
+) -> Tuple[int, int, int]:
+    """Same as buffering the lines and running `select_intersecting`, but the
+    lines are split into partitions (by `partition_field` or a regular tile
+    grid) that are processed in a pool of worker processes.
+
+    Every line (and every dissolve group) is buffered by exactly one worker.
+    Each worker reads the census polygons within its own buffers, which is
+    the halo of its partition, so census polygons near partition boundaries
+    can be selected by several workers; they are de-duplicated by GISJOIN.
+    The merged result therefore matches the serial run.
+    """
+    description = arcpy.Describe(lines)
+    spatial_reference = description.spatialReference
+    if not partition_field:
+        if tile_size:
+            tile = to_spatial_reference_units(
+                tile_size, spatial_reference.metersPerUnit
+            )
+        else:
+            # about four tiles per worker by default
+            extent = description.extent
+            tile = (
+                max(extent.width, extent.height) / math.ceil(math.sqrt(workers * 4))
+                or 1.0
+            )
+
+    with IntermediateWorkspace("SCRATCH_GDB") as shared_workspace:
+        # worker processes cannot read layers or the memory workspace of this
+        # process, so the lines are copied with their partition and original
+        # OID, and a filtered census layer is copied as well
+        arcpy.AddMessage("   ⌛ Splitting lines into partitions...")
+        shared_lines = shared_workspace.dataset("Lines")
+        out_path, out_name = os.path.split(shared_lines)
+        arcpy.management.CreateFeatureclass(
+            out_path,
+            out_name,
+            "POLYLINE",
+            template=lines,
+            has_m="SAME_AS_TEMPLATE",
+            has_z="SAME_AS_TEMPLATE",
+            spatial_reference=spatial_reference,
+        )
+        arcpy.management.AddFields(
+            shared_lines, [["PARTITIONID", "LONG"], ["LINE_OID", "LONG"]]
+        )
+        field_names = [
+            field.name
+            for field in arcpy.ListFields(lines)
+            if field.editable and field.type not in ("OID", "Geometry")
+        ]
+
+        partition_ids: Dict[typing.Hashable, int] = {}
+        partition_of_group: Dict[typing.Hashable, int] = {}
+        line_counts: Dict[int, int] = {}
+        key_fields = [partition_field] if partition_field else ["SHAPE@XY"]
+        with arcpy.da.SearchCursor(
+            lines, ["OID@", "SHAPE@", *field_names, *key_fields]
+        ) as rows, arcpy.da.InsertCursor(
+            shared_lines, ["SHAPE@", *field_names, "PARTITIONID", "LINE_OID"]
+        ) as out:
+            for oid, shape, *values in rows:
+                key = values.pop()
+                if not partition_field:
+                    # lines without geometry share a partition of their own
+                    key = tile_keys([key], tile)[0]
+                partition_id = partition_ids.setdefault(key, len(partition_ids))
+                if dissolve_field:
+                    # dissolve groups must not be split across partitions
+                    group = values[field_names.index(dissolve_field)]
+                    partition_id = partition_of_group.setdefault(group, partition_id)
+                line_counts[partition_id] = line_counts.get(partition_id, 0) + 1
+                out.insertRow([shape, *values, partition_id, oid])
+
+        census_source = arcpy.Describe(census).catalogPath
+        if int(arcpy.management.GetCount(census)[0]) != int(
+            arcpy.management.GetCount(census_source)[0]
+        ):
+            census_source = shared_workspace.dataset("Census")
+            arcpy.conversion.ExportFeatures(census, census_source)
+
+        batches = balanced_batches(line_counts, workers)
+        arcpy.AddMessage(
+            f"         {len(line_counts)} partitions in {len(batches)} batches"
+        )
+
+        arcpy.AddMessage("   ⌛ Buffering lines and identifying census areas...")
+        results = []
+        counts = (0, 0, 0)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=spawn_context()
+            ) as executor:
+                for result in executor.map(
+                    buffer_and_select_batch,
+                    itertools.repeat(arcpy.Describe(shared_lines).catalogPath),
+                    itertools.repeat(census_source),
+                    batches,
+                    itertools.repeat(distance),
+                    itertools.repeat(dissolve_field),
+                ):
+                    results.append(result)
+                    counts = tuple(a + b for a, b in zip(counts, result[2]))
+
+            arcpy.AddMessage("   ⌛ Merging partitions...")
+            arcpy.management.Merge([buffers for buffers, _, _ in results], out_buffers)
+            arcpy.management.Merge([areas for _, areas, _ in results], out_areas)
+        finally:
+            for buffers, _, _ in results:
+                arcpy.management.Delete(os.path.dirname(buffers))
+
+    # buffers of undissolved lines refer to the copied lines; point them back
+    # to the original lines like the serial Buffer does
+    if not dissolve_field:
+        with arcpy.da.UpdateCursor(out_buffers, ["ORIG_FID", "LINE_OID"]) as rows:
+            for row in rows:
+                rows.updateRow([row[1], row[1]])
+    existing_fields = {field.name for field in arcpy.ListFields(out_buffers)}
+    extra_fields = [
+        name for name in ["PARTITIONID", "LINE_OID"] if name in existing_fields
+    ]
+    if extra_fields:
+        arcpy.management.DeleteField(out_buffers, extra_fields)
+
+    arcpy.management.DeleteIdentical(out_areas, ["GISJOIN"])
+    area_count = int(arcpy.management.GetCount(out_areas)[0])
+    return counts[0], counts[1], area_count
+
+
+def select_intersecting(
+    census: str, buffers: str, out_features: str, chunk_size: int = 10000
+) -> Tuple[int, int, int]:
+    """Copy the census polygons that intersect any buffer, with all their
+    attributes, to `out_features`.
+
+    An STR-packed R-tree over the buffer extents discards most census
+    polygons by their extent; only the remaining candidates are tested
+    exactly. Returns the number of census polygons read, tested exactly and
+    copied.
+    """
+    description = arcpy.Describe(census)
+    spatial_reference = description.spatialReference
+
+    # buffers are read in the census coordinate system so extents compare
+    with arcpy.da.SearchCursor(
+        buffers, ["SHAPE@"], spatial_reference=spatial_reference
+    ) as rows:
+        buffer_shapes = [row[0] for row in rows if row[0] is not None]
+    tree = STRTree(
+        [
+            (shape.extent.XMin, shape.extent.YMin, shape.extent.XMax, shape.extent.YMax)
+            for shape in buffer_shapes
+        ]
+    )
+
+    out_path, out_name = os.path.split(out_features)
+    arcpy.management.CreateFeatureclass(
+        out_path or arcpy.env.workspace,
+        out_name,
+        "POLYGON",
+        template=census,
+        has_m="SAME_AS_TEMPLATE",
+        has_z="SAME_AS_TEMPLATE",
+        spatial_reference=spatial_reference,
+    )
+    field_names = [
+        field.name
+        for field in arcpy.ListFields(census)
+        if field.editable and field.type not in ("OID", "Geometry")
+    ]
+
+    census_count = candidate_count = area_count = 0
+    search_options = {}
+    if buffer_shapes and install_version() >= (3, 2):
+        # let the cursor skip census polygons outside all buffers' extent
+        # (cursors have a spatial filter since ArcGIS Pro 3.2; before, the
+        # tree query below skips them)
+        extent = arcpy.Extent(
+            min(shape.extent.XMin for shape in buffer_shapes),
+            min(shape.extent.YMin for shape in buffer_shapes),
+            max(shape.extent.XMax for shape in buffer_shapes),
+            max(shape.extent.YMax for shape in buffer_shapes),
+        )
+        search_options["spatial_filter"] = extent.polygon
+    with arcpy.da.SearchCursor(
+        census, ["SHAPE@", *field_names], **search_options
+    ) as rows, arcpy.da.InsertCursor(out_features, ["SHAPE@", *field_names]) as out:
+        while buffer_shapes:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            chunk = [row for row in chunk if row[0]]
+            census_count += len(chunk)
+
+            queries, items = tree.query_pairs(
+                [
+                    (
+                        row[0].extent.XMin,
+                        row[0].extent.YMin,
+                        row[0].extent.XMax,
+                        row[0].extent.YMax,
+                    )
+                    for row in chunk
+                ]
+            )
+            candidates: Dict[int, List[int]] = {}
+            for query, item in zip(queries.tolist(), items.tolist()):
+                candidates.setdefault(query, []).append(item)
+            candidate_count += len(candidates)
+
+            # census order is kept, so the output matches the input order
+            for query in sorted(candidates):
+                shape = chunk[query][0]
+                if any(
+                    not shape.disjoint(buffer_shapes[index])
+                    for index in candidates[query]
+                ):
+                    out.insertRow(chunk[query])
+                    area_count += 1
+
+    return census_count, candidate_count, area_count
+
+
+def write_output_shapes(
+    lines: str,
+    buffers: str,
+    dissolve_field: typing.Optional[str],
+    grouped: bool,
+    group_shapes: str,
+    distances: List[str],
+    cumulative: bool,
+    output: str,
+):
+    """Write the output shapes: the buffers (one set per distance, with a
+    BUFF_DISTANCE field when there are several) or, for grouped summaries,
+    the dissolved lines or dissolved buffers of each group.
+
+    `buffers` are the buffers of the largest distance. For RING bands, each
+    buffer has the buffer of the previous distance cut out of it.
+    """
+    if len(distances) == 1 and not grouped:
+        arcpy.conversion.ExportFeatures(in_features=buffers, out_features=output)
+        return
+
+    band_shapes = []
+    band_buffer = "memory/DistanceBandBuffer"
+    try:
+        for index, distance in enumerate(distances):
+            band = f"memory/DistanceBand{index}"
+            band_shapes.append(band)
+
+            if grouped and group_shapes == "LINES":
+                if index == 0:
+                    arcpy.analysis.PairwiseDissolve(
+                        lines, band, dissolve_field, multi_part="MULTI_PART"
+                    )
+                else:
+                    arcpy.management.CopyFeatures(band_shapes[0], band)
+            else:
+                source = buffers
+                if index < len(distances) - 1:
+                    source = band_buffer
+                    arcpy.analysis.Buffer(
+                        in_features=lines,
+                        out_feature_class=band_buffer,
+                        buffer_distance_or_field=distance,
+                        line_side="FULL",
+                        line_end_type="ROUND",
+                        dissolve_option=(
+                            "LIST" if dissolve_field and not grouped else None
+                        ),
+                        dissolve_field=None if grouped else dissolve_field,
+                        method="PLANAR",
+                    )
+                if grouped:
+                    arcpy.analysis.PairwiseDissolve(source, band, dissolve_field)
+                else:
+                    arcpy.management.CopyFeatures(source, band)
+                if arcpy.Exists(band_buffer):
+                    arcpy.management.Delete(band_buffer)
+
+            if len(distances) > 1:
+                arcpy.management.CalculateField(
+                    band,
+                    "BUFF_DISTANCE",
+                    repr(distance),
+                    "PYTHON3",
+                    field_type="TEXT",
+                )
+
+        if not cumulative and not (grouped and group_shapes == "LINES"):
+            # the shapes of each band are matched to the previous band by key
+            key_field = dissolve_field or "ORIG_FID"
+            for inner, outer in reversed(list(zip(band_shapes, band_shapes[1:]))):
+                with arcpy.da.SearchCursor(inner, [key_field, "SHAPE@"]) as rows:
+                    inner_shapes = {row[0]: row[1] for row in rows}
+                with arcpy.da.UpdateCursor(outer, [key_field, "SHAPE@"]) as rows:
+                    for row in rows:
+                        if row[0] in inner_shapes:
+                            rows.updateRow(
+                                [row[0], row[1].difference(inner_shapes[row[0]])]
+                            )
+
+        if len(band_shapes) == 1:
+            arcpy.conversion.ExportFeatures(
+                in_features=band_shapes[0], out_features=output
+            )
+        else:
+            arcpy.management.Merge(band_shapes, output)
+    finally:
+        for band in band_shapes:
+            if arcpy.Exists(band):
+                arcpy.management.Delete(band)
+
+
+def build_membership(
+    buffers: str,
+    census_features: str,
+    weighting: str,
+    row_keys: list,
+    row_of_buffer: Dict[int, int],
+    key: str,
+) -> MembershipMatrix:
+    """Find the census units in each row's buffers.
+
+    With CENTROID weighting, `census_features` are the census centroids and
+    a unit belongs to every row with a buffer its centroid falls in (once,
+    even when several buffers of the row contain it). With AREA weighting,
+    they are the census polygons and each unit is weighted by the share of
+    its area that lies inside the buffer.
+    """
+    pairs = "memory/BufferMembership"
+    try:
+        if weighting == "CENTROID":
+            arcpy.analysis.SpatialJoin(
+                target_features=buffers,
+                join_features=census_features,
+                out_feature_class=pairs,
+                join_operation="JOIN_ONE_TO_MANY",
+                join_type="KEEP_COMMON",
+                match_option="INTERSECT",
+            )
+            with arcpy.da.SearchCursor(pairs, ["TARGET_FID", "GISJOIN"]) as rows:
+                members = [(row[0], row[1], 1.0) for row in rows]
+        else:
+            with arcpy.da.SearchCursor(
+                census_features, ["GISJOIN", "SHAPE@AREA"]
+            ) as rows:
+                census_areas = {row[0]: row[1] for row in rows}
+            arcpy.analysis.PairwiseIntersect([buffers, census_features], pairs)
+            buffer_fid = f"FID_{os.path.basename(buffers)}"
+            with arcpy.da.SearchCursor(
+                pairs, [buffer_fid, "GISJOIN", "SHAPE@AREA"]
+            ) as rows:
+                members = [
+                    (row[0], row[1], row[2] / census_areas[row[1]])
+                    for row in rows
+                    if census_areas.get(row[1])
+                ]
+    finally:
+        if arcpy.Exists(pairs):
+            arcpy.management.Delete(pairs)
+
+    column_ids = sorted({gisjoin for _, gisjoin, _ in members})
+    column_index = {gisjoin: index for index, gisjoin in enumerate(column_ids)}
+    return MembershipMatrix.from_pairs(
+        [row_of_buffer[oid] for oid, _, _ in members],
+        [column_index[gisjoin] for _, gisjoin, _ in members],
+        row_keys,
+        column_ids,
+        [weight for _, _, weight in members],
+        key,
+        merge="MAX" if weighting == "CENTROID" else "SUM",
+    )
+
+
+def membership_path(output: str) -> str:
+    """Return the path of the membership matrix of an output feature class:
+    a file next to it, or next to its geodatabase. A bare name is in the
+    current workspace."""
+    if not os.path.dirname(output) and arcpy.env.workspace:
+        output = os.path.join(arcpy.env.workspace, output)
+    folder = os.path.dirname(output)
+    parts = os.path.normpath(output).split(os.sep)
+    for index, part in enumerate(parts):
+        if part.lower().endswith(".gdb"):
+            folder = os.sep.join(parts[:index])
+            break
+
+    name = os.path.splitext(os.path.basename(output))[0]
+    return os.path.join(folder, f"{name}__Membership.npz")
+
+
+def csv_source(table: str) -> typing.Optional[str]:
+    """Return the path of the CSV or delimited text file behind a census data
+    table, or None when the table is not such a file or is a table view with
+    a selection or definition query (which only a cursor applies)."""
+    description = arcpy.Describe(table)
+    path = description.catalogPath
+    if os.path.splitext(path)[1].lower() not in (".csv", ".txt"):
+        return None
+    if getattr(description, "FIDSet", "") or getattr(description, "whereClause", ""):
+        return None
+    return path
+
+
+def layer_fingerprint(layer: str, field_names: typing.Iterable[str] = ()) -> str:
+    """Fingerprint the features of a layer (honoring its selection and
+    definition query) from their geometries and the given fields."""
+    spatial_reference = arcpy.Describe(layer).spatialReference
+    with arcpy.da.SearchCursor(layer, ["OID@", "SHAPE@WKB", *field_names]) as rows:
+        return fingerprint(
+            itertools.chain([(spatial_reference.exportToString(),)], rows)
+        )
+
+
+def modified_time(catalog_path: str) -> float:
+    """Return the last modification time of a table.
+
+    Tables inside a geodatabase are not files of their own, so the most
+    recent modification time of the files in the geodatabase is used.
+    """
+    path = catalog_path
+    while path and not os.path.exists(path):
+        path = os.path.dirname(path)
+    if not path:
+        return 0.0
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+
+    return max(
+        [os.path.getmtime(path)]
+        + [
+            os.path.getmtime(entry.path)
+            for entry in os.scandir(path)
+            if entry.is_file()
+        ]
+    )
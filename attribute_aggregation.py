@@ -0,0 +1,118 @@
+"""Aggregation of attribute values by group in a single pass.
+
+Each output field gets a rule that describes how the values of the features
+in a group are combined:
+
+- UNIQUE_JOIN: text values joined with a delimiter, without duplicates, in
+  the order in which they first appear (values that are already joined with
+  the delimiter are split first)
+- FIRST: the first non-null value
+- SUM, MIN, MAX: the sum, smallest or largest non-null value
+- LONGEST: the longest text value (the first one when there is a tie)
+"""
+
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Sequence, Tuple
+
+RULES = ["UNIQUE_JOIN", "FIRST", "SUM", "MIN", "MAX", "LONGEST"]
+
+
+def _unique_join(delimiter: str) -> Tuple[Callable, Callable, Callable]:
+    def add(state: Dict[str, None], value) -> Dict[str, None]:
+        for item in str(value).split(delimiter):
+            if item:
+                state.setdefault(item, None)
+        return state
+
+    # a dict keeps the insertion order, unlike a set
+    return dict, add, lambda state: delimiter.join(state) if state else None
+
+
+_MISSING = object()
+
+# rule -> (create state, add non-null value to state, state to result)
+_SIMPLE_RULES: Dict[str, Tuple[Callable, Callable, Callable]] = {
+    "FIRST": (
+        lambda: _MISSING,
+        lambda state, value: value if state is _MISSING else state,
+        lambda state: None if state is _MISSING else state,
+    ),
+    "SUM": (
+        lambda: None,
+        lambda state, value: (state or 0) + value,
+        lambda state: state,
+    ),
+    "MIN": (
+        lambda: None,
+        lambda state, value: value if state is None or value < state else state,
+        lambda state: state,
+    ),
+    "MAX": (
+        lambda: None,
+        lambda state, value: value if state is None or value > state else state,
+        lambda state: state,
+    ),
+    "LONGEST": (
+        lambda: None,
+        lambda state, value: (
+            value if state is None or len(str(value)) > len(str(state)) else state
+        ),
+        lambda state: state,
+    ),
+}
+
+
+class AttributeAggregator(object):
+    """Collects the values of several fields per group and combines them with
+    one rule per field."""
+
+    def __init__(self, rules: Sequence[str], delimiter: str = ", "):
+        unknown = [rule for rule in rules if rule not in RULES]
+        if unknown:
+            raise ValueError(f"Unknown aggregation rule(s): {', '.join(unknown)}")
+
+        self.rules = list(rules)
+        self._functions = [
+            _unique_join(delimiter) if rule == "UNIQUE_JOIN" else _SIMPLE_RULES[rule]
+            for rule in self.rules
+        ]
+        self._states: Dict[Hashable, List[Any]] = {}
+        self.counts: Dict[Hashable, int] = {}
+
+    def add(self, key: Hashable, values: Sequence[Any]):
+        """Add the values of one feature (in the order of the rules) to the
+        group `key`."""
+        states = self._states.get(key)
+        if states is None:
+            states = self._states[key] = [create() for create, _, _ in self._functions]
+            self.counts[key] = 0
+
+        self.counts[key] += 1
+        for index, value in enumerate(values):
+            if value is not None:
+                states[index] = self._functions[index][1](states[index], value)
+
+    def result(self, key: Hashable) -> List[Any]:
+        """Return the combined values of a group (all None for unknown groups)."""
+        states = self._states.get(key)
+        if states is None:
+            return [None] * len(self.rules)
+        return [finish(state) for (_, _, finish), state in zip(self._functions, states)]
+
+    def keys(self) -> List[Hashable]:
+        """Return the group keys in the order in which they were first seen."""
+        return list(self._states)
+
+
+def text_lengths(results: Iterable[Sequence[Any]], column_count: int) -> List[int]:
+    """Return the length of the longest text value in each column of the
+    aggregated results (0 for columns without text values).
+
+    This is used to size output text fields to fit their values instead of
+    using a fixed maximum length.
+    """
+    lengths = [0] * column_count
+    for values in results:
+        for index, value in enumerate(values):
+            if isinstance(value, str) and len(value) > lengths[index]:
+                lengths[index] = len(value)
+    return lengths
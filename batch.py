@@ -0,0 +1,224 @@
+"""Run the tools of the toolbox over many inputs without ArcGIS Pro's user
+interface.
+
+    python batch.py jobs.json --workers 4 --retries 2
+
+The jobs of the manifest (see `batch_jobs`) run in a pool of worker
+processes. Every job gets a scratch workspace of its own and starts from the
+default geoprocessing environment, so jobs running side by side do not share
+intermediate datasets or settings. Before a job runs, its tool validates
+its parameters as in the Geoprocessing pane; a job with invalid parameters
+fails without running. The status and time of every job is
+printed as soon as it finishes, and the messages of each job are written to
+a log file of its own.
+
+Failed jobs are retried (in a new pool, so a crashed worker does not take
+the retries down with it). Every attempt is recorded in a status log next to
+the manifest; running the same manifest again only runs the jobs that have
+not succeeded yet, or whose parameters changed.
+
+Run it with the Python of ArcGIS Pro (e.g. from the Python Command Prompt)
+from the folder of the toolbox.
+"""
+
+import argparse
+import importlib
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Optional, TextIO, Tuple
+import arcpy
+from batch_jobs import (
+    Job,
+    StatusLog,
+    job_parameters,
+    load_manifest,
+    pending_jobs,
+    status_log_path,
+)
+from partitioning import spawn_context
+
+# the tools that can run in a batch; the class of each tool has the name of
+# its module
+TOOLS = ["SummarizeCensusAsBufferAlongLines", "MergeConnectingTrails", "ExtendLines"]
+
+# the log file of the job that runs in this worker process
+_job_log: Optional[TextIO] = None
+
+
+def _log_messages():
+    """Copy the messages of the tools to the log of the running job."""
+    for name in ["AddMessage", "AddWarning", "AddError"]:
+        add = getattr(arcpy, name)
+
+        def add_and_log(message, add=add):
+            if _job_log is not None:
+                _job_log.write(f"{message}\n")
+                _job_log.flush()
+            add(message)
+
+        setattr(arcpy, name, add_and_log)
+
+
+def _file_name(job_id: str) -> str:
+    return re.sub(r"[^\w.-]", "_", job_id)
+
+
+def run_job(
+    job: Job, scratch_root: str, log_folder: str
+) -> Tuple[Optional[str], float]:
+    """Run a job in a scratch workspace of its own. This is the entry point
+    of the worker processes.
+
+    Returns the error of a failed job (None when it succeeded) and the
+    seconds it took.
+    """
+    global _job_log
+    start = time.perf_counter()
+    scratch = tempfile.mkdtemp(prefix=f"{_file_name(job.id)}_", dir=scratch_root)
+    log_path = os.path.join(log_folder, f"{_file_name(job.id)}.log")
+    with open(log_path, "a", encoding="utf-8") as log:
+        log.write(f"{datetime.now().isoformat(timespec='seconds')} {job.tool}\n")
+        _job_log = log
+        error = None
+        try:
+            arcpy.ResetEnvironments()
+            arcpy.env.scratchWorkspace = scratch
+            arcpy.env.workspace = scratch
+            arcpy.env.overwriteOutput = True
+
+            tool = getattr(importlib.import_module(job.tool), job.tool)()
+            tool.execute(job_parameters(tool, job), None)
+        except Exception as exception:
+            error = f"{type(exception).__name__}: {exception}".strip()
+            log.write(traceback.format_exc())
+        finally:
+            _job_log = None
+            shutil.rmtree(scratch, ignore_errors=True)
+    return error, time.perf_counter() - start
+
+
+def run_jobs(
+    jobs: List[Job],
+    log: StatusLog,
+    workers: int,
+    retries: int,
+    scratch_root: str,
+    log_folder: str,
+) -> List[Job]:
+    """Run the jobs, retrying failed ones up to `retries` times. Returns the
+    jobs that still failed."""
+
+    pending = list(jobs)
+    for attempt in range(1, retries + 2):
+        if not pending:
+            break
+        if attempt > 1:
+            print(f"⏳ Retrying {len(pending)} failed job(s), attempt {attempt}...")
+
+        failed = []
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)),
+            mp_context=spawn_context(),
+            initializer=_log_messages,
+        ) as executor:
+            futures = {
+                executor.submit(run_job, job, scratch_root, log_folder): job
+                for job in pending
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    error, seconds = future.result()
+                except Exception as exception:
+                    # e.g. a worker process that crashed
+                    error, seconds = f"{type(exception).__name__}: {exception}", 0.0
+
+                log.record(
+                    job, "failed" if error else "succeeded", attempt, seconds, error
+                )
+                if error:
+                    failed.append(job)
+                    print(
+                        f"   ❌ {job.id} ({job.tool}) failed in {seconds:.1f} s: {error}"
+                    )
+                else:
+                    print(f"   ✅ {job.id} ({job.tool}) in {seconds:.1f} s")
+                sys.stdout.flush()
+
+        # retries keep the order of the manifest
+        pending = [job for job in pending if job in failed]
+    return pending
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", help="JSON file with the jobs to run")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=max(multiprocessing.cpu_count() // 2, 1),
+        help="number of jobs that run at the same time (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=1,
+        help="times a failed job is run again (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--logs",
+        help="folder of the job logs (default: a folder next to the manifest)",
+    )
+    parser.add_argument(
+        "--rerun",
+        action="store_true",
+        help="also run the jobs that already succeeded",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_manifest(args.manifest, TOOLS)
+    except (OSError, ValueError) as error:
+        print(f"❌ {error}")
+        return 2
+
+    log = StatusLog(status_log_path(args.manifest))
+    pending = list(jobs) if args.rerun else pending_jobs(jobs, log)
+    log_folder = args.logs or os.path.splitext(args.manifest)[0] + "_logs"
+    os.makedirs(log_folder, exist_ok=True)
+
+    workers = max(args.workers, 1)
+    print(
+        f"⏳ Running {len(pending)} of {len(jobs)} job(s) with {workers} worker(s); "
+        f"{len(jobs) - len(pending)} already succeeded"
+    )
+    start = time.perf_counter()
+    scratch_root = tempfile.mkdtemp(prefix="trails_batch_")
+    try:
+        failed = run_jobs(
+            pending, log, workers, max(args.retries, 0), scratch_root, log_folder
+        )
+    finally:
+        shutil.rmtree(scratch_root, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    if failed:
+        print(
+            f"❌ {len(failed)} job(s) failed after {elapsed:.1f} s: "
+            f"{', '.join(job.id for job in failed)} (see {log_folder})"
+        )
+        return 1
+    print(f"✅ {len(pending)} job(s) succeeded in {elapsed:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
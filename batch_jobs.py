@@ -0,0 +1,229 @@
+"""Jobs of the headless batch runner (see `batch.py`).
+
+A manifest is a JSON file with a list of jobs (or an object with a "jobs"
+list). Every job names a tool and the values of its parameters, by parameter
+name:
+
+    {
+        "jobs": [
+            {
+                "id": "greenville",
+                "tool": "ExtendLines",
+                "parameters": {
+                    "INPUT_POLYLINE_LAYER": "C:/data/greenville.gdb/trails",
+                    "INPUT_LINE_EXTEND_DISTANCE": "10 Meters",
+                    "INPUT_EXTEND_BOTH_DIRECTIONS": true
+                }
+            }
+        ]
+    }
+
+Booleans become "true" or "false", lists become multivalues separated by
+semicolons and lists of lists become value tables (such as attribute rules).
+
+Every attempt of a job is appended to a status log of JSON lines next to the
+manifest. A job whose last attempt with the same tool and parameters
+succeeded is not run again, so a batch can be restarted after failures.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class Job(object):
+    """A tool and the text values of its parameters."""
+
+    def __init__(self, job_id: str, tool: str, values: Dict[str, str]):
+        self.id = job_id
+        self.tool = tool
+        self.values = values
+
+    def signature(self) -> str:
+        """Return a hash of the tool and parameter values, so a changed job is
+        not mistaken for one that already succeeded."""
+        text = json.dumps([self.tool, self.values], sort_keys=True)
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def value_as_text(value: Any) -> Optional[str]:
+    """Convert a manifest value to the text of a parameter value."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, tuple)):
+        return ";".join(
+            (
+                " ".join(str(item) for item in row)
+                if isinstance(row, (list, tuple))
+                else str(row)
+            )
+            for row in value
+        )
+    return str(value)
+
+
+def load_manifest(path: str, tools: Sequence[str]) -> List[Job]:
+    """Read the jobs of a manifest. Raises ValueError when a job names an
+    unknown tool or reuses the id of another job."""
+    with open(path, "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    entries = manifest.get("jobs", []) if isinstance(manifest, dict) else manifest
+
+    jobs = []
+    for index, entry in enumerate(entries, start=1):
+        tool = entry.get("tool")
+        if tool not in tools:
+            raise ValueError(
+                f"Job {index} uses the unknown tool {tool!r} "
+                f"(expected one of {', '.join(tools)})"
+            )
+        job_id = str(entry.get("id") or f"{index}-{tool}")
+        if any(job.id == job_id for job in jobs):
+            raise ValueError(f"More than one job has the id {job_id!r}")
+        values = {
+            name: value_as_text(value)
+            for name, value in (entry.get("parameters") or {}).items()
+        }
+        jobs.append(Job(job_id, tool, values))
+    return jobs
+
+
+class JobParameter(object):
+    """Stands in for an `arcpy.Parameter` in a tool's `execute`. The value is
+    the one of the validated parameter definition (e.g. a ValueTable for a
+    value table parameter) and is kept apart from its text. Values from the
+    manifest and values set by the tool's validation are altered; other
+    parameters keep their default and are not, as in the Geoprocessing
+    pane."""
+
+    def __init__(
+        self, name: str, value: Any, value_as_text: Optional[str], altered: bool
+    ):
+        self.name = name
+        self.value = value
+        self.valueAsText = value_as_text
+        self.altered = altered
+
+
+def job_parameters(tool: Any, job: Job) -> List[JobParameter]:
+    """Validate the parameters of a job like the Geoprocessing pane does
+    before it runs a tool, and build the parameters of its `execute`.
+
+    The values of the job are set on the tool's parameter definitions (from
+    `getParameterInfo`), then the tool's `updateParameters` (which can fill
+    in derived values such as default outputs, but does not replace values
+    of the job) and `updateMessages` run on them. Raises ValueError for
+    parameters the tool does not have, required parameters without a value
+    and parameters with an error message.
+    """
+    definitions = tool.getParameterInfo()
+    names = [definition.name for definition in definitions]
+    unknown = [name for name in job.values if name not in names]
+    if unknown:
+        raise ValueError(f"{job.tool} has no parameter(s) {', '.join(unknown)}")
+
+    defaults = {definition.name: definition.valueAsText for definition in definitions}
+    given = {name: value for name, value in job.values.items() if value is not None}
+
+    def set_values():
+        for definition in definitions:
+            if definition.name in given:
+                definition.value = given[definition.name]
+
+    set_values()
+    tool.updateParameters(definitions)
+    set_values()
+    tool.updateMessages(definitions)
+
+    errors = [
+        f"{definition.name}: {definition.message}"
+        for definition in definitions
+        if definition.hasError()
+    ] + [
+        f"{definition.name}: a value is required"
+        for definition in definitions
+        if definition.parameterType == "Required"
+        and definition.enabled
+        and definition.valueAsText is None
+    ]
+    if errors:
+        raise ValueError(f"Invalid parameters of {job.tool}: " + "; ".join(errors))
+
+    return [
+        JobParameter(
+            definition.name,
+            definition.value,
+            definition.valueAsText,
+            definition.name in given
+            or definition.valueAsText != defaults[definition.name],
+        )
+        for definition in definitions
+    ]
+
+
+def status_log_path(manifest_path: str) -> str:
+    """Return the path of the status log of a manifest."""
+    return os.path.splitext(manifest_path)[0] + ".status.jsonl"
+
+
+class StatusLog(object):
+    """An append-only log of the attempts of the jobs of a manifest."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def records(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                # a line cut short by an interrupted run is ignored
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records
+
+    def succeeded(self) -> Dict[str, str]:
+        """Return the signature of every job whose last attempt succeeded."""
+        last: Dict[str, Dict[str, Any]] = {}
+        for record in self.records():
+            last[record.get("job")] = record
+        return {
+            job_id: record.get("signature")
+            for job_id, record in last.items()
+            if record.get("status") == "succeeded"
+        }
+
+    def record(
+        self,
+        job: Job,
+        status: str,
+        attempt: int,
+        seconds: float,
+        error: Optional[str] = None,
+    ):
+        entry = {
+            "job": job.id,
+            "tool": job.tool,
+            "signature": job.signature(),
+            "status": status,
+            "attempt": attempt,
+            "seconds": round(seconds, 3),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "error": error,
+        }
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+
+
+def pending_jobs(jobs: Sequence[Job], log: StatusLog) -> List[Job]:
+    """Return the jobs that have not succeeded with their current tool and
+    parameters."""
+    succeeded = log.succeeded()
+    return [job for job in jobs if succeeded.get(job.id) != job.signature()]
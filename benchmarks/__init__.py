@@ -0,0 +1,3 @@
+"""Benchmarks of the tools with synthetic data and an in-process arcpy
+stand-in, so performance can be measured outside of ArcGIS Pro (see
+`benchmarks.run`)."""
@@ -0,0 +1,1032 @@
+"""A minimal in-process stand-in for arcpy.
+
+It covers what the pure-Python code paths of the tools call: the `da`
+cursors, `Describe`, `ListFields` (also of CSV files), geometries built from
+points and arrays, parameters and messages, and the handful of `management`
+tools that create, copy, count and delete datasets. Of the geoprocessing
+tools that do real geometry work, only the ones the default path of
+SummarizeCensusAsBufferAlongLines runs are covered, coarsely: `Buffer`
+returns the extent of each line grown by the distance, `FeatureToPoint` the
+center of each extent and `SpatialJoin` joins points to the extents of the
+targets. Other tools raise `NotImplementedError`.
+
+Datasets are kept in memory in `datasets`, keyed by their path. Geometries
+store every part as a flat array of x, y coordinates, so a million features
+fit in memory. `disjoint` only compares extents, which is exact for the
+axis-aligned rectangles of the synthetic census data.
+
+Call `install()` before importing a tool module, so the tool imports the
+stand-in as `arcpy`.
+"""
+
+import ast
+import csv
+import itertools
+import os
+import re
+import shlex
+import struct
+import sys
+import tempfile
+import types
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class ExecuteError(Exception):
+    pass
+
+
+env = types.SimpleNamespace()
+
+
+def ResetEnvironments():
+    env.__dict__.clear()
+    env.__dict__.update(
+        overwriteOutput=False,
+        workspace="memory",
+        scratchWorkspace=None,
+        scratchFolder=tempfile.gettempdir(),
+        scratchGDB=os.path.join(tempfile.gettempdir(), "scratch.gdb"),
+        parallelProcessingFactor=None,
+    )
+
+
+ResetEnvironments()
+
+# (severity, text) of every message, and whether messages are also printed
+messages: List[Tuple[str, str]] = []
+echo = False
+
+
+def _message(severity: str, text: str):
+    messages.append((severity, str(text)))
+    if echo:
+        print(text)
+
+
+def AddMessage(text: str):
+    _message("message", text)
+
+
+def AddWarning(text: str):
+    _message("warning", text)
+
+
+def AddError(text: str):
+    _message("error", text)
+
+
+def SetProgressorLabel(label: str):
+    pass
+
+
+def AddFieldDelimiters(datasource: str, field: str) -> str:
+    return field
+
+
+def CheckExtension(code: str) -> str:
+    return "Unavailable"
+
+
+def GetInstallInfo() -> Dict[str, str]:
+    return {"ProductName": "ArcGISPro", "Version": "3.3"}
+
+
+########################################################
+# geometry
+
+
+class SpatialReference(object):
+    def __init__(
+        self,
+        name: str = "Synthetic_Meters",
+        type: str = "Projected",
+        metersPerUnit: float = 1.0,
+    ):
+        self.name = name
+        self.type = type
+        self.metersPerUnit = metersPerUnit
+        self.factoryCode = 0
+
+
+class Point(object):
+    __slots__ = ("X", "Y", "Z", "M", "ID")
+
+    def __init__(self, X=0.0, Y=0.0, Z=None, M=None, ID=0):
+        self.X = X
+        self.Y = Y
+        self.Z = Z
+        self.M = M
+        self.ID = ID
+
+
+class Array(object):
+    def __init__(self, items: Optional[Iterable] = None):
+        self._items = list(items) if items is not None else []
+
+    @property
+    def count(self) -> int:
+        return len(self._items)
+
+    def getObject(self, index: int):
+        return self._items[index]
+
+    def replace(self, index: int, value):
+        self._items[index] = value
+
+    def add(self, value):
+        self._items.append(value)
+
+    append = add
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, index: int):
+        return self._items[index]
+
+
+class Extent(object):
+    def __init__(self, XMin=None, YMin=None, XMax=None, YMax=None):
+        self.XMin = XMin
+        self.YMin = YMin
+        self.XMax = XMax
+        self.YMax = YMax
+
+    @property
+    def width(self) -> float:
+        return self.XMax - self.XMin
+
+    @property
+    def height(self) -> float:
+        return self.YMax - self.YMin
+
+    @property
+    def polygon(self) -> "Polygon":
+        return Polygon.from_coordinates(
+            [
+                [
+                    self.XMin,
+                    self.YMin,
+                    self.XMin,
+                    self.YMax,
+                    self.XMax,
+                    self.YMax,
+                    self.XMax,
+                    self.YMin,
+                    self.XMin,
+                    self.YMin,
+                ]
+            ]
+        )
+
+    def disjoint(self, other: "Extent") -> bool:
+        return (
+            self.XMax < other.XMin
+            or other.XMax < self.XMin
+            or self.YMax < other.YMin
+            or other.YMax < self.YMin
+        )
+
+
+class Geometry(object):
+    """A geometry of one or more parts. Z and M values are not kept."""
+
+    # the WKB type of a single part and of the multipart geometry
+    _wkb_types = (0, 0)
+
+    def __init__(
+        self,
+        inputs=None,
+        spatial_reference: Optional[SpatialReference] = None,
+        has_z: bool = False,
+        has_m: bool = False,
+    ):
+        items = list(inputs) if inputs is not None else []
+        if items and isinstance(items[0], Point):
+            items = [items]
+        self._parts = [
+            array("d", [value for point in part for value in (point.X, point.Y)])
+            for part in items
+        ]
+        self.spatialReference = spatial_reference
+        self._extent = None
+
+    @classmethod
+    def from_coordinates(
+        cls,
+        parts: Sequence[Sequence[float]],
+        spatial_reference: Optional[SpatialReference] = None,
+    ) -> "Geometry":
+        """Create a geometry from flat `x, y, x, y...` sequences, one per
+        part, without creating points."""
+        geometry = cls.__new__(cls)
+        geometry._parts = [array("d", part) for part in parts]
+        geometry.spatialReference = spatial_reference
+        geometry._extent = None
+        return geometry
+
+    @property
+    def partCount(self) -> int:
+        return len(self._parts)
+
+    @property
+    def pointCount(self) -> int:
+        return sum(len(part) // 2 for part in self._parts)
+
+    def getPart(self, index: int) -> Array:
+        part = self._parts[index]
+        return Array(Point(part[i], part[i + 1]) for i in range(0, len(part), 2))
+
+    @property
+    def firstPoint(self) -> Optional[Point]:
+        return Point(*self._parts[0][:2]) if self._parts else None
+
+    @property
+    def lastPoint(self) -> Optional[Point]:
+        return Point(*self._parts[-1][-2:]) if self._parts else None
+
+    @property
+    def extent(self) -> Extent:
+        if self._extent is None:
+            xs = [x for part in self._parts for x in part[0::2]]
+            ys = [y for part in self._parts for y in part[1::2]]
+            self._extent = (
+                Extent(min(xs), min(ys), max(xs), max(ys)) if xs else Extent()
+            )
+        return self._extent
+
+    def disjoint(self, other: "Geometry") -> bool:
+        return self.extent.disjoint(other.extent)
+
+    @property
+    def WKB(self) -> bytes:
+        part_type, multi_type = self._wkb_types
+        chunks = [struct.pack("<BII", 1, multi_type, len(self._parts))]
+        for part in self._parts:
+            chunks.append(self._wkb_part(part_type, part))
+        return b"".join(chunks)
+
+    @staticmethod
+    def _wkb_part(part_type: int, part: array) -> bytes:
+        return struct.pack("<BII", 1, part_type, len(part) // 2) + part.tobytes()
+
+
+class Polyline(Geometry):
+    _wkb_types = (2, 5)
+
+    @property
+    def length(self) -> float:
+        total = 0.0
+        for part in self._parts:
+            for i in range(2, len(part), 2):
+                total += (
+                    (part[i] - part[i - 2]) ** 2 + (part[i + 1] - part[i - 1]) ** 2
+                ) ** 0.5
+        return total
+
+
+class PointGeometry(Geometry):
+    _wkb_types = (1, 4)
+
+    @property
+    def WKB(self) -> bytes:
+        return struct.pack("<BI", 1, 1) + self._parts[0].tobytes()
+
+
+class Polygon(Geometry):
+    _wkb_types = (3, 6)
+
+    @staticmethod
+    def _wkb_part(part_type: int, part: array) -> bytes:
+        # every part is a polygon with a single ring
+        return struct.pack("<BIII", 1, part_type, 1, len(part) // 2) + part.tobytes()
+
+
+########################################################
+# fields and parameters
+
+
+class Field(object):
+    def __init__(
+        self,
+        name: str = "",
+        type: str = "String",
+        aliasName: Optional[str] = None,
+        length: int = 0,
+        editable: bool = True,
+    ):
+        self.name = name
+        self.baseName = name
+        self.type = type
+        self.aliasName = aliasName or name
+        self.length = length or (255 if type == "String" else 4)
+        self.editable = editable
+        self.required = not editable
+        self.isNullable = editable
+
+
+class FieldMap(object):
+    def __init__(self):
+        self.inputFields: List[Tuple[str, str]] = []
+
+    def addInputField(self, table: str, field_name: str):
+        self.inputFields.append((table, field_name))
+
+
+class FieldMappings(object):
+    def __init__(self):
+        self.fieldMappings: List[FieldMap] = []
+
+    def addFieldMap(self, field_map: FieldMap):
+        self.fieldMappings.append(field_map)
+
+
+class ValueTable(object):
+    def __init__(self, columns: int = 1):
+        self.columnCount = columns
+        self.rows: List[list] = []
+
+    def addRow(self, value):
+        self.rows.append(value.split() if isinstance(value, str) else list(value))
+
+    @property
+    def rowCount(self) -> int:
+        return len(self.rows)
+
+
+class Parameter(object):
+    """A tool parameter. A parameter counts as altered once it has a value.
+    The text of a value table is split into rows, as arcpy does."""
+
+    def __init__(
+        self,
+        displayName: str = "",
+        name: str = "",
+        datatype: str = "GPString",
+        parameterType: str = "Required",
+        direction: str = "Input",
+        multiValue: bool = False,
+        category: Optional[str] = None,
+        enabled: bool = True,
+        **kwargs,
+    ):
+        self.displayName = displayName
+        self.name = name
+        self.datatype = datatype
+        self.parameterType = parameterType
+        self.direction = direction
+        self.multiValue = multiValue
+        self.category = category
+        self.enabled = enabled
+        self.filter = types.SimpleNamespace(type=None, list=[])
+        self.filters = [types.SimpleNamespace(type=None, list=[]) for _ in range(8)]
+        self.columns: List[list] = []
+        self.parameterDependencies: List[str] = []
+        self.value = None
+        self.hasBeenValidated = False
+        self.message = ""
+        self._error = False
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if self.datatype == "GPValueTable" and isinstance(value, str):
+            value = [shlex.split(row) for row in value.split(";") if row.strip()]
+        self._value = value
+
+    @property
+    def altered(self) -> bool:
+        return self.value is not None
+
+    @property
+    def valueAsText(self) -> Optional[str]:
+        if self.value is None:
+            return None
+        if isinstance(self.value, bool):
+            return "true" if self.value else "false"
+        if isinstance(self.value, (list, tuple)):
+            return ";".join(
+                (
+                    " ".join(str(item) for item in value)
+                    if isinstance(value, (list, tuple))
+                    else str(value)
+                )
+                for value in self.value
+            )
+        return str(self.value)
+
+    @property
+    def values(self) -> Optional[list]:
+        return self.value if isinstance(self.value, (list, tuple)) else None
+
+    def setErrorMessage(self, message: str):
+        self.message = message
+        self._error = True
+
+    def setWarningMessage(self, message: str):
+        self.message = message
+        self._error = False
+
+    def clearMessage(self):
+        self.message = ""
+        self._error = False
+
+    def hasError(self) -> bool:
+        return bool(self.message) and self._error
+
+    def hasWarning(self) -> bool:
+        return bool(self.message) and not self._error
+
+
+########################################################
+# datasets
+
+
+class Dataset(object):
+    """An in-memory table or feature class. Every row is a list of the
+    values of the fields, starting with OBJECTID (and Shape)."""
+
+    def __init__(
+        self,
+        path: str,
+        shape_type: Optional[str] = None,
+        spatial_reference: Optional[SpatialReference] = None,
+        has_z: bool = False,
+        has_m: bool = False,
+    ):
+        self.path = path
+        self.shape_type = shape_type
+        self.spatial_reference = spatial_reference or SpatialReference()
+        self.has_z = has_z
+        self.has_m = has_m
+        self.fields = [Field("OBJECTID", "OID", length=4, editable=False)]
+        if shape_type:
+            self.fields.append(Field("Shape", "Geometry", length=0, editable=False))
+        self.rows: Dict[int, list] = {}
+        self.next_oid = 1
+
+    def field_index(self, name: str) -> int:
+        if name == "OID@":
+            return 0
+        if name.upper().startswith("SHAPE@") and self.shape_type:
+            return 1
+        for index, field in enumerate(self.fields):
+            if field.name.lower() == name.lower():
+                return index
+        raise RuntimeError(f"Cannot find field '{name}' in {self.path}")
+
+    def add_field(self, field: Field):
+        if any(existing.name.lower() == field.name.lower() for existing in self.fields):
+            return
+        self.fields.append(field)
+        for row in self.rows.values():
+            row.append(None)
+
+    def insert(self, values: Sequence[Any]) -> int:
+        oid = self.next_oid
+        self.next_oid += 1
+        self.rows[oid] = [oid, *values]
+        return oid
+
+
+datasets: Dict[str, Dataset] = {}
+
+SHAPE_TYPES = {"POINT": "Point", "POLYLINE": "Polyline", "POLYGON": "Polygon"}
+
+FIELD_TYPES = {
+    "TEXT": "String",
+    "SHORT": "SmallInteger",
+    "LONG": "Integer",
+    "BIGINTEGER": "BigInteger",
+    "FLOAT": "Single",
+    "DOUBLE": "Double",
+    "DATE": "Date",
+    "GUID": "Guid",
+}
+
+
+def _key(path) -> str:
+    path = str(path)
+    # a bare name is a dataset of the current workspace
+    if not os.path.dirname(path) and env.workspace:
+        path = os.path.join(env.workspace, path)
+    return os.path.normcase(os.path.normpath(path))
+
+
+def _dataset(path) -> Dataset:
+    try:
+        return datasets[_key(path)]
+    except KeyError:
+        raise ExecuteError(f"ERROR 000732: Dataset {path} does not exist") from None
+
+
+def reset():
+    """Remove every dataset and message."""
+    datasets.clear()
+    messages.clear()
+
+
+def load_features(
+    path: str,
+    shape_type: str,
+    shapes: Iterable[Optional[Geometry]],
+    fields: Sequence[Tuple[str, str]] = (),
+    columns: Sequence[Sequence[Any]] = (),
+    spatial_reference: Optional[SpatialReference] = None,
+) -> Dataset:
+    """Create a feature class from geometries and the columns of its
+    `(name, type)` fields."""
+    dataset = Dataset(path, SHAPE_TYPES[shape_type.upper()], spatial_reference)
+    for name, field_type in fields:
+        dataset.fields.append(Field(name, field_type))
+    rows = zip(shapes, *columns) if columns else ((shape,) for shape in shapes)
+    for values in rows:
+        dataset.insert(values)
+    datasets[_key(path)] = dataset
+    return dataset
+
+
+def Exists(path) -> bool:
+    return _key(path) in datasets
+
+
+def _csv_table(path) -> Optional[Dataset]:
+    """Describe a CSV file as a table without rows: the type of each field is
+    guessed from its non-blank values in the first rows, like ArcGIS does."""
+    if os.path.splitext(str(path))[1].lower() not in (".csv", ".txt"):
+        return None
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8-sig", newline="") as file:
+        rows = csv.reader(file)
+        header = next(rows, [])
+        first_rows = list(itertools.islice(rows, 1000))
+    dataset = Dataset(str(path))
+    for column, name in enumerate(header):
+        values = [row[column] for row in first_rows if len(row) > column]
+        values = [value for value in values if value.strip()]
+        field_type = "String"
+        for parse, parsed_type in [(int, "Integer"), (float, "Double")]:
+            try:
+                for value in values:
+                    parse(value)
+            except ValueError:
+                continue
+            if values:
+                field_type = parsed_type
+            break
+        dataset.fields.append(Field(name, field_type))
+    return dataset
+
+
+def Describe(path):
+    dataset = _csv_table(path) or _dataset(path)
+    return types.SimpleNamespace(
+        catalogPath=dataset.path,
+        name=os.path.basename(dataset.path),
+        dataType="FeatureClass" if dataset.shape_type else "Table",
+        shapeType=dataset.shape_type,
+        spatialReference=dataset.spatial_reference,
+        hasZ=dataset.has_z,
+        hasM=dataset.has_m,
+        hasOID=True,
+        OIDFieldName="OBJECTID",
+        fields=list(dataset.fields),
+    )
+
+
+def ListFields(
+    path, wild_card: Optional[str] = None, field_type: str = "All"
+) -> List[Field]:
+    return list((_csv_table(path) or _dataset(path)).fields)
+
+
+########################################################
+# cursors
+
+_COMPARISON = re.compile(r"^\s*(\w+)\s*(>=|<=|<>|!=|=|<|>)\s*(.+?)\s*$")
+_MEMBERSHIP = re.compile(r"^\s*(\w+)\s+IN\s*\((.*)\)\s*$", re.IGNORECASE)
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    ">=": lambda a, b: a is not None and a >= b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    "<": lambda a, b: a is not None and a < b,
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a is not None and a != b,
+    "!=": lambda a, b: a is not None and a != b,
+}
+
+
+def _where(dataset: Dataset, where_clause: Optional[str]) -> Callable[[list], bool]:
+    """Compile the simple where clauses the tools use: comparisons and IN
+    lists of literals, joined with AND."""
+    if not where_clause:
+        return lambda row: True
+
+    tests = []
+    for term in re.split(r"\s+AND\s+", where_clause, flags=re.IGNORECASE):
+        membership = _MEMBERSHIP.match(term)
+        comparison = _COMPARISON.match(term)
+        if membership:
+            index = dataset.field_index(membership.group(1))
+            values = set(ast.literal_eval(f"[{membership.group(2)}]"))
+            tests.append(lambda row, index=index, values=values: row[index] in values)
+        elif comparison:
+            index = dataset.field_index(comparison.group(1))
+            operator = _OPERATORS[comparison.group(2)]
+            value = ast.literal_eval(comparison.group(3))
+            tests.append(
+                lambda row, index=index, operator=operator, value=value: operator(
+                    row[index], value
+                )
+            )
+        else:
+            raise NotImplementedError(
+                f"The arcpy stand-in does not support the where clause {where_clause!r}"
+            )
+    return lambda row: all(test(row) for test in tests)
+
+
+def _field_names(field_names) -> List[str]:
+    if isinstance(field_names, str):
+        return [name.strip() for name in field_names.split(";")]
+    return list(field_names)
+
+
+class _Cursor(object):
+    def __init__(
+        self,
+        in_table,
+        field_names,
+        where_clause: Optional[str] = None,
+        spatial_reference=None,
+        explode_to_points=False,
+        sql_clause=(None, None),
+        datum_transformation=None,
+        spatial_filter: Optional[Geometry] = None,
+        spatial_relationship=None,
+        search_order=None,
+    ):
+        self._dataset = _dataset(in_table)
+        self.fields = _field_names(field_names)
+        self._indexes = [self._dataset.field_index(name) for name in self.fields]
+        self._wkb = [name.upper() == "SHAPE@WKB" for name in self.fields]
+        self._where = _where(self._dataset, where_clause)
+        self._filter = spatial_filter.extent if spatial_filter is not None else None
+        self._oid: Optional[int] = None
+        self._iterator = self._rows()
+
+    def _rows(self):
+        filter_extent = self._filter
+        # a snapshot of the rows, so rows can be deleted while iterating
+        for oid, row in list(self._dataset.rows.items()):
+            if not self._where(row):
+                continue
+            if filter_extent is not None and (
+                row[1] is None or row[1].extent.disjoint(filter_extent)
+            ):
+                continue
+            self._oid = oid
+            values = [row[index] for index in self._indexes]
+            for position, wkb in enumerate(self._wkb):
+                if wkb and values[position] is not None:
+                    values[position] = values[position].WKB
+            yield values
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
+
+    next = __next__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def reset(self):
+        self._iterator = self._rows()
+
+
+class SearchCursor(_Cursor):
+    def __next__(self):
+        return tuple(next(self._iterator))
+
+    next = __next__
+
+
+class UpdateCursor(_Cursor):
+    def updateRow(self, values: Sequence[Any]):
+        row = self._dataset.rows[self._oid]
+        for index, value in zip(self._indexes, values):
+            if index:
+                row[index] = value
+
+    def deleteRow(self):
+        del self._dataset.rows[self._oid]
+
+
+class InsertCursor(object):
+    def __init__(
+        self, in_table, field_names, datum_transformation=None, explicit=False
+    ):
+        self._dataset = _dataset(in_table)
+        self.fields = _field_names(field_names)
+        self._indexes = [self._dataset.field_index(name) for name in self.fields]
+
+    def insertRow(self, values: Sequence[Any]) -> int:
+        row = [None] * (len(self._dataset.fields) - 1)
+        for index, value in zip(self._indexes, values):
+            if index:
+                row[index - 1] = value
+        return self._dataset.insert(row)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+da = types.SimpleNamespace(
+    SearchCursor=SearchCursor, UpdateCursor=UpdateCursor, InsertCursor=InsertCursor
+)
+
+
+########################################################
+# tools
+
+
+def _enabled(value, template: Optional[Dataset], attribute: str) -> bool:
+    if value == "SAME_AS_TEMPLATE":
+        return bool(template and getattr(template, attribute))
+    return value in ("ENABLED", True)
+
+
+def _create(out_path, out_name, shape_type, template, has_m, has_z, spatial_reference):
+    path = os.path.join(str(out_path), str(out_name))
+    template_dataset = _dataset(template) if template else None
+    dataset = Dataset(
+        path,
+        shape_type,
+        spatial_reference
+        or (template_dataset.spatial_reference if template_dataset else None),
+        _enabled(has_z, template_dataset, "has_z"),
+        _enabled(has_m, template_dataset, "has_m"),
+    )
+    if template_dataset:
+        for field in template_dataset.fields:
+            if field.type not in ("OID", "Geometry"):
+                dataset.fields.append(field)
+    if Exists(path) and not env.overwriteOutput:
+        raise ExecuteError(f"ERROR 000258: Output {path} already exists")
+    datasets[_key(path)] = dataset
+    return [path]
+
+
+def _create_feature_class(
+    out_path,
+    out_name,
+    geometry_type="POLYGON",
+    template=None,
+    has_m="DISABLED",
+    has_z="DISABLED",
+    spatial_reference=None,
+    **kwargs,
+):
+    return _create(
+        out_path,
+        out_name,
+        SHAPE_TYPES[geometry_type.upper()],
+        template,
+        has_m,
+        has_z,
+        spatial_reference,
+    )
+
+
+def _create_table(out_path, out_name, template=None, **kwargs):
+    return _create(out_path, out_name, None, template, "DISABLED", "DISABLED", None)
+
+
+def _add_field(
+    in_table,
+    field_name,
+    field_type,
+    field_precision=None,
+    field_scale=None,
+    field_length=None,
+    field_alias=None,
+    **kwargs,
+):
+    _dataset(in_table).add_field(
+        Field(
+            field_name,
+            FIELD_TYPES.get(field_type.upper(), field_type),
+            field_alias,
+            field_length or 0,
+        )
+    )
+    return [in_table]
+
+
+def _add_fields(in_table, field_description: Sequence[Sequence[Any]], **kwargs):
+    for definition in field_description:
+        name, field_type, alias, length = (list(definition) + [None, None])[:4]
+        _add_field(in_table, name, field_type, field_length=length, field_alias=alias)
+    return [in_table]
+
+
+def _get_count(in_rows) -> List[str]:
+    return [str(len(_dataset(in_rows).rows))]
+
+
+def _copy(in_features, out_features) -> Dataset:
+    source = _dataset(in_features)
+    dataset = Dataset(
+        str(out_features),
+        source.shape_type,
+        source.spatial_reference,
+        source.has_z,
+        source.has_m,
+    )
+    dataset.fields = list(source.fields)
+    for row in source.rows.values():
+        dataset.insert(row[1:])
+    datasets[_key(out_features)] = dataset
+    return dataset
+
+
+def _export_features(in_features, out_features, *args, **kwargs):
+    _copy(in_features, out_features)
+    return [out_features]
+
+
+def _derived(
+    in_features, out_feature_class, shape_type: str, extra_fields: Sequence[Field]
+) -> Tuple[Dataset, Dataset]:
+    """Create an output with the fields of the input and the extra fields."""
+    source = _dataset(in_features)
+    dataset = Dataset(str(out_feature_class), shape_type, source.spatial_reference)
+    dataset.fields.extend(
+        field for field in source.fields if field.type not in ("OID", "Geometry")
+    )
+    dataset.fields.extend(extra_fields)
+    datasets[_key(out_feature_class)] = dataset
+    return source, dataset
+
+
+def _buffer(
+    in_features,
+    out_feature_class,
+    buffer_distance_or_field,
+    line_side="FULL",
+    line_end_type="ROUND",
+    dissolve_option=None,
+    dissolve_field=None,
+    method=None,
+):
+    if dissolve_option not in (None, "NONE"):
+        raise NotImplementedError("The arcpy stand-in cannot dissolve buffers")
+    distance = float(str(buffer_distance_or_field).split()[0])
+    source, dataset = _derived(
+        in_features,
+        out_feature_class,
+        "Polygon",
+        [Field("BUFF_DIST", "Double"), Field("ORIG_FID", "Integer")],
+    )
+    for oid, row in source.rows.items():
+        if row[1] is None:
+            continue
+        extent = row[1].extent
+        grown = Extent(
+            extent.XMin - distance,
+            extent.YMin - distance,
+            extent.XMax + distance,
+            extent.YMax + distance,
+        )
+        dataset.insert([grown.polygon, *row[2:], distance, oid])
+    return [out_feature_class]
+
+
+def _feature_to_point(in_features, out_feature_class, point_location="CENTROID"):
+    source, dataset = _derived(
+        in_features, out_feature_class, "Point", [Field("ORIG_FID", "Integer")]
+    )
+    for oid, row in source.rows.items():
+        if row[1] is None:
+            continue
+        extent = row[1].extent
+        center = PointGeometry.from_coordinates(
+            [[(extent.XMin + extent.XMax) / 2, (extent.YMin + extent.YMax) / 2]]
+        )
+        dataset.insert([center, *row[2:], oid])
+    return [out_feature_class]
+
+
+def _spatial_join(
+    target_features,
+    join_features,
+    out_feature_class,
+    join_operation="JOIN_ONE_TO_ONE",
+    join_type="KEEP_ALL",
+    field_mapping=None,
+    match_option="INTERSECT",
+    **kwargs,
+):
+    if (join_operation, join_type, match_option) != (
+        "JOIN_ONE_TO_MANY",
+        "KEEP_COMMON",
+        "INTERSECT",
+    ):
+        raise NotImplementedError(
+            "The arcpy stand-in only joins one to many, keeping common features "
+            "that intersect"
+        )
+    from spatial_index import STRTree
+
+    targets, dataset = _derived(
+        target_features,
+        out_feature_class,
+        _dataset(target_features).shape_type,
+        [Field("TARGET_FID", "Integer"), Field("JOIN_FID", "Integer")],
+    )
+    joins = _dataset(join_features)
+    dataset.fields.extend(
+        field for field in joins.fields if field.type not in ("OID", "Geometry")
+    )
+
+    target_rows = [row for row in targets.rows.values() if row[1] is not None]
+    join_rows = [row for row in joins.rows.values() if row[1] is not None]
+    boxes = [row[1].extent for row in target_rows]
+    tree = STRTree([(box.XMin, box.YMin, box.XMax, box.YMax) for box in boxes])
+    points = [row[1].extent for row in join_rows]
+    queries, items = tree.query_pairs(
+        [(box.XMin, box.YMin, box.XMax, box.YMax) for box in points]
+    )
+    for target, join in sorted(zip(items.tolist(), queries.tolist())):
+        target_row, join_row = target_rows[target], join_rows[join]
+        dataset.insert([*target_row[1:], target_row[0], join_row[0], *join_row[2:]])
+    return [out_feature_class]
+
+
+def _truncate_table(in_table):
+    _dataset(in_table).rows.clear()
+    return [in_table]
+
+
+def _delete(in_data, data_type=None):
+    paths = in_data if isinstance(in_data, (list, tuple)) else [in_data]
+    for path in paths:
+        key = _key(path)
+        # deleting a workspace deletes the datasets in it
+        for name in [
+            name for name in datasets if name == key or name.startswith(key + os.sep)
+        ]:
+            del datasets[name]
+    return [in_data]
+
+
+class _Unsupported(types.SimpleNamespace):
+    """A toolbox of which the stand-in only covers the given tools."""
+
+    def __init__(self, toolbox: str, **tools):
+        super().__init__(**tools)
+        self._toolbox = toolbox
+
+    def __getattr__(self, name: str):
+        raise NotImplementedError(
+            f"arcpy.{self._toolbox}.{name} is not covered by the arcpy stand-in"
+        )
+
+
+management = _Unsupported(
+    "management",
+    AddField=_add_field,
+    AddFields=_add_fields,
+    CreateFeatureclass=_create_feature_class,
+    CreateTable=_create_table,
+    Delete=_delete,
+    FeatureToPoint=_feature_to_point,
+    GetCount=_get_count,
+    TruncateTable=_truncate_table,
+)
+analysis = _Unsupported("analysis", Buffer=_buffer, SpatialJoin=_spatial_join)
+conversion = _Unsupported("conversion", ExportFeatures=_export_features)
+topographic = _Unsupported("topographic")
+
+
+def install():
+    """Make `import arcpy` import the stand-in."""
+    sys.modules["arcpy"] = sys.modules[__name__]
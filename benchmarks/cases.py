@@ -0,0 +1,167 @@
+"""The benchmark cases.
+
+Every case loads synthetic data into the arcpy stand-in and then times the
+pure-Python part of a tool with it. A case takes the number of features and
+a seed and returns the CPU seconds spent in the timed part (the data is
+generated and loaded before the clock starts).
+
+The arcpy stand-in must be installed before this module is imported.
+"""
+
+import os
+import tempfile
+import time
+from typing import Callable, Dict
+
+import arcpy
+
+from benchmarks.synthetic import (
+    census_grid,
+    census_table_fields,
+    trail_attributes,
+    trail_network,
+    wrap_trails,
+    write_census_csv,
+)
+from ExtendLines import ExtendLines
+from MergeConnectingTrails import MergeConnectingTrails
+from SummarizeCensusAsBufferAlongLines import SummarizeCensusAsBufferAlongLines
+from summary_statistics import STATISTICS
+
+VERTICES_PER_LINE = 10
+CONNECTIVITY = 0.5
+CENSUS_FIELD_COUNT = 20
+
+
+def tool_parameters(tool, **values) -> list:
+    """Return the parameters of a tool with the given values."""
+    parameters = tool.getParameterInfo()
+    for parameter in parameters:
+        if parameter.name in values:
+            parameter.value = values[parameter.name]
+    return parameters
+
+
+def load_trails(path: str, feature_count: int, seed: int):
+    """Load a synthetic trail network into the stand-in."""
+    trails = trail_network(feature_count, VERTICES_PER_LINE, CONNECTIVITY, seed=seed)
+    attributes = trail_attributes(feature_count, seed)
+    arcpy.load_features(
+        path,
+        "POLYLINE",
+        (arcpy.Polyline.from_coordinates([line.ravel()]) for line in trails),
+        [("TRAIL_NAME", "String"), ("SURFACE", "String"), ("LENGTH_MI", "Double")],
+        list(attributes.values()),
+    )
+
+
+def extend_lines(feature_count: int, seed: int) -> float:
+    """ExtendLines: extend both ends of every trail in place."""
+    load_trails("memory/trails", feature_count, seed)
+    tool = ExtendLines()
+    parameters = tool_parameters(
+        tool,
+        INPUT_POLYLINE_LAYER="memory/trails",
+        INPUT_LINE_EXTEND_DISTANCE="10 Meters",
+        INPUT_EXTEND_BOTH_DIRECTIONS=True,
+    )
+
+    start = time.process_time()
+    tool.execute(parameters, None)
+    return time.process_time() - start
+
+
+def merge_connecting_trails(feature_count: int, seed: int) -> float:
+    """MergeConnectingTrails: group connected trails with the ENDPOINT_GRAPH
+    method, aggregate their attributes and write the merged trails."""
+    load_trails("memory/trails", feature_count, seed)
+    tool = MergeConnectingTrails()
+    parameters = tool_parameters(
+        tool,
+        INPUT="memory/trails",
+        OUTPUT="memory/merged",
+        MERGE_METHOD="ENDPOINT_GRAPH",
+        SNAP_TOLERANCE="2 Meters",
+    )
+
+    start = time.process_time()
+    tool.execute(parameters, None)
+    elapsed = time.process_time() - start
+
+    if not int(arcpy.management.GetCount("memory/merged")[0]):
+        raise RuntimeError("MergeConnectingTrails wrote no merged trails")
+    return elapsed
+
+
+def summarize_census(feature_count: int, seed: int) -> float:
+    """SummarizeCensusAsBufferAlongLines: buffer the trails, select the
+    census areas that intersect the buffers, join a census table to their
+    centroids and summarize every statistic of its fields per buffer.
+
+    There are a twentieth as many trails as census areas, spread over the
+    census grid. The stand-in buffers are the extents of the trails grown by
+    the buffer distance.
+    """
+    grid = census_grid(feature_count, seed=seed)
+    boxes = grid["boxes"]
+    arcpy.load_features(
+        "memory/census",
+        "POLYGON",
+        (
+            arcpy.Polygon.from_coordinates(
+                [[xmin, ymin, xmin, ymax, xmax, ymax, xmax, ymin, xmin, ymin]]
+            )
+            for xmin, ymin, xmax, ymax in boxes.tolist()
+        ),
+        [("GISJOIN", "String")],
+        [grid["gisjoins"]],
+    )
+
+    trails = wrap_trails(
+        trail_network(max(feature_count // 20, 1), VERTICES_PER_LINE, seed=seed),
+        float(boxes[:, 2:].max()),
+    )
+    arcpy.load_features(
+        "memory/trails",
+        "POLYLINE",
+        (arcpy.Polyline.from_coordinates([line.ravel()]) for line in trails),
+    )
+
+    field_names = census_table_fields(CENSUS_FIELD_COUNT)
+    with tempfile.TemporaryDirectory() as folder:
+        table = os.path.join(folder, "census.csv")
+        write_census_csv(table, grid["gisjoins"], CENSUS_FIELD_COUNT, seed=seed)
+        output = os.path.join(folder, "output.gdb", "summary")
+
+        tool = SummarizeCensusAsBufferAlongLines()
+        parameters = tool_parameters(
+            tool,
+            INPUT_CENSUS="memory/census",
+            INPUT_CENSUS_DATA=table,
+            INPUT_LINES="memory/trails",
+            INPUT_BUFFER_DISTANCE="100 Meters",
+            INPUT_SUMMARY_FIELDS=[
+                [name, name, statistic]
+                for name in field_names
+                for statistic in STATISTICS
+            ],
+            INPUT_POPULATION_FIELD=field_names[0],
+            OUTPUT_SUMMARY_BUFFER=output,
+        )
+
+        start = time.process_time()
+        tool.execute(parameters, None)
+        elapsed = time.process_time() - start
+
+        with arcpy.da.SearchCursor(output, ["Point_Count"]) as rows:
+            members = sum(row[0] or 0 for row in rows)
+    if not members:
+        raise RuntimeError("No census area fell in a buffer")
+    return elapsed
+
+
+CASES: Dict[str, Callable[[int, int], float]] = {
+    "ExtendLines": extend_lines,
+    "MergeConnectingTrails": merge_connecting_trails,
+    "SummarizeCensusAsBufferAlongLines": summarize_census,
+}
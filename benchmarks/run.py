@@ -0,0 +1,151 @@
+"""Run the benchmarks and compare their throughput with a stored baseline.
+
+Run it from the folder of the toolbox:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scales 1000,10000 --cases ExtendLines
+    python -m benchmarks.run --update-baseline
+
+Every case runs at every scale (a number of features) at least three
+times, small scales more often, and the median run counts. Runs are timed in
+CPU seconds of the process, which other processes on the machine disturb
+less than wall clock time. The run fails (exit code 1) when the throughput
+(features per CPU second) of a case falls more than the tolerance below its
+baseline. Baselines depend on the machine, so update them on the machine
+that runs the benchmarks.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+SCALES = [1_000, 10_000, 100_000, 1_000_000]
+
+# features timed per case and scale, so small scales are repeated
+TARGET_FEATURES = 300_000
+MIN_REPEATS = 3
+MAX_REPEATS = 7
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file).get("cases", {})
+
+
+def save_baseline(path: str, cases: Dict[str, Dict[str, float]]):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "machine": platform.platform(),
+                "python": platform.python_version(),
+                "cases": cases,
+            },
+            file,
+            indent=2,
+            sort_keys=True,
+        )
+        file.write("\n")
+
+
+def measure(case, feature_count: int, seed: int, repeats: int) -> float:
+    """Return the median throughput (features per second) of several runs."""
+    from benchmarks import arcpy_stand_in
+
+    seconds = []
+    for _ in range(repeats):
+        arcpy_stand_in.reset()
+        gc.collect()
+        seconds.append(case(feature_count, seed))
+    arcpy_stand_in.reset()
+    median = statistics.median(seconds)
+    return feature_count / median if median > 0 else float("inf")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scales",
+        default=",".join(str(scale) for scale in SCALES),
+        help="comma separated numbers of features (default: %(default)s)",
+    )
+    parser.add_argument("--cases", help="comma separated case names (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed throughput loss against the baseline (default: %(default)s)",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store the measured throughput as the new baseline",
+    )
+    args = parser.parse_args(argv)
+
+    # the tools must import the stand-in instead of arcpy
+    sys.path.insert(0, ROOT)
+    from benchmarks import arcpy_stand_in
+
+    arcpy_stand_in.install()
+    from benchmarks.cases import CASES
+
+    names = args.cases.split(",") if args.cases else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+    scales = [int(scale) for scale in args.scales.split(",")]
+
+    baseline = load_baseline(args.baseline)
+    measured: Dict[str, Dict[str, float]] = {}
+    regressions = []
+    print(
+        f"{'case':<36}{'features':>10}{'features/s':>14}{'baseline':>14}{'change':>9}"
+    )
+    for name in names:
+        for scale in scales:
+            repeats = max(MIN_REPEATS, min(MAX_REPEATS, TARGET_FEATURES // scale))
+            throughput = measure(CASES[name], scale, args.seed, repeats)
+            measured.setdefault(name, {})[str(scale)] = round(throughput, 1)
+
+            expected = baseline.get(name, {}).get(str(scale))
+            change = ""
+            if expected:
+                ratio = throughput / expected - 1
+                change = f"{ratio:+.0%}"
+                if ratio < -args.tolerance:
+                    regressions.append(f"{name} at {scale:,} features ({change})")
+            expected_text = f"{expected:,.0f}" if expected else "-"
+            print(
+                f"{name:<36}{scale:>10,}{throughput:>14,.0f}"
+                f"{expected_text:>14}{change:>9}",
+                flush=True,
+            )
+
+    if args.update_baseline:
+        for name, scales_measured in measured.items():
+            baseline.setdefault(name, {}).update(scales_measured)
+        save_baseline(args.baseline, baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if regressions:
+        print("Throughput regressed past the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
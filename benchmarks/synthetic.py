@@ -0,0 +1,129 @@
+"""Seeded generators of synthetic trail networks and census data.
+
+The same arguments always produce the same data, so benchmark runs can be
+compared with each other. Coordinates are in meters of a projected
+coordinate system, and the extent of the data grows with the number of
+features so its density stays the same at every scale.
+"""
+
+import math
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+TRAIL_NAMES = [
+    f"{name} {kind}"
+    for name in ["Swamp Rabbit", "Reedy River", "Palmetto", "Blue Ridge", "Saluda"]
+    for kind in ["Trail", "Greenway", "Path", "Connector"]
+]
+SURFACES = ["Asphalt", "Concrete", "Gravel", "Natural", "Boardwalk"]
+
+
+def trail_network(
+    feature_count: int,
+    vertices_per_line: int = 10,
+    connectivity: float = 0.5,
+    segment_length: float = 25.0,
+    seed: int = 0,
+) -> np.ndarray:
+    """Generate trails as random walks of `vertices_per_line` vertices.
+
+    With probability `connectivity`, a trail starts exactly where the
+    previous trail ended, so chains of connected trails form; every other
+    trail starts at a random location. Returns an array of shape
+    `(feature_count, vertices_per_line, 2)`.
+    """
+    rng = np.random.default_rng(seed)
+    vertices_per_line = max(vertices_per_line, 2)
+    extent = math.sqrt(feature_count) * segment_length * vertices_per_line
+
+    # gently turning headings, so trails do not fold back onto themselves
+    headings = rng.uniform(0, 2 * math.pi, (feature_count, 1)) + np.cumsum(
+        rng.normal(0, 0.3, (feature_count, vertices_per_line - 1)), axis=1
+    )
+    steps = np.stack([np.cos(headings), np.sin(headings)], axis=2) * segment_length
+    offsets = np.zeros((feature_count, vertices_per_line, 2))
+    offsets[:, 1:] = np.cumsum(steps, axis=1)
+
+    # a chain starts at every trail that is not connected to the previous one;
+    # the trails of a chain start at the sum of the offsets before them
+    connected = rng.random(feature_count) < connectivity
+    if feature_count:
+        connected[0] = False
+    chains = np.cumsum(~connected) - 1
+    chain_origins = rng.uniform(
+        0, extent, (int(chains[-1]) + 1 if feature_count else 0, 2)
+    )
+    ends = offsets[:, -1]
+    before = np.cumsum(ends, axis=0) - ends
+    chain_starts = np.flatnonzero(~connected)
+    starts = chain_origins[chains] + before - before[chain_starts][chains]
+
+    return np.round(starts[:, np.newaxis, :] + offsets, 3)
+
+
+def trail_attributes(feature_count: int, seed: int = 0) -> Dict[str, list]:
+    """Generate the attributes of synthetic trails: a name, a surface and a
+    length in miles."""
+    rng = np.random.default_rng(seed + 1)
+    return {
+        "TRAIL_NAME": [
+            TRAIL_NAMES[i] for i in rng.integers(0, len(TRAIL_NAMES), feature_count)
+        ],
+        "SURFACE": [SURFACES[i] for i in rng.integers(0, len(SURFACES), feature_count)],
+        "LENGTH_MI": np.round(rng.uniform(0.05, 3.0, feature_count), 2).tolist(),
+    }
+
+
+def census_grid(
+    feature_count: int, cell_size: float = 250.0, seed: int = 0
+) -> Dict[str, object]:
+    """Generate census areas as the cells of a square grid.
+
+    Returns the `(xmin, ymin, xmax, ymax)` box of every area and its GISJOIN,
+    in a random order (as census areas are rarely stored in spatial order).
+    """
+    rng = np.random.default_rng(seed + 2)
+    columns = max(math.ceil(math.sqrt(feature_count)), 1)
+    cells = rng.permutation(feature_count)
+    xmin = (cells % columns) * cell_size
+    ymin = (cells // columns) * cell_size
+    boxes = np.column_stack([xmin, ymin, xmin + cell_size, ymin + cell_size])
+    gisjoins = [f"G{cell:013d}" for cell in cells.tolist()]
+    return {"boxes": boxes.astype(np.float64), "gisjoins": gisjoins}
+
+
+def wrap_trails(trails: np.ndarray, extent: float) -> np.ndarray:
+    """Move every trail by whole multiples of `extent`, so that its extent
+    starts inside `(0, 0, extent, extent)` (the extent of a census grid)."""
+    shift = np.floor(trails.min(axis=1) / extent) * extent
+    return trails - shift[:, np.newaxis, :]
+
+
+def census_table_fields(field_count: int) -> List[str]:
+    """Return the names of the data fields of a synthetic census table."""
+    return [f"AAA{number:04d}" for number in range(1, field_count + 1)]
+
+
+def write_census_csv(
+    path: str,
+    gisjoins: Sequence[str],
+    field_count: int = 20,
+    blank_share: float = 0.01,
+    seed: int = 0,
+):
+    """Write a census data table in the layout of an NHGIS extract: GISJOIN,
+    a few text columns and `field_count` count fields, of which
+    `blank_share` are blank."""
+    rng = np.random.default_rng(seed + 3)
+    counts = rng.integers(0, 5000, (len(gisjoins), field_count))
+    blank = rng.random((len(gisjoins), field_count)) < blank_share
+    text = np.where(blank, "", counts.astype(str))
+
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        file.write(
+            ",".join(["GISJOIN", "YEAR", "STATE", *census_table_fields(field_count)])
+        )
+        file.write("\n")
+        for gisjoin, values in zip(gisjoins, text.tolist()):
+            file.write(f"{gisjoin},2020,South Carolina,{','.join(values)}\n")
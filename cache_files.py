@@ -0,0 +1,84 @@
+"""Files shared by concurrent runs of the tools, e.g. the jobs of a batch.
+
+Files are written to a temporary file next to them and moved into place, so
+a reader never sees a half-written file. Lock files (created exclusively)
+keep two runs from building the same cache entry at once; a lock file older
+than `STALE_LOCK_SECONDS` is left over from a run that did not finish and is
+taken over.
+"""
+
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import numpy as np
+
+STALE_LOCK_SECONDS = 3600.0
+
+
+def _temporary_path(path: str) -> str:
+    folder, name = os.path.split(path)
+    return os.path.join(folder, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def write_json(path: str, data: Any):
+    """Write a JSON file atomically."""
+    temporary = _temporary_path(path)
+    try:
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def save_array(path: str, array: np.ndarray):
+    """Write a `.npy` file atomically."""
+    temporary = _temporary_path(path)
+    try:
+        # a file object keeps np.save from appending another .npy suffix
+        with open(temporary, "wb") as file:
+            np.save(file, array)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def acquire_lock(path: str) -> bool:
+    """Create a lock file, or return False when another run holds it."""
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < STALE_LOCK_SECONDS:
+                    return False
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def release_lock(path: str):
+    """Delete a lock file."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def locked(path: str, poll_seconds: float = 0.2) -> Iterator[None]:
+    """Hold a lock file, waiting for other runs to release it first."""
+    while not acquire_lock(path):
+        time.sleep(poll_seconds)
+    try:
+        yield
+    finally:
+        release_lock(path)
@@ -0,0 +1,133 @@
+"""A persistent columnar cache of parsed census data tables.
+
+Each cached table is a folder with a sorted array of unique GISJOINs
+(`gisjoin.npy`), one `.npy` file per field and a `table.json` file that
+lists the cached fields, inside a folder named after the signature of the
+source table. Cached columns are opened as
+memory-mapped arrays, so a repeat run only reads the pages of the columns it
+actually uses.
+
+The signature combines the table path, its modification time and a hash of
+its schema. When it changes, the table is cached again in a new folder and
+the folders of older signatures are deleted. Fields that were not requested
+before are read from the source table and added to the cache. Runs that
+share the cache (e.g. the jobs of a batch) take turns updating a table, and
+files are written atomically (see cache_files), so a run never reads a
+half-written file.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from cache_files import locked, save_array, write_json
+from census_tables import ColumnChunk, columns_from_chunks
+
+# reads chunks of GISJOIN and the given fields from the source table
+ChunkReader = Callable[[List[str]], Iterable[ColumnChunk]]
+
+
+def table_signature(
+    table_path: str, modified_time: float, schema: Iterable[Tuple[str, str]]
+) -> str:
+    """Return the signature of a table from its path, modification time and
+    `(field name, field type)` pairs."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(os.path.normcase(os.path.abspath(table_path)).encode("utf-8"))
+    digest.update(repr(modified_time).encode("utf-8"))
+    digest.update(repr(sorted(schema)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _file_name(field_name: str) -> str:
+    # field names can differ only in case, which many file systems ignore
+    suffix = hashlib.blake2b(field_name.encode("utf-8"), digest_size=4).hexdigest()
+    return f"{field_name}_{suffix}.npy"
+
+
+class CensusTableCache(object):
+    """A folder of cached census data tables."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.hits = 0
+        self.misses = 0
+
+    def table_folder(self, table_path: str) -> str:
+        """Return the cache folder of a table."""
+        key = hashlib.blake2b(
+            os.path.normcase(os.path.abspath(table_path)).encode("utf-8"),
+            digest_size=8,
+        ).hexdigest()
+        return os.path.join(self.folder, key)
+
+    def columns(
+        self,
+        table_path: str,
+        signature: str,
+        field_names: Sequence[str],
+        read_chunks: ChunkReader,
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray], int]:
+        """Return the sorted unique GISJOINs, the requested columns and the
+        number of duplicate GISJOIN rows of a table.
+
+        Columns that are not cached yet (or a whole table whose signature
+        changed) are read with `read_chunks` and written to the cache first.
+        """
+        table_folder = self.table_folder(table_path)
+        folder = os.path.join(table_folder, signature)
+        metadata_path = os.path.join(folder, "table.json")
+        os.makedirs(table_folder, exist_ok=True)
+        with locked(os.path.join(table_folder, "update.lock")):
+            # folders of older signatures are deleted; files that another run
+            # still has memory-mapped are left for a later run to delete
+            for name in os.listdir(table_folder):
+                path = os.path.join(table_folder, name)
+                if name != signature and os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+
+            metadata = None
+            if os.path.exists(metadata_path):
+                with open(metadata_path, "r", encoding="utf-8") as file:
+                    metadata = json.load(file)
+
+            cached = set(metadata["fields"]) if metadata else set()
+            missing = [name for name in field_names if name not in cached]
+            if missing:
+                self.misses += 1
+                index, columns, duplicate_count = columns_from_chunks(
+                    missing, read_chunks(missing)
+                )
+                os.makedirs(folder, exist_ok=True)
+                if metadata is None:
+                    save_array(os.path.join(folder, "gisjoin.npy"), index)
+                    metadata = {
+                        "table": table_path,
+                        "signature": signature,
+                        "duplicates": duplicate_count,
+                        "fields": [],
+                    }
+                for name, column in columns.items():
+                    # object arrays cannot be memory-mapped, so store them as
+                    # text
+                    if column.dtype == object:
+                        column = column.astype(str)
+                    save_array(os.path.join(folder, _file_name(name)), column)
+                metadata["fields"].extend(missing)
+
+                # write the metadata last, so an interrupted run leaves the
+                # cache without the new fields instead of with broken ones
+                write_json(metadata_path, metadata)
+            else:
+                self.hits += 1
+
+        index = np.load(os.path.join(folder, "gisjoin.npy"), mmap_mode="r")
+        columns = {
+            name: np.load(os.path.join(folder, _file_name(name)), mmap_mode="r")
+            for name in field_names
+        }
+        return index, columns, metadata["duplicates"]
@@ -0,0 +1,285 @@
+"""Combination of census data tables (such as NHGIS extracts) on their
+GISJOIN field.
+
+Tables are stored column by column: a sorted array of unique GISJOINs plus
+one array per field. Rows are looked up with a binary search, so joining a
+few thousand census areas to a national table does not require a pass over
+the whole table.
+
+Tables are read in chunks of rows, and only GISJOIN and the requested fields
+are kept, so memory use depends on the number of requested fields rather than
+on the width of the table. CSV files are read without a cursor: each line is
+only split up to the last requested column, and the values of a column are
+converted to numbers a whole chunk at a time.
+"""
+
+import csv
+import itertools
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+# number of rows that are converted to columns at a time
+CHUNK_SIZE = 100_000
+
+# the GISJOINs of a chunk of rows and the columns of the requested fields
+ColumnChunk = Tuple[np.ndarray, Dict[str, np.ndarray]]
+
+
+def as_column(values: Sequence[Any]) -> np.ndarray:
+    """Convert the values of a field to a NumPy array.
+
+    Numbers become int64 or float64 arrays (null values become NaN, which
+    turns integers into floats), text becomes a unicode array (null values
+    become empty strings) and anything else an object array.
+    """
+    if all(value is None or isinstance(value, (int, float)) for value in values):
+        if any(value is None or isinstance(value, float) for value in values):
+            return np.array(
+                [np.nan if value is None else value for value in values],
+                dtype=np.float64,
+            )
+        return np.array(values, dtype=np.int64)
+
+    if all(value is None or isinstance(value, str) for value in values):
+        return np.array(["" if value is None else value for value in values], dtype=str)
+
+    return np.array(values, dtype=object)
+
+
+def text_column(values: Sequence[str]) -> np.ndarray:
+    """Convert the text values of a field (e.g. from a CSV file) to a NumPy
+    array: integers, numbers (with blank values as NaN) or text."""
+    text = np.array(values, dtype=str)
+    blank = np.char.str_len(np.char.strip(text)) == 0
+    try:
+        if not blank.any():
+            return text.astype(np.int64)
+    except ValueError:
+        pass
+    try:
+        return np.where(blank, "nan", text).astype(np.float64)
+    except ValueError:
+        return text
+
+
+def row_chunks(
+    field_names: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[ColumnChunk]:
+    """Convert rows of `(GISJOIN, *values)` to columns, `chunk_size` rows at a
+    time."""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        gisjoins = np.array([row[0] for row in chunk], dtype=str)
+        columns = {
+            name: as_column([row[position] for row in chunk])
+            for position, name in enumerate(field_names, start=1)
+        }
+        yield gisjoins, columns
+
+
+def text_delimiter(header_line: str) -> str:
+    """Detect the delimiter of a delimited text file from its header line,
+    defaulting to a comma."""
+    try:
+        return csv.Sniffer().sniff(header_line, delimiters=",\t").delimiter
+    except csv.Error:
+        return ","
+
+
+def csv_chunks(
+    path: str,
+    field_names: Sequence[str],
+    chunk_size: int = CHUNK_SIZE,
+    encoding: str = "utf-8-sig",
+) -> Iterator[ColumnChunk]:
+    """Read GISJOIN and the given fields of a CSV file, `chunk_size` rows at a
+    time.
+
+    The delimiter (a comma or a tab, like ArcGIS reads text files with) is
+    detected from the header line. Lines without quotes are only split up to the last requested column;
+    lines with quoted values (which may span several lines) are parsed with
+    the csv module.
+    """
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as file:
+        header_line = file.readline()
+        delimiter = text_delimiter(header_line)
+        header = next(csv.reader([header_line], delimiter=delimiter), [])
+        missing = [name for name in ["GISJOIN", *field_names] if name not in header]
+        if missing:
+            raise ValueError(f"Field(s) not found in {path}: {', '.join(missing)}")
+        positions = [header.index(name) for name in ["GISJOIN", *field_names]]
+        last = max(positions)
+
+        values: List[List[str]] = [[] for _ in positions]
+        for line in file:
+            if '"' in line:
+                # a quoted value can contain delimiters and line breaks
+                while line.count('"') % 2:
+                    next_line = next(file, None)
+                    if next_line is None:
+                        break
+                    line += next_line
+                parts = next(csv.reader([line], delimiter=delimiter))
+            else:
+                parts = line.rstrip("\r\n").split(delimiter, last + 1)
+            if len(parts) <= last:
+                if not line.strip():
+                    continue
+                parts += [""] * (last + 1 - len(parts))
+            for column, position in zip(values, positions):
+                column.append(parts[position])
+
+            if len(values[0]) == chunk_size:
+                yield _text_chunk(field_names, values)
+                values = [[] for _ in positions]
+
+        if values[0]:
+            yield _text_chunk(field_names, values)
+
+
+def _text_chunk(field_names: Sequence[str], values: List[List[str]]) -> ColumnChunk:
+    gisjoins = np.array(values[0], dtype=str)
+    return gisjoins, {
+        name: text_column(column) for name, column in zip(field_names, values[1:])
+    }
+
+
+def _concatenate(parts: List[np.ndarray]) -> np.ndarray:
+    """Concatenate the chunks of a column. Integer chunks are promoted to
+    numbers when other chunks have nulls; chunks of mixed kinds (such as
+    numbers and text) become an object array."""
+    kinds = {part.dtype.kind for part in parts}
+    if kinds <= {"i", "f"} or kinds == {"U"}:
+        return np.concatenate(parts)
+    return np.concatenate([part.astype(object) for part in parts])
+
+
+def columns_from_chunks(
+    field_names: Sequence[str], chunks: Iterable[ColumnChunk]
+) -> Tuple[np.ndarray, Dict[str, np.ndarray], int]:
+    """Combine chunks of columns into one column per field.
+
+    Only the first row of each GISJOIN is kept. Returns the sorted unique
+    GISJOINs, the columns (in the same order) and the number of duplicate
+    rows that were dropped.
+    """
+    gisjoin_parts = []
+    column_parts: Dict[str, List[np.ndarray]] = {name: [] for name in field_names}
+    for gisjoins, columns in chunks:
+        gisjoin_parts.append(gisjoins)
+        for name in field_names:
+            column_parts[name].append(columns[name])
+
+    if not gisjoin_parts:
+        return (
+            np.array([], dtype=str),
+            {name: np.array([]) for name in field_names},
+            0,
+        )
+
+    # np.unique returns the index of the first occurrence of each value
+    gisjoins = np.concatenate(gisjoin_parts)
+    index, first = np.unique(gisjoins, return_index=True)
+    columns = {name: _concatenate(parts)[first] for name, parts in column_parts.items()}
+    return index, columns, len(gisjoins) - len(index)
+
+
+def columns_from_rows(
+    field_names: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    chunk_size: int = CHUNK_SIZE,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray], int]:
+    """Convert rows of `(GISJOIN, *values)` to columns (see
+    `columns_from_chunks`)."""
+    return columns_from_chunks(field_names, row_chunks(field_names, rows, chunk_size))
+
+
+def to_python(column: np.ndarray) -> List[Any]:
+    """Convert a column back to Python values, with NaN as None."""
+    values = column.tolist()
+    if column.dtype.kind == "f":
+        return [None if value != value else value for value in values]
+    return values
+
+
+class CensusTableCombiner(object):
+    """An in-memory join of several census data tables on GISJOIN.
+
+    Only the requested fields are kept. When several tables provide the same
+    field, the value from the first table is used. Within a table, only the
+    first row of a GISJOIN is used; further rows are counted as duplicates.
+    """
+
+    def __init__(self, field_names: Sequence[str]):
+        self.field_names = list(field_names)
+        self.duplicate_count = 0
+        self._tables: List[Tuple[np.ndarray, Dict[str, np.ndarray]]] = []
+        self._filled = set()
+
+    def add_table(self, field_names: Sequence[str], rows: Iterable[Sequence[Any]]):
+        """Add the rows of one table. Each row is `(GISJOIN, *values)`, with
+        the values in the order of `field_names`."""
+        self.add_chunks(field_names, row_chunks(field_names, rows))
+
+    def add_chunks(self, field_names: Sequence[str], chunks: Iterable[ColumnChunk]):
+        """Add one table from chunks of columns (see `row_chunks` and
+        `csv_chunks`)."""
+        self.add_columns(*columns_from_chunks(field_names, chunks))
+
+    def add_columns(
+        self,
+        index: np.ndarray,
+        columns: Dict[str, np.ndarray],
+        duplicate_count: int = 0,
+    ):
+        """Add one table in columnar form: the sorted unique GISJOINs and an
+        array per field in the same order (memory-mapped arrays are not
+        copied)."""
+        new_columns = {
+            name: column
+            for name, column in columns.items()
+            if name in self.field_names and name not in self._filled
+        }
+        self._filled.update(new_columns)
+        self._tables.append((index, new_columns))
+        self.duplicate_count += duplicate_count
+
+    def unmatched_fields(self) -> List[str]:
+        """Return the requested fields that none of the tables provided."""
+        return [name for name in self.field_names if name not in self._filled]
+
+    def join(self, gisjoins: Sequence[str]) -> Tuple[List[List[Any]], np.ndarray]:
+        """Look up the values of many GISJOINs at once.
+
+        Returns one list of values (in the order of `field_names`, None when
+        missing) per GISJOIN and the number of tables that have a row for
+        each GISJOIN.
+        """
+        keys = np.array(gisjoins, dtype=str)
+        columns: List[List[Any]] = [[None] * len(keys) for _ in self.field_names]
+        table_counts = np.zeros(len(keys), dtype=np.int64)
+
+        for index, table_columns in self._tables:
+            if len(index) == 0:
+                continue
+            position = np.minimum(np.searchsorted(index, keys), len(index) - 1)
+            found = index[position] == keys
+            table_counts += found
+
+            rows = np.flatnonzero(found)
+            for name, column in table_columns.items():
+                values = columns[self.field_names.index(name)]
+                for row, value in zip(rows, to_python(column[position[rows]])):
+                    values[row] = value
+
+        return [list(row) for row in zip(*columns)], table_counts
+
+    @property
+    def table_count(self) -> int:
+        return len(self._tables)
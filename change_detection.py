@@ -0,0 +1,60 @@
+"""Detection of added, removed and modified features between two runs of a
+tool, based on a content hash of each feature.
+"""
+
+import hashlib
+from typing import Dict, Hashable, Iterable, List, Sequence, Set, Tuple
+
+
+def content_hash(geometry: bytes, values: Sequence) -> str:
+    """Hash the geometry (e.g. its WKB) and attribute values of a feature."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(bytes(geometry or b""))
+    digest.update(repr(tuple(values)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def diff_hashes(
+    previous: Dict[Hashable, str], current: Dict[Hashable, str]
+) -> Tuple[Set[Hashable], Set[Hashable], Set[Hashable]]:
+    """Compare the content hashes of two runs keyed by feature id.
+
+    Returns the sets of `(added, removed, modified)` feature ids.
+    """
+    added = current.keys() - previous.keys()
+    removed = previous.keys() - current.keys()
+    modified = {
+        key for key in current.keys() & previous.keys() if current[key] != previous[key]
+    }
+    return set(added), set(removed), modified
+
+
+def regroup_scope(
+    previous_groups: Sequence[int],
+    seeds: Iterable[int],
+    stale_previous_groups: Iterable[int],
+) -> Tuple[List[int], Set[int]]:
+    """Find the features that must be grouped again after a change.
+
+    `previous_groups` holds the group id each feature had in the previous
+    run (-1 for new features). `seeds` are the indexes of the features that
+    changed or may connect to a changed feature and `stale_previous_groups`
+    the previous group ids of removed or modified features.
+
+    Returns `(indexes, previous_group_ids)`: the seeds together with every
+    feature of a stale group or of a previous group of a seed, and the
+    previous groups to delete. Any other feature keeps its group: if it were
+    connected to one of these features, it would have been in the same
+    previous group, provided the grouping settings did not change.
+    """
+    seeds = set(seeds)
+    stale = set(stale_previous_groups)
+    stale.update(
+        previous_groups[index] for index in seeds if previous_groups[index] >= 0
+    )
+    indexes = [
+        index
+        for index, previous in enumerate(previous_groups)
+        if index in seeds or previous in stale
+    ]
+    return indexes, stale
@@ -0,0 +1,256 @@
+"""A compact, array-backed table of features.
+
+Geometries are stored in flat arrays: the coordinates of all vertices (`x`,
+`y` and optionally `z` and `m`), `part_offsets` with the first vertex of
+every part and `feature_offsets` with the first part of every feature. The
+parts of feature `i` are `feature_offsets[i]:feature_offsets[i + 1]` and the
+vertices of part `j` are `part_offsets[j]:part_offsets[j + 1]`; a feature
+without a geometry has no parts. The rings of polygons are stored as parts.
+
+Attributes are stored by column, one array per field, next to an array of
+feature ids (such as ObjectIDs).
+
+The algorithms of the tools run on these arrays, so they can be vectorized,
+tested and profiled without ArcGIS. Adapters convert tables from and to arcpy
+cursors (`feature_table_arcpy`) and GeoJSON and WKB (`geometry_io`).
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# a part as a sequence of (x, y), (x, y, z) or (x, y, z, m) vertices
+Part = Sequence[Sequence[Optional[float]]]
+
+
+def column(values: Sequence[Any]) -> np.ndarray:
+    """Store the values of a field as an array.
+
+    Integers, numbers and text without nulls become int64, float64 and
+    unicode arrays. Anything else (including fields with null values) becomes
+    an object array, so nulls and the exact values survive a round trip.
+    """
+    values = list(values)
+    for kind, dtype in [(int, np.int64), (float, np.float64), (str, str)]:
+        if values and all(type(value) is kind for value in values):
+            return np.array(values, dtype=dtype)
+    result = np.empty(len(values), dtype=object)
+    result[:] = values
+    return result
+
+
+def ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenate `arange(start, start + count)` for every start and count."""
+    starts = np.asarray(starts, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.cumsum(counts)
+    return np.repeat(starts - (ends - counts), counts) + np.arange(total)
+
+
+class FeatureTable(object):
+    """Features as coordinate buffers, offset arrays and attribute columns."""
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        part_offsets: np.ndarray,
+        feature_offsets: np.ndarray,
+        ids: Optional[np.ndarray] = None,
+        columns: Optional[Dict[str, np.ndarray]] = None,
+        z: Optional[np.ndarray] = None,
+        m: Optional[np.ndarray] = None,
+    ):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.z = None if z is None else np.asarray(z, dtype=np.float64)
+        self.m = None if m is None else np.asarray(m, dtype=np.float64)
+        self.part_offsets = np.asarray(part_offsets, dtype=np.int64)
+        self.feature_offsets = np.asarray(feature_offsets, dtype=np.int64)
+        self.ids = np.arange(self.feature_count) if ids is None else np.asarray(ids)
+        self.columns = dict(columns or {})
+
+    @classmethod
+    def from_features(
+        cls,
+        features: Iterable[Optional[Sequence[Part]]],
+        ids: Optional[Sequence[Any]] = None,
+        columns: Optional[Dict[str, Sequence[Any]]] = None,
+        has_z: bool = False,
+        has_m: bool = False,
+    ) -> "FeatureTable":
+        """Build a table from features given as lists of parts (or None for
+        a feature without a geometry). Missing z and m values become NaN."""
+        width = 4 if has_m else 3 if has_z else 2
+        blocks: List[np.ndarray] = []
+        part_counts: List[int] = []
+        for parts in features:
+            parts = parts if parts is not None else []
+            part_counts.append(len(parts))
+            for part in parts:
+                # None becomes NaN in a float array
+                try:
+                    vertices = np.array(part, dtype=np.float64).reshape(len(part), -1)
+                except ValueError:
+                    # vertices with different numbers of values
+                    vertices = np.array(
+                        [
+                            tuple(vertex) + (None,) * (4 - len(vertex))
+                            for vertex in part
+                        ],
+                        dtype=np.float64,
+                    )
+                if vertices.shape[1] < width:
+                    missing = np.full(
+                        (len(vertices), width - vertices.shape[1]), np.nan
+                    )
+                    vertices = np.hstack([vertices, missing])
+                blocks.append(vertices[:, :width])
+
+        vertices = np.concatenate(blocks) if blocks else np.zeros((0, width))
+        part_sizes = [len(block) for block in blocks]
+        return cls(
+            vertices[:, 0],
+            vertices[:, 1],
+            np.concatenate([[0], np.cumsum(part_sizes, dtype=np.int64)]),
+            np.concatenate([[0], np.cumsum(part_counts, dtype=np.int64)]),
+            None if ids is None else column(ids),
+            {name: column(values) for name, values in (columns or {}).items()},
+            vertices[:, 2] if has_z else None,
+            vertices[:, 3] if has_m else None,
+        )
+
+    @property
+    def feature_count(self) -> int:
+        return len(self.feature_offsets) - 1
+
+    @property
+    def part_count(self) -> int:
+        return len(self.part_offsets) - 1
+
+    @property
+    def vertex_count(self) -> int:
+        return len(self.x)
+
+    def part_features(self) -> np.ndarray:
+        """Return the feature of every part."""
+        return np.repeat(np.arange(self.feature_count), np.diff(self.feature_offsets))
+
+    def part_endpoints(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return `(feature, x, y)` of the first and the last vertex of every
+        part that has vertices, in part order."""
+        nonempty = np.diff(self.part_offsets) > 0
+        first = self.part_offsets[:-1][nonempty]
+        last = self.part_offsets[1:][nonempty] - 1
+        vertices = np.column_stack([first, last]).ravel()
+        features = np.repeat(self.part_features()[nonempty], 2)
+        return features, self.x[vertices], self.y[vertices]
+
+    def part(self, index: int) -> np.ndarray:
+        """Return the vertices of a part as rows of x, y (z, m)."""
+        start, end = self.part_offsets[index], self.part_offsets[index + 1]
+        values = [self.x[start:end], self.y[start:end]]
+        if self.z is not None or self.m is not None:
+            nan = np.full(end - start, np.nan)
+            values.append(nan if self.z is None else self.z[start:end])
+            if self.m is not None:
+                values.append(self.m[start:end])
+        return np.column_stack(values)
+
+    def feature_parts(self, index: int) -> List[np.ndarray]:
+        """Return the parts of a feature (see `part`)."""
+        return [
+            self.part(part)
+            for part in range(
+                self.feature_offsets[index], self.feature_offsets[index + 1]
+            )
+        ]
+
+    def extents(self) -> np.ndarray:
+        """Return the `(xmin, ymin, xmax, ymax)` of every feature (NaN for
+        features without vertices)."""
+        extents = np.full((self.feature_count, 4), np.nan)
+        vertex_starts = self.part_offsets[self.feature_offsets]
+        has_vertices = np.diff(vertex_starts) > 0
+        if has_vertices.any():
+            starts = vertex_starts[:-1][has_vertices]
+            for position, (values, reduce) in enumerate(
+                [
+                    (self.x, np.minimum),
+                    (self.y, np.minimum),
+                    (self.x, np.maximum),
+                    (self.y, np.maximum),
+                ]
+            ):
+                extents[has_vertices, position] = reduce.reduceat(values, starts)
+        return extents
+
+    def rows(self, field_names: Sequence[str]) -> Iterator[tuple]:
+        """Iterate over the values of the given fields, feature by feature,
+        as Python values."""
+        return zip(*[self.columns[name].tolist() for name in field_names])
+
+    def with_coordinates(self, x: np.ndarray, y: np.ndarray) -> "FeatureTable":
+        """Return a copy of the table with other x and y coordinates."""
+        return FeatureTable(
+            x,
+            y,
+            self.part_offsets,
+            self.feature_offsets,
+            self.ids,
+            self.columns,
+            self.z,
+            self.m,
+        )
+
+    def take(self, indices: Sequence[int]) -> "FeatureTable":
+        """Return the given features, in the given order."""
+        indices = np.asarray(indices, dtype=np.int64)
+        part_counts = np.diff(self.feature_offsets)[indices]
+        parts = ranges(self.feature_offsets[:-1][indices], part_counts)
+        vertex_counts = np.diff(self.part_offsets)[parts]
+        vertices = ranges(self.part_offsets[:-1][parts], vertex_counts)
+        return FeatureTable(
+            self.x[vertices],
+            self.y[vertices],
+            np.concatenate([[0], np.cumsum(vertex_counts)]),
+            np.concatenate([[0], np.cumsum(part_counts)]),
+            self.ids[indices],
+            {name: values[indices] for name, values in self.columns.items()},
+            None if self.z is None else self.z[vertices],
+            None if self.m is None else self.m[vertices],
+        )
+
+    def merge(self, labels: Sequence[int]) -> "FeatureTable":
+        """Combine the features with the same label into one multipart
+        feature, with their parts in feature order.
+
+        The result has one feature per label, sorted by label, with the label
+        as its id. Attributes are not carried over (see
+        `attribute_aggregation` to combine them).
+        """
+        labels = np.asarray(labels)
+        order = np.argsort(labels, kind="stable")
+        merged = self.take(order)
+        unique, counts = np.unique(labels[order], return_counts=True)
+        part_counts = (
+            np.add.reduceat(
+                np.diff(merged.feature_offsets),
+                np.concatenate([[0], np.cumsum(counts)[:-1]]),
+            )
+            if len(unique)
+            else np.zeros(0, dtype=np.int64)
+        )
+        return FeatureTable(
+            merged.x,
+            merged.y,
+            merged.part_offsets,
+            np.concatenate([[0], np.cumsum(part_counts)]),
+            unique,
+            None,
+            merged.z,
+            merged.m,
+        )
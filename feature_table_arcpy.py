@@ -0,0 +1,146 @@
+from typing import Dict, Optional, Sequence
+import arcpy
+import numpy as np
+from feature_table import FeatureTable
+from geometry_io import from_wkb
+
+
+def _point_parts(geometry) -> Optional[list]:
+    """Return the parts of a geometry as lists of (x, y, z, m) vertices. A
+    None point within a part starts a new part (the next ring of a polygon
+    with holes)."""
+    if geometry is None:
+        return None
+    parts = []
+    for index in range(geometry.partCount):
+        vertices = []
+        for point in geometry.getPart(index):
+            if point is None:
+                if vertices:
+                    parts.append(vertices)
+                vertices = []
+                continue
+            vertices.append((point.X, point.Y, point.Z, point.M))
+        if vertices:
+            parts.append(vertices)
+    return parts
+
+
+def read_features(
+    layer: str,
+    field_names: Sequence[str] = (),
+    where_clause: Optional[str] = None,
+    id_field: str = "OID@",
+) -> FeatureTable:
+    """Read the geometries, ids and attributes of the features of a layer
+    into a table.
+
+    Geometries are read as WKB, which skips creating a point object for every
+    vertex, unless the layer has z or m values (which are only kept by
+    reading the points).
+    """
+    description = arcpy.Describe(layer)
+    has_z, has_m = bool(description.hasZ), bool(description.hasM)
+    shape_field = "SHAPE@" if has_z or has_m else "SHAPE@WKB"
+
+    geometries = []
+    ids = []
+    values: Dict[str, list] = {name: [] for name in field_names}
+    with arcpy.da.SearchCursor(
+        layer, [shape_field, id_field, *field_names], where_clause
+    ) as rows:
+        for row in rows:
+            geometries.append(row[0])
+            ids.append(row[1])
+            for name, value in zip(field_names, row[2:]):
+                values[name].append(value)
+
+    if shape_field == "SHAPE@WKB":
+        return from_wkb(geometries, ids, values)
+    return FeatureTable.from_features(
+        (_point_parts(geometry) for geometry in geometries),
+        ids,
+        values,
+        has_z=has_z,
+        has_m=has_m,
+    )
+
+
+def geometry(
+    table: FeatureTable,
+    index: int,
+    kind: str,
+    spatial_reference,
+    has_z: bool = False,
+    has_m: bool = False,
+):
+    """Build the arcpy geometry (a Polyline or Polygon) of a feature of a
+    table, or return None when the feature has no geometry."""
+    first_part, end_part = table.feature_offsets[index : index + 2].tolist()
+    if first_part == end_part:
+        return None
+
+    # convert the coordinates of the feature to Python floats at once, with
+    # NaN (a missing z or m value) as None
+    offsets = table.part_offsets[first_part : end_part + 1].tolist()
+    start, end = offsets[0], offsets[-1]
+    missing = [None] * (end - start)
+    z = table.z if has_z else None
+    m = table.m if has_m else None
+    zs = (
+        missing if z is None else [v if v == v else None for v in z[start:end].tolist()]
+    )
+    ms = (
+        missing if m is None else [v if v == v else None for v in m[start:end].tolist()]
+    )
+    points = [
+        arcpy.Point(*vertex)
+        for vertex in zip(
+            table.x[start:end].tolist(), table.y[start:end].tolist(), zs, ms
+        )
+    ]
+
+    shape = arcpy.Polygon if kind.upper() == "POLYGON" else arcpy.Polyline
+    return shape(
+        arcpy.Array(
+            [
+                arcpy.Array(points[part_start - start : part_end - start])
+                for part_start, part_end in zip(offsets, offsets[1:])
+            ]
+        ),
+        spatial_reference,
+        has_z,
+        has_m,
+    )
+
+
+def update_geometries(
+    layer: str,
+    table: FeatureTable,
+    mask: np.ndarray,
+    where_clause: Optional[str] = None,
+    kind: str = "POLYLINE",
+) -> int:
+    """Write the geometries of the features of a table selected by `mask`
+    back to the layer it was read from (with the "OID@" ids). Returns the
+    number of updated features."""
+    description = arcpy.Describe(layer)
+    has_z, has_m = bool(description.hasZ), bool(description.hasM)
+    indexes = {
+        feature_id: index
+        for index, feature_id in enumerate(table.ids.tolist())
+        if mask[index]
+    }
+
+    updated = 0
+    with arcpy.da.UpdateCursor(layer, ["OID@", "SHAPE@"], where_clause) as rows:
+        for row in rows:
+            index = indexes.get(row[0])
+            if index is None:
+                continue
+            row[1] = geometry(
+                table, index, kind, description.spatialReference, has_z, has_m
+            )
+            rows.updateRow(row)
+            updated += 1
+    return updated
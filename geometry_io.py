@@ -0,0 +1,273 @@
+"""Conversion of feature tables from and to GeoJSON and well-known binary
+(WKB) geometries.
+
+WKB may be little or big endian, with ISO (e.g. 1002 for a LineString Z) or
+extended (PostGIS) type codes for z and m values. Points, lines and polygons
+and their multipart types are supported. Polygon rings become parts of the
+feature table (see `feature_table`); when a table is written, every part of a
+polygon feature becomes a polygon with a single ring.
+"""
+
+import json
+import struct
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from feature_table import FeatureTable, column
+
+# the geometry kinds of a table and their (part, multipart) type codes
+WKB_TYPES = {"POINT": (1, 4), "POLYLINE": (2, 5), "POLYGON": (3, 6)}
+
+_EWKB_Z = 0x80000000
+_EWKB_M = 0x40000000
+_EWKB_SRID = 0x20000000
+
+# unsigned integers and doubles by byte order (1 for little endian)
+_UINT = {1: struct.Struct("<I"), 0: struct.Struct(">I")}
+_DOUBLE = {1: np.dtype("<f8"), 0: np.dtype(">f8")}
+
+
+def _read_geometry(
+    data: bytes, position: int, parts: List[np.ndarray]
+) -> Tuple[int, bool, bool]:
+    """Append the parts of the WKB geometry at `position` to `parts`. Returns
+    the position after the geometry and whether it has z and m values."""
+    order = data[position]
+    uint = _UINT[order]
+    (code,) = uint.unpack_from(data, position + 1)
+    position += 5
+    if code & _EWKB_SRID:
+        position += 4
+    has_z = bool(code & _EWKB_Z) or (code & 0xFFFF) // 1000 in (1, 3)
+    has_m = bool(code & _EWKB_M) or (code & 0xFFFF) // 1000 in (2, 3)
+    kind = (code & 0xFFFF) % 1000
+    width = 2 + has_z + has_m
+    dtype = _DOUBLE[order]
+
+    def read_points(count: int) -> np.ndarray:
+        points = np.frombuffer(data, dtype, count * width, position)
+        return points.reshape(count, width).astype(np.float64, copy=False)
+
+    if kind == 1:
+        parts.append(read_points(1))
+        return position + 8 * width, has_z, has_m
+    (count,) = uint.unpack_from(data, position)
+    position += 4
+    if kind == 2:
+        parts.append(read_points(count))
+        return position + 8 * width * count, has_z, has_m
+    if kind == 3:
+        for _ in range(count):
+            (point_count,) = uint.unpack_from(data, position)
+            position += 4
+            parts.append(read_points(point_count))
+            position += 8 * width * point_count
+        return position, has_z, has_m
+    if kind in (4, 5, 6, 7):
+        for _ in range(count):
+            position, part_z, part_m = _read_geometry(data, position, parts)
+            has_z, has_m = has_z or part_z, has_m or part_m
+        return position, has_z, has_m
+    raise ValueError(f"Unsupported WKB geometry type {code}")
+
+
+def _with_zm(part: np.ndarray, part_z: bool) -> np.ndarray:
+    """Pad a part to x, y, z, m columns (NaN for missing values)."""
+    if part.shape[1] == 4:
+        return part
+    padded = np.full((len(part), 4), np.nan)
+    padded[:, :2] = part[:, :2]
+    if part.shape[1] == 3:
+        padded[:, 2 if part_z else 3] = part[:, 2]
+    return padded
+
+
+def from_wkb(
+    geometries: Iterable[Optional[bytes]],
+    ids: Optional[Sequence[Any]] = None,
+    columns: Optional[Dict[str, Sequence[Any]]] = None,
+) -> FeatureTable:
+    """Build a table from WKB geometries (None for a feature without a
+    geometry)."""
+    features = []
+    any_z = any_m = False
+    for geometry in geometries:
+        if not geometry:
+            features.append((None, False))
+            continue
+        parts: List[np.ndarray] = []
+        _, has_z, has_m = _read_geometry(bytes(geometry), 0, parts)
+        any_z, any_m = any_z or has_z, any_m or has_m
+        features.append((parts, has_z))
+
+    # the parts are arrays already, so the table is built from them directly
+    width = 4 if any_m else 3 if any_z else 2
+    blocks = [
+        (_with_zm(part, has_z) if any_z or any_m else part)[:, :width]
+        for parts, has_z in features
+        for part in parts or []
+    ]
+    vertices = np.concatenate(blocks) if blocks else np.zeros((0, width))
+    part_counts = [len(parts or []) for parts, _ in features]
+    return FeatureTable(
+        vertices[:, 0],
+        vertices[:, 1],
+        np.concatenate([[0], np.cumsum([len(block) for block in blocks])]),
+        np.concatenate([[0], np.cumsum(part_counts)]),
+        None if ids is None else column(ids),
+        {name: column(values) for name, values in (columns or {}).items()},
+        vertices[:, 2] if any_z else None,
+        vertices[:, 3] if any_m else None,
+    )
+
+
+def to_wkb(table: FeatureTable, index: int, kind: str = "POLYLINE") -> Optional[bytes]:
+    """Return the little endian WKB of a feature as a multipart geometry (with
+    ISO type codes when the table has z or m values), or None when the
+    feature has no geometry."""
+    if table.feature_offsets[index] == table.feature_offsets[index + 1]:
+        return None
+    part_type, multi_type = WKB_TYPES[kind.upper()]
+    dimensions = (table.z is not None) * 1000 + (table.m is not None) * 2000
+    # only the ordinates the type code declares: x, y, then z and m if present
+    # (`part` would pad a table with m but no z with a NaN z column)
+    columns = [table.x, table.y, *(a for a in (table.z, table.m) if a is not None)]
+    first_part, end_part = table.feature_offsets[index : index + 2].tolist()
+    offsets = table.part_offsets[first_part : end_part + 1].tolist()
+    chunks = [struct.pack("<BII", 1, multi_type + dimensions, end_part - first_part)]
+    for start, end in zip(offsets, offsets[1:]):
+        if part_type == 1:
+            chunks.append(struct.pack("<BI", 1, part_type + dimensions))
+        elif part_type == 2:
+            chunks.append(struct.pack("<BII", 1, part_type + dimensions, end - start))
+        else:
+            chunks.append(
+                struct.pack("<BIII", 1, part_type + dimensions, 1, end - start)
+            )
+        chunks.append(
+            np.column_stack([column[start:end] for column in columns])
+            .astype("<f8")
+            .tobytes()
+        )
+    return b"".join(chunks)
+
+
+def _geojson_parts(geometry: Optional[Dict[str, Any]]) -> Optional[List[list]]:
+    if not geometry:
+        return None
+    kind = geometry["type"]
+    coordinates = geometry.get("coordinates")
+    if kind == "Point":
+        return [[coordinates]]
+    if kind in ("MultiPoint", "LineString"):
+        return (
+            [coordinates]
+            if kind == "LineString"
+            else [[point] for point in coordinates]
+        )
+    if kind in ("MultiLineString", "Polygon"):
+        return list(coordinates)
+    if kind == "MultiPolygon":
+        return [ring for polygon in coordinates for ring in polygon]
+    if kind == "GeometryCollection":
+        parts = [
+            part
+            for member in geometry.get("geometries", [])
+            for part in _geojson_parts(member) or []
+        ]
+        return parts or None
+    raise ValueError(f"Unsupported GeoJSON geometry type {kind}")
+
+
+def from_geojson(source: Union[str, Dict[str, Any]]) -> FeatureTable:
+    """Build a table from a GeoJSON FeatureCollection (or the path of a
+    GeoJSON file). The properties of the features become columns and the
+    "id" of the features (or their position) the ids."""
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8") as file:
+            source = json.load(file)
+    features = (
+        source.get("features", []) if source.get("type") != "Feature" else [source]
+    )
+
+    names: Dict[str, None] = {}
+    for feature in features:
+        names.update(dict.fromkeys(feature.get("properties") or {}))
+    parts = [_geojson_parts(feature.get("geometry")) for feature in features]
+    has_z = any(
+        len(vertex) > 2
+        for feature in parts
+        for part in feature or []
+        for vertex in part
+    )
+    ids = [feature.get("id", index) for index, feature in enumerate(features)]
+    return FeatureTable.from_features(
+        parts,
+        ids,
+        {
+            name: [(feature.get("properties") or {}).get(name) for feature in features]
+            for name in names
+        },
+        has_z=has_z,
+    )
+
+
+def to_geojson(table: FeatureTable, kind: str = "POLYLINE") -> Dict[str, Any]:
+    """Return a table as a GeoJSON FeatureCollection. Features are written as
+    single or multipart geometries depending on their number of parts."""
+    kind = kind.upper()
+    single, multi = {
+        "POINT": ("Point", "MultiPoint"),
+        "POLYLINE": ("LineString", "MultiLineString"),
+        "POLYGON": ("Polygon", "MultiPolygon"),
+    }[kind]
+    names = list(table.columns)
+    features = []
+    rows = table.rows(names) if names else [()] * table.feature_count
+    for index, (feature_id, values) in enumerate(zip(table.ids.tolist(), rows)):
+        # z values are kept, m values are not part of GeoJSON
+        parts = [
+            (
+                np.where(np.isnan(part[:, :3]), None, part[:, :3]).tolist()
+                if table.z is not None
+                else part[:, :2].tolist()
+            )
+            for part in table.feature_parts(index)
+        ]
+        if not parts:
+            geometry = None
+        elif kind == "POINT":
+            coordinates = [part[0] for part in parts]
+            geometry = (
+                {"type": single, "coordinates": coordinates[0]}
+                if len(coordinates) == 1
+                else {"type": multi, "coordinates": coordinates}
+            )
+        elif kind == "POLYLINE":
+            geometry = (
+                {"type": single, "coordinates": parts[0]}
+                if len(parts) == 1
+                else {"type": multi, "coordinates": parts}
+            )
+        else:
+            geometry = (
+                {"type": single, "coordinates": parts}
+                if len(parts) == 1
+                else {"type": multi, "coordinates": [[ring] for ring in parts]}
+            )
+        features.append(
+            {
+                "type": "Feature",
+                "id": feature_id,
+                "geometry": geometry,
+                "properties": dict(zip(names, values)),
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
+
+
+def write_geojson(table: FeatureTable, path: str, kind: str = "POLYLINE"):
+    """Write a table to a GeoJSON file."""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(to_geojson(table, kind), file)
@@ -0,0 +1,98 @@
+"""Placement and cleanup of the intermediate datasets of a tool run.
+
+`IntermediateWorkspace` keeps intermediates in the `memory` workspace or in
+a scratch file geodatabase (chosen from an estimate of their size in AUTO
+mode) and deletes them when the run ends, whether or not it succeeded.
+"""
+
+import os
+import typing
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List
+import arcpy
+from resources import available_memory_bytes, format_bytes
+
+
+class IntermediateWorkspace(object):
+    """The location of the intermediate datasets of a single tool run.
+
+    In the MEMORY mode intermediates are kept in the `memory` workspace. In
+    the SCRATCH_GDB mode they are written to a file geodatabase that is
+    created for the run in the scratch folder. The AUTO mode uses memory when
+    the estimated size of the intermediates fits comfortably in the available
+    memory and spills to a scratch geodatabase otherwise.
+
+    Use it as a context manager: every intermediate dataset (and the scratch
+    geodatabase) is deleted on exit, even when a stage raised an error.
+    """
+
+    def __init__(self, mode: str = "AUTO", estimated_bytes: int = 0):
+        if mode == "AUTO":
+            fits_in_memory = estimated_bytes < available_memory_bytes() / 2
+            mode = "MEMORY" if fits_in_memory else "SCRATCH_GDB"
+
+        self.mode = mode
+        self.path = "memory"
+        self.datasets: List[str] = []
+        self.bytes_written: Dict[str, int] = {}
+
+    def __enter__(self):
+        self.create()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.delete()
+        return False
+
+    def create(self):
+        """Create the scratch geodatabase (if the mode needs one)."""
+        if self.mode == "SCRATCH_GDB":
+            self.path = arcpy.management.CreateFileGDB(
+                arcpy.env.scratchFolder, f"intermediate_{uuid.uuid4().hex[:8]}.gdb"
+            )[0]
+
+    def delete(self, keep: typing.Iterable[str] = ()):
+        """Delete the intermediate datasets and the scratch geodatabase.
+
+        When datasets are kept, the scratch geodatabase is kept as well.
+        """
+        keep = set(keep)
+        for dataset in self.datasets:
+            if dataset not in keep and arcpy.Exists(dataset):
+                arcpy.management.Delete(dataset)
+        if self.mode == "SCRATCH_GDB" and not keep and arcpy.Exists(self.path):
+            arcpy.management.Delete(self.path)
+
+    def dataset(self, name: str) -> str:
+        """Return the path for an intermediate dataset and register it for
+        cleanup."""
+        path = os.path.join(self.path, name)
+        if path not in self.datasets:
+            self.datasets.append(path)
+        return path
+
+    def disk_usage(self) -> int:
+        """Return the number of bytes the workspace currently uses on disk."""
+        if self.mode == "MEMORY":
+            return 0
+
+        return sum(
+            os.path.getsize(os.path.join(folder, file))
+            for folder, _, files in os.walk(self.path)
+            for file in files
+        )
+
+    @contextmanager
+    def stage(self, label: str):
+        """Record and report the number of bytes a stage writes to disk."""
+        before = self.disk_usage()
+        yield
+        self.bytes_written[label] = self.disk_usage() - before
+
+        if self.mode == "MEMORY":
+            arcpy.AddMessage(f"   💾 {label}: kept in memory")
+        else:
+            arcpy.AddMessage(
+                f"   💾 {label}: {format_bytes(self.bytes_written[label])} written"
+            )
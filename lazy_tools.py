@@ -0,0 +1,176 @@
+"""Lazy loading of the tools of the toolbox.
+
+ArcGIS Pro runs `Trails Tools.pyt` every time it opens or refreshes the
+toolbox. Instead of importing every tool (and with them arcpy, NumPy and the
+helper modules), the toolbox registers a light stand-in class per tool. Its
+label, description and parameters come from `tool_parameters`, which the
+tool classes read as well; the module of a tool is imported the first time
+ArcGIS asks for the tool's license, validates it or runs it.
+
+ArcGIS does not reload imported modules unless it is restarted. While
+developing the tools, set the `TRAILS_TOOLS_RELOAD` environment variable to 1:
+a tool's helper modules and module are then reloaded (in that order) whenever
+one of their files has changed, and the time spent loading the tool is
+reported in its messages. The helper modules of a tool are the modules of
+the toolbox folder that it imports, directly or through other helper
+modules; they are found by parsing the import statements of the files.
+
+The time spent importing or reloading each tool module is kept in
+`load_times`, so it can also be measured outside of ArcGIS Pro.
+"""
+
+import ast
+import importlib
+import os
+import sys
+import time
+from types import ModuleType
+from typing import Dict, List, Type
+
+RELOAD_VARIABLE = "TRAILS_TOOLS_RELOAD"
+
+# the module with the labels, descriptions and parameters of the tools
+INFO_MODULE = "tool_parameters"
+
+# seconds spent on the last import or reload of each tool module
+load_times: Dict[str, float] = {}
+
+# modification times of the module files when they were last (re)loaded
+_loaded_mtimes: Dict[str, float] = {}
+
+
+def reload_enabled() -> bool:
+    """Return whether the developer reload mode is enabled."""
+    return os.environ.get(RELOAD_VARIABLE, "").strip().lower() in ("1", "true", "yes")
+
+
+def _mtime(module: ModuleType) -> float:
+    path = getattr(module, "__file__", None)
+    return os.path.getmtime(path) if path and os.path.exists(path) else 0.0
+
+
+def _imported_names(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read(), path)
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module.split(".")[0])
+    return names
+
+
+def helper_modules(name: str, folder: str = os.path.dirname(__file__)) -> List[str]:
+    """Return the modules of the toolbox folder that a module imports,
+    directly or indirectly, each after the modules it imports itself (the
+    order they must be reloaded in)."""
+    ordered: List[str] = []
+    visiting = {name}
+
+    def visit(module_name: str):
+        path = os.path.join(folder, f"{module_name}.py")
+        for imported in _imported_names(path):
+            if imported in visiting or not os.path.exists(
+                os.path.join(folder, f"{imported}.py")
+            ):
+                continue
+            visiting.add(imported)
+            visit(imported)
+            ordered.append(imported)
+
+    visit(name)
+    return ordered
+
+
+def load_module(name: str) -> ModuleType:
+    """Import a tool module. In reload mode, its helper modules and the module
+    itself are reloaded first when any of their files changed since they were
+    last loaded."""
+    start = time.perf_counter()
+    if reload_enabled():
+        names = [*helper_modules(name), name]
+        changed = any(
+            module_name not in sys.modules
+            or _loaded_mtimes.get(module_name) != _mtime(sys.modules[module_name])
+            for module_name in names
+        )
+        if changed:
+            for module_name in names:
+                module = sys.modules.get(module_name)
+                if module is None:
+                    module = importlib.import_module(module_name)
+                else:
+                    module = importlib.reload(module)
+                _loaded_mtimes[module_name] = _mtime(module)
+
+    module = importlib.import_module(name)
+    load_times[name] = time.perf_counter() - start
+    return module
+
+
+def tool_info(class_name: str):
+    """Return the label, description and parameter definitions of a tool
+    (a `tool_parameters.ToolInfo`), without importing the tool's module."""
+    return load_module(INFO_MODULE).TOOLS[class_name]
+
+
+class LazyTool(object):
+    """A stand-in for a tool class that imports the tool's module only when
+    the tool is used. The tool class must have the same name as the
+    stand-in."""
+
+    module_name = ""
+    label = ""
+    description = ""
+
+    def __init__(self):
+        self.canRunInBackground = False
+        self._tool = None
+
+    @property
+    def tool(self):
+        """The instance of the actual tool class."""
+        if self._tool is None:
+            module = load_module(self.module_name)
+            self._tool = getattr(module, type(self).__name__)()
+        return self._tool
+
+    def getParameterInfo(self):
+        return tool_info(type(self).__name__).parameter_info()
+
+    def isLicensed(self):
+        return self.tool.isLicensed()
+
+    def updateParameters(self, parameters):
+        return self.tool.updateParameters(parameters)
+
+    def updateMessages(self, parameters):
+        return self.tool.updateMessages(parameters)
+
+    def execute(self, parameters, messages):
+        tool = self.tool
+        if reload_enabled():
+            messages.addMessage(
+                f"Loaded {self.module_name} in "
+                f"{load_times.get(self.module_name, 0.0):.2f} s"
+            )
+        return tool.execute(parameters, messages)
+
+    def postExecute(self, parameters):
+        return self.tool.postExecute(parameters)
+
+
+def lazy_tool(class_name: str, module_name: str) -> Type[LazyTool]:
+    """Create the stand-in class of a tool. ArcGIS names the tool after the
+    class, so it gets the name of the tool class."""
+    info = tool_info(class_name)
+    return type(
+        class_name,
+        (LazyTool,),
+        {
+            "module_name": module_name,
+            "label": info.label,
+            "description": info.description,
+        },
+    )
@@ -0,0 +1,164 @@
+"""Vectorized endpoint extension for polylines.
+
+The functions in this module work on flat coordinate arrays plus an array of
+per-feature offsets, which is the layout produced by
+`arcpy.da.FeatureClassToNumPyArray(..., explode_to_points=True)`: the vertices
+of feature `i` are `x[offsets[i]:offsets[i + 1]]`. `extend_lines` applies them
+to every part of the features of a `FeatureTable`.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+from feature_table import FeatureTable
+
+
+def _anchor_indices(
+    x: np.ndarray, y: np.ndarray, offsets: np.ndarray, at_start: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Find, for each feature, the index of the endpoint being moved and the
+    index of the nearest vertex that is not coincident with it.
+
+    The anchor vertex defines the direction of the extension. Looking past
+    coincident vertices (instead of always using the neighbouring vertex)
+    keeps zero-length end segments from producing a division by zero.
+    Features without such a vertex get an anchor of -1.
+    """
+    counts = np.diff(offsets)
+    nonempty = counts > 0
+    n_features = counts.size
+
+    endpoint = np.full(n_features, -1, dtype=np.int64)
+    anchor = np.full(n_features, -1, dtype=np.int64)
+    if not nonempty.any():
+        return endpoint, anchor
+
+    if at_start:
+        endpoint[nonempty] = offsets[:-1][nonempty]
+    else:
+        endpoint[nonempty] = offsets[1:][nonempty] - 1
+
+    # compare every vertex with the endpoint of the feature it belongs to
+    feature_of_vertex = np.repeat(np.arange(n_features), counts)
+    vertex_endpoint = endpoint[feature_of_vertex]
+    differs = (x != x[vertex_endpoint]) | (y != y[vertex_endpoint])
+
+    index = np.arange(x.size, dtype=np.int64)
+    starts = offsets[:-1][nonempty]
+    if at_start:
+        # first differing vertex after the start point
+        candidates = np.where(differs, index, x.size)
+        found = np.minimum.reduceat(candidates, starts)
+        anchor[nonempty] = np.where(found < x.size, found, -1)
+    else:
+        # last differing vertex before the end point
+        candidates = np.where(differs, index, -1)
+        anchor[nonempty] = np.maximum.reduceat(candidates, starts)
+
+    return endpoint, anchor
+
+
+def extend_endpoints(
+    x, y, offsets, distance, at_start: bool = False
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Compute new endpoint coordinates for every feature in one pass.
+
+    Each endpoint is moved `distance` units along the prolongation of the line
+    that runs from the nearest non-coincident vertex to the endpoint. Negative
+    distances shorten the line. `distance` may be a scalar or an array with
+    one value per feature.
+
+    Returns `(new_x, new_y, valid)`, one value per feature. Features that are
+    empty or whose vertices all coincide cannot be extended; they are marked
+    as invalid and keep their original endpoint (or NaN when empty).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_features = offsets.size - 1
+
+    distance = np.broadcast_to(np.asarray(distance, dtype=np.float64), (n_features,))
+
+    endpoint, anchor = _anchor_indices(x, y, offsets, at_start)
+    valid = anchor >= 0
+
+    new_x = np.full(n_features, np.nan)
+    new_y = np.full(n_features, np.nan)
+    has_endpoint = endpoint >= 0
+    new_x[has_endpoint] = x[endpoint[has_endpoint]]
+    new_y[has_endpoint] = y[endpoint[has_endpoint]]
+
+    if valid.any():
+        x2 = x[endpoint[valid]]
+        y2 = y[endpoint[valid]]
+        dx = x2 - x[anchor[valid]]
+        dy = y2 - y[anchor[valid]]
+        scale = distance[valid] / np.hypot(dx, dy)
+
+        new_x[valid] = x2 + dx * scale
+        new_y[valid] = y2 + dy * scale
+
+    return new_x, new_y, valid
+
+
+def extend_both_ends(
+    x, y, offsets, start_distance, end_distance
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Compute new start and end coordinates for every feature in one pass.
+
+    Both endpoints are computed from the original vertices, so the vertex
+    order does not need to be flipped to extend the start of a line. Either
+    distance may be a scalar or an array with one value per feature.
+
+    Returns `(start_x, start_y, end_x, end_y, valid)`.
+    """
+    start_x, start_y, valid = extend_endpoints(
+        x, y, offsets, start_distance, at_start=True
+    )
+    end_x, end_y, _ = extend_endpoints(x, y, offsets, end_distance)
+
+    # a feature has a non-coincident vertex before its end point exactly when
+    # it has one after its start point, so the masks are identical
+    return start_x, start_y, end_x, end_y, valid
+
+
+def extend_lines(
+    table: FeatureTable, start_distance, end_distance, extend_start: bool = True
+) -> Tuple[FeatureTable, np.ndarray]:
+    """Extend the end (and with `extend_start` also the start) of every part
+    of every feature of a table. Either distance may be a scalar or an array
+    with one value per feature.
+
+    Returns the table with the moved endpoints and whether each feature had
+    a part that could be extended. Parts that cannot be extended keep their
+    vertices.
+    """
+    part_features = table.part_features()
+    shape = (table.feature_count,)
+    end = np.broadcast_to(np.asarray(end_distance, dtype=np.float64), shape)
+    if extend_start:
+        start = np.broadcast_to(np.asarray(start_distance, dtype=np.float64), shape)
+        start_x, start_y, end_x, end_y, valid = extend_both_ends(
+            table.x,
+            table.y,
+            table.part_offsets,
+            start[part_features],
+            end[part_features],
+        )
+    else:
+        end_x, end_y, valid = extend_endpoints(
+            table.x, table.y, table.part_offsets, end[part_features]
+        )
+
+    x = table.x.copy()
+    y = table.y.copy()
+    if extend_start:
+        first = table.part_offsets[:-1][valid]
+        x[first], y[first] = start_x[valid], start_y[valid]
+    last = table.part_offsets[1:][valid] - 1
+    x[last], y[last] = end_x[valid], end_y[valid]
+
+    extended = np.zeros(table.feature_count, dtype=bool)
+    extended[part_features[valid]] = True
+    return table.with_coordinates(x, y), extended
@@ -0,0 +1,39 @@
+"""Conversion of linear unit values (as returned by `GPLinearUnit.valueAsText`)
+to the units of a spatial reference.
+"""
+
+# meters per unit for the unit keywords used by GPLinearUnit parameters;
+# "Feet", "Inches", "Yards" and "Miles" are US survey units in ArcGIS Pro
+LINEAR_UNIT_METERS = {
+    "Inches": 0.0254000508001016,
+    "Feet": 0.3048006096012192,
+    "Yards": 0.9144018288036576,
+    "Miles": 1609.347218694437,
+    "NauticalMiles": 1852.0,
+    "Millimeters": 0.001,
+    "Centimeters": 0.01,
+    "Decimeters": 0.1,
+    "Meters": 1.0,
+    "Kilometers": 1000.0,
+    "InchesInt": 0.0254,
+    "FeetInt": 0.3048,
+    "YardsInt": 0.9144,
+    "MilesInt": 1609.344,
+}
+
+
+def to_spatial_reference_units(linear_unit_text: str, meters_per_unit: float) -> float:
+    """Convert a value such as "10 Meters" to the units of a spatial reference
+    whose `metersPerUnit` is given.
+
+    Values in "Unknown" units are assumed to already be in the units of the
+    spatial reference.
+    """
+    value, unit = linear_unit_text.split()[:2]
+
+    if unit == "Unknown":
+        return float(value)
+    if unit not in LINEAR_UNIT_METERS:
+        raise ValueError(f'Unsupported linear unit: "{unit}"')
+
+    return float(value) * LINEAR_UNIT_METERS[unit] / meters_per_unit
@@ -0,0 +1,172 @@
+"""A sparse matrix of the census units that belong to each buffer.
+
+The matrix is stored in compressed sparse row (CSR) form: one row per buffer,
+one column per census unit and a weight per member. With binary centroid
+membership every weight is 1; with area weights it is the share of the
+census unit's area that lies inside the buffer.
+
+Once the matrix is built, any set of census attributes can be summarized by
+streaming its members (see `summary_statistics`), without touching geometry
+again.
+"""
+
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class MembershipMatrix(object):
+    """Census units (columns) that belong to each buffer (rows)."""
+
+    def __init__(
+        self,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        weights: np.ndarray,
+        row_ids: np.ndarray,
+        column_ids: np.ndarray,
+        key: str = "",
+    ):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.row_ids = np.asarray(row_ids)
+        self.column_ids = np.asarray(column_ids)
+        self.key = key
+
+    @classmethod
+    def from_pairs(
+        cls,
+        rows: Sequence[int],
+        columns: Sequence[int],
+        row_ids: Sequence,
+        column_ids: Sequence,
+        weights: Optional[Sequence[float]] = None,
+        key: str = "",
+        merge: str = "SUM",
+    ) -> "MembershipMatrix":
+        """Build the matrix from `(row index, column index)` pairs. Repeated
+        pairs are merged by adding their weights, or with `merge="MAX"` by
+        keeping the largest one (so a unit is counted once per row)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        weights = (
+            np.ones(len(rows)) if weights is None else np.asarray(weights, np.float64)
+        )
+
+        # sort by row, then column, and merge repeated pairs
+        order = np.lexsort((columns, rows))
+        rows, columns, weights = rows[order], columns[order], weights[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (columns[1:] != columns[:-1])
+        starts = np.flatnonzero(first)
+        if len(starts):
+            reduce = np.maximum if merge == "MAX" else np.add
+            weights = reduce.reduceat(weights, starts)
+        rows, columns = rows[starts], columns[starts]
+
+        indptr = np.zeros(len(row_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(row_ids)), out=indptr[1:])
+        return cls(indptr, columns, weights, row_ids, column_ids, key)
+
+    @classmethod
+    def load(cls, path: str) -> "MembershipMatrix":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["indptr"],
+                data["indices"],
+                data["weights"],
+                data["row_ids"],
+                data["column_ids"],
+                str(data["key"]),
+            )
+
+    def save(self, path: str):
+        """Save the matrix to a .npz file. Ids of mixed types (such as text
+        with nulls) are saved as text."""
+        row_ids, column_ids = [
+            ids.astype(str) if ids.dtype == object else ids
+            for ids in (self.row_ids, self.column_ids)
+        ]
+        # writing to a file object keeps np.savez from changing the extension
+        with open(path, "wb") as file:
+            np.savez(
+                file,
+                indptr=self.indptr,
+                indices=self.indices,
+                weights=self.weights,
+                row_ids=row_ids,
+                column_ids=column_ids,
+                key=np.array(self.key),
+            )
+
+    @property
+    def shape(self):
+        return len(self.row_ids), len(self.column_ids)
+
+    def member_counts(self) -> np.ndarray:
+        """Return the number of census units in each buffer."""
+        return np.diff(self.indptr)
+
+    def records(
+        self, chunk_size: int = 1_000_000
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Stream the members as `(rows, columns, weights)` chunks."""
+        rows = np.repeat(np.arange(len(self.row_ids)), np.diff(self.indptr))
+        for start in range(0, len(self.indices), chunk_size):
+            end = start + chunk_size
+            yield rows[start:end], self.indices[start:end], self.weights[start:end]
+
+
+def distance_band_matrix(
+    rows: Sequence[int],
+    columns: Sequence[int],
+    distances: Sequence[float],
+    row_ids: Sequence,
+    column_ids: Sequence,
+    bands: Sequence[float],
+    cumulative: bool = True,
+    key: str = "",
+) -> MembershipMatrix:
+    """Build the membership matrix of several buffer distances at once.
+
+    Each `(row, column, distance)` triple is the distance between a census
+    unit and a line of a buffer; only the shortest distance of each pair
+    counts. A unit belongs to the smallest band (of the ascending `bands`)
+    that its distance fits in, and with `cumulative` to every larger band as
+    well. The rows of the result are `(band, row)` combinations, band by
+    band, and pairs beyond the largest band are dropped.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = np.asarray(columns, dtype=np.int64)
+    distances = np.asarray(distances, dtype=np.float64)
+    row_count = len(row_ids)
+
+    # the first triple of each pair, sorted by distance, is the shortest one
+    order = np.lexsort((distances, columns, rows))
+    rows, columns, distances = rows[order], columns[order], distances[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (columns[1:] != columns[:-1])
+    rows, columns, distances = rows[first], columns[first], distances[first]
+
+    band = np.searchsorted(np.asarray(bands, dtype=np.float64), distances)
+    inside = band < len(bands)
+    rows, columns, band = rows[inside], columns[inside], band[inside]
+
+    if cumulative:
+        # repeat each pair for its own band and every larger one
+        repeats = len(bands) - band
+        offsets = np.arange(repeats.sum()) - np.repeat(
+            np.cumsum(repeats) - repeats, repeats
+        )
+        band = np.repeat(band, repeats) + offsets
+        rows = np.repeat(rows, repeats)
+        columns = np.repeat(columns, repeats)
+
+    return MembershipMatrix.from_pairs(
+        band * row_count + rows,
+        columns,
+        np.tile(np.asarray(row_ids), len(bands)),
+        column_ids,
+        key=key,
+    )
@@ -0,0 +1,58 @@
+"""Helpers for splitting work into independent batches that can be processed
+in parallel, and for starting the worker processes that process them.
+"""
+
+import heapq
+import math
+import multiprocessing
+import os
+import sys
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+def balanced_batches(
+    weights: Dict[Hashable, float], batch_count: int
+) -> List[List[Hashable]]:
+    """Split keys into at most `batch_count` batches with similar total weight.
+
+    Keys are assigned heaviest first to the currently lightest batch (the
+    longest-processing-time rule), which keeps the heaviest batch within 4/3
+    of the optimum. Empty batches are dropped and keys with equal weights
+    keep their insertion order, so the result is deterministic.
+    """
+    batch_count = max(1, min(batch_count, len(weights)))
+    batches: List[List[Hashable]] = [[] for _ in range(batch_count)]
+    loads = [(0, index) for index in range(batch_count)]
+
+    for key in sorted(weights, key=lambda key: -weights[key]):
+        load, index = heapq.heappop(loads)
+        batches[index].append(key)
+        heapq.heappush(loads, (load + weights[key], index))
+
+    return [batch for batch in batches if batch]
+
+
+def tile_keys(
+    points: Iterable[Optional[Tuple[Optional[float], Optional[float]]]],
+    tile_size: float,
+) -> List[Optional[Tuple[int, int]]]:
+    """Return the `(column, row)` of the square tile of a regular grid that
+    each point falls in, or None for points without coordinates (e.g. of
+    features without geometry)."""
+    return [
+        (
+            (math.floor(point[0] / tile_size), math.floor(point[1] / tile_size))
+            if point is not None and None not in point
+            else None
+        )
+        for point in points
+    ]
+
+
+def spawn_context() -> multiprocessing.context.SpawnContext:
+    """Return a multiprocessing context that starts worker processes with
+    python, also when the current process is ArcGIS Pro."""
+    context = multiprocessing.get_context("spawn")
+    if not os.path.basename(sys.executable).lower().startswith("python"):
+        context.set_executable(os.path.join(sys.exec_prefix, "pythonw.exe"))
+    return context
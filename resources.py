@@ -0,0 +1,129 @@
+"""Queries for the memory available to and used by the current process."""
+
+import ctypes
+import os
+import sys
+import threading
+
+
+class _MemoryStatusEx(ctypes.Structure):
+    _fields_ = [
+        ("dwLength", ctypes.c_ulong),
+        ("dwMemoryLoad", ctypes.c_ulong),
+        ("ullTotalPhys", ctypes.c_ulonglong),
+        ("ullAvailPhys", ctypes.c_ulonglong),
+        ("ullTotalPageFile", ctypes.c_ulonglong),
+        ("ullAvailPageFile", ctypes.c_ulonglong),
+        ("ullTotalVirtual", ctypes.c_ulonglong),
+        ("ullAvailVirtual", ctypes.c_ulonglong),
+        ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+    ]
+
+
+def available_memory_bytes() -> int:
+    """Return the amount of physical memory that is currently available."""
+    if sys.platform == "win32":
+        status = _MemoryStatusEx()
+        status.dwLength = ctypes.sizeof(_MemoryStatusEx)
+        ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+        return status.ullAvailPhys
+
+    return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+class _ProcessMemoryCounters(ctypes.Structure):
+    _fields_ = [
+        ("cb", ctypes.c_ulong),
+        ("PageFaultCount", ctypes.c_ulong),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+def _process_memory_counters() -> _ProcessMemoryCounters:
+    counters = _ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(_ProcessMemoryCounters)
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+    psapi = ctypes.windll.psapi
+    psapi.GetProcessMemoryInfo.argtypes = [
+        ctypes.c_void_p,
+        ctypes.POINTER(_ProcessMemoryCounters),
+        ctypes.c_ulong,
+    ]
+    psapi.GetProcessMemoryInfo(
+        kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+    )
+    return counters
+
+
+def peak_memory_bytes() -> int:
+    """Return the peak resident memory (working set) of the current process."""
+    if sys.platform == "win32":
+        return _process_memory_counters().PeakWorkingSetSize
+
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_memory_bytes() -> int:
+    """Return the resident memory (working set) of the current process."""
+    if sys.platform == "win32":
+        return _process_memory_counters().WorkingSetSize
+
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return peak_memory_bytes()
+
+
+class MemorySampler(object):
+    """Samples the resident memory of the current process in a background
+    thread while it is used as a context manager, to find the peak of that
+    period (peak_memory_bytes is the peak of the whole life of the
+    process)."""
+
+    def __init__(self, interval_seconds: float = 0.05):
+        self.interval_seconds = interval_seconds
+        self.start_bytes = 0
+        self.peak_bytes = 0
+        self.end_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        self.peak_bytes = max(self.peak_bytes, current_memory_bytes())
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self._sample()
+
+    def __enter__(self) -> "MemorySampler":
+        self.start_bytes = self.peak_bytes = current_memory_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.end_bytes = current_memory_bytes()
+        self.peak_bytes = max(self.peak_bytes, self.end_bytes)
+
+
+def format_bytes(size: float) -> str:
+    """Format a number of bytes for tool messages, e.g. "12.3 MB"."""
+    for unit in ["bytes", "KB", "MB", "GB"]:
+        if abs(size) < 1024 or unit == "GB":
+            break
+        size /= 1024
+    return f"{size:.0f} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
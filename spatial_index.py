@@ -0,0 +1,98 @@
+"""A static R-tree over bounding boxes, packed with the Sort-Tile-Recursive
+(STR) algorithm.
+
+The tree is used as a cheap candidate filter: only the items whose bounding
+box overlaps a query box need an exact (and expensive) geometry test.
+Queries are answered for many boxes at once, level by level, with NumPy.
+"""
+
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+
+def _overlaps(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Return whether the boxes `(xmin, ymin, xmax, ymax)` in the rows of `a`
+    and `b` overlap (touching boxes overlap)."""
+    return (
+        (a[:, 0] <= b[:, 2])
+        & (b[:, 0] <= a[:, 2])
+        & (a[:, 1] <= b[:, 3])
+        & (b[:, 1] <= a[:, 3])
+    )
+
+
+class STRTree(object):
+    """An R-tree over `(xmin, ymin, xmax, ymax)` boxes.
+
+    The leaves are sorted into vertical slices by x and then by y within each
+    slice, and every `node_capacity` consecutive leaves (or nodes) form a
+    node of the next level.
+    """
+
+    def __init__(self, boxes: np.ndarray, node_capacity: int = 16):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.node_capacity = node_capacity
+
+        # sort-tile-recursive packing of the leaves
+        count = len(boxes)
+        leaf_count = math.ceil(count / node_capacity)
+        slice_count = max(math.ceil(math.sqrt(leaf_count)), 1)
+        slice_size = slice_count * node_capacity
+        centers_x = (boxes[:, 0] + boxes[:, 2]) / 2
+        centers_y = (boxes[:, 1] + boxes[:, 3]) / 2
+        by_x = np.argsort(centers_x, kind="stable")
+        slices = np.empty(count, dtype=np.int64)
+        slices[by_x] = np.arange(count) // slice_size
+        self.order = np.lexsort((centers_y, slices))
+
+        # levels[0] holds the leaves, levels[-1] the nodes below the root
+        self.levels: List[np.ndarray] = [boxes[self.order]]
+        while len(self.levels[-1]) > node_capacity:
+            children = self.levels[-1]
+            starts = np.arange(0, len(children), node_capacity)
+            self.levels.append(
+                np.column_stack(
+                    [
+                        np.minimum.reduceat(children[:, 0], starts),
+                        np.minimum.reduceat(children[:, 1], starts),
+                        np.maximum.reduceat(children[:, 2], starts),
+                        np.maximum.reduceat(children[:, 3], starts),
+                    ]
+                )
+            )
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def query_pairs(self, boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the items whose boxes overlap each query box.
+
+        Returns `(query indexes, item indexes)` of the overlapping pairs.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        top = self.levels[-1]
+        queries = np.repeat(np.arange(len(boxes)), len(top))
+        nodes = np.tile(np.arange(len(top)), len(boxes))
+
+        for depth in range(len(self.levels) - 1, -1, -1):
+            level = self.levels[depth]
+            keep = _overlaps(boxes[queries], level[nodes])
+            queries, nodes = queries[keep], nodes[keep]
+            if depth == 0:
+                break
+
+            # replace every node by its children on the level below
+            child_count = len(self.levels[depth - 1])
+            offsets = np.arange(self.node_capacity)
+            children = (nodes[:, np.newaxis] * self.node_capacity + offsets).ravel()
+            queries = np.repeat(queries, self.node_capacity)
+            valid = children < child_count
+            queries, nodes = queries[valid], children[valid]
+
+        return queries, self.order[nodes]
+
+    def query(self, box) -> np.ndarray:
+        """Return the indexes of the items whose boxes overlap `box`."""
+        return np.sort(self.query_pairs(np.asarray(box))[1])
@@ -0,0 +1,152 @@
+"""A size-limited cache of the outputs of expensive tool stages.
+
+Each cache entry is a folder named after a key that fingerprints everything
+the stages depend on. A tool reserves the folder, writes its stage outputs
+into it and commits the entry; later runs with the same key reuse the
+outputs instead of recomputing them. When the cache grows beyond its size
+limit, the least recently used entries are deleted.
+
+The cache outlives the scratch folder of a run (which the batch runner
+deletes), so by default it is kept in a folder of the user. A run holds a
+lock file while it builds an entry, and entry files are written atomically
+(see cache_files), so runs can share the cache.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+from cache_files import acquire_lock, release_lock, write_json
+
+ENTRY_FILE = "entry.json"
+
+
+def default_folder() -> str:
+    """Return the folder of the cache when no cache folder is set."""
+    return os.path.join(
+        os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"),
+        "TrailsTools",
+        "stage_cache",
+    )
+
+
+def fingerprint(rows: Iterable[Sequence[Any]]) -> str:
+    """Hash the content of a dataset, e.g. the OIDs, geometries (as WKB) and
+    attribute values of its features, in cursor order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        for value in row:
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                digest.update(bytes(value))
+            else:
+                digest.update(repr(value).encode("utf-8"))
+            digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def cache_key(*parts: Any) -> str:
+    """Combine fingerprints and parameter values into a cache key."""
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def folder_size(path: str) -> int:
+    """Return the number of bytes used by the files in a folder."""
+    return sum(
+        os.path.getsize(os.path.join(folder, file))
+        for folder, _, files in os.walk(path)
+        for file in files
+    )
+
+
+class StageCache(object):
+    """A folder of cached stage outputs with a least recently used size
+    limit."""
+
+    def __init__(self, folder: str, size_limit_bytes: int):
+        self.folder = folder
+        self.size_limit_bytes = size_limit_bytes
+
+    def entry(self, key: str) -> str:
+        """Return the folder of a cache entry."""
+        return os.path.join(self.folder, key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the folder of a committed entry (and mark it as used), or
+        None when the key is not cached."""
+        entry_file = os.path.join(self.entry(key), ENTRY_FILE)
+        if not os.path.exists(entry_file):
+            return None
+
+        with open(entry_file, "r", encoding="utf-8") as file:
+            metadata = json.load(file)
+        metadata["last_used"] = time.time()
+        write_json(entry_file, metadata)
+        return self.entry(key)
+
+    def lock_file(self, key: str) -> str:
+        """Return the lock file held while an entry is built."""
+        return os.path.join(self.folder, f"{key}.lock")
+
+    def reserve(self, key: str) -> Optional[str]:
+        """Create an empty folder for a new entry and return its path, or
+        return None when another run is building the entry."""
+        os.makedirs(self.folder, exist_ok=True)
+        if not acquire_lock(self.lock_file(key)):
+            return None
+        shutil.rmtree(self.entry(key), ignore_errors=True)
+        os.makedirs(self.entry(key))
+        return self.entry(key)
+
+    def commit(self, key: str, description: str = "") -> List[str]:
+        """Mark a reserved entry as complete, then evict the least recently
+        used entries until the cache fits its size limit.
+
+        Returns the keys of the evicted entries.
+        """
+        metadata = {
+            "description": description,
+            "size": folder_size(self.entry(key)),
+            "last_used": time.time(),
+        }
+        write_json(os.path.join(self.entry(key), ENTRY_FILE), metadata)
+        release_lock(self.lock_file(key))
+        return self.evict(keep=key)
+
+    def discard(self, key: str):
+        """Delete an entry, e.g. one whose stages failed."""
+        shutil.rmtree(self.entry(key), ignore_errors=True)
+        release_lock(self.lock_file(key))
+
+    def entries(self) -> List[Tuple[str, float, int]]:
+        """Return `(key, last used time, size)` of the committed entries, least
+        recently used first."""
+        if not os.path.isdir(self.folder):
+            return []
+
+        entries = []
+        for key in os.listdir(self.folder):
+            entry_file = os.path.join(self.entry(key), ENTRY_FILE)
+            if os.path.exists(entry_file):
+                with open(entry_file, "r", encoding="utf-8") as file:
+                    metadata = json.load(file)
+                entries.append((key, metadata["last_used"], metadata["size"]))
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def evict(self, keep: str = "") -> List[str]:
+        """Delete least recently used entries (never `keep`) until the total
+        size fits the size limit."""
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        evicted = []
+        for key, _, size in entries:
+            if total <= self.size_limit_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self.entry(key), ignore_errors=True)
+            total -= size
+            evicted.append(key)
+        return evicted
@@ -0,0 +1,169 @@
+"""Timing, row count and memory measurements of the stages of a tool.
+
+A `StageRecorder` wraps each stage of a tool run in a context manager that
+measures its wall clock time, the CPU time of the tool's process (parallel
+workers are not included), the number of rows of its input and output
+datasets and the resident memory of the process: its peak during the stage
+(sampled in a background thread) and its change from the start to the end
+of the stage. Each stage is reported in a tool message when it ends. The
+stages of a run can be appended to a JSON or CSV report (chosen by the file
+extension), so runs can be compared over time.
+
+Rows are counted and messages are written with functions passed to the
+recorder.
+"""
+
+import csv
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from resources import MemorySampler, format_bytes
+
+REPORT_FIELDS = [
+    "run",
+    "tool",
+    "stage",
+    "started",
+    "wall_seconds",
+    "cpu_seconds",
+    "rows_in",
+    "rows_out",
+    "stage_peak_memory_bytes",
+    "memory_change_bytes",
+    "succeeded",
+]
+
+
+class Stage(object):
+    """The measurements of one stage. A stage that knows its own row counts
+    (e.g. from a cursor) can set `rows_in` and `rows_out` itself."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = ""
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rows_in: Optional[int] = None
+        self.rows_out: Optional[int] = None
+        self.stage_peak_memory_bytes = 0
+        self.memory_change_bytes = 0
+        self.succeeded = False
+
+    def summary(self) -> str:
+        """Describe the stage in one tool message."""
+        parts = [f"{self.wall_seconds:.1f} s", f"{self.cpu_seconds:.1f} s CPU"]
+        if self.rows_in is not None or self.rows_out is not None:
+            rows_in = "?" if self.rows_in is None else f"{self.rows_in:,}"
+            rows_out = "?" if self.rows_out is None else f"{self.rows_out:,}"
+            parts.append(f"{rows_in} → {rows_out} rows")
+        parts.append(
+            f"peak memory during stage {format_bytes(self.stage_peak_memory_bytes)}"
+        )
+        return f"   ⏱️ {self.name}: " + ", ".join(parts)
+
+
+class StageRecorder(object):
+    """Measures the stages of one tool run.
+
+    `message` writes a tool message (e.g. `arcpy.AddMessage`) and
+    `count_rows` returns the number of rows of a dataset (e.g. with
+    `arcpy.management.GetCount`).
+    """
+
+    def __init__(
+        self,
+        tool: str,
+        message: Callable[[str], Any] = print,
+        count_rows: Optional[Callable[[str], int]] = None,
+    ):
+        self.tool = tool
+        self.message = message
+        self.count_rows = count_rows
+        self.run = datetime.now().isoformat(timespec="seconds")
+        self.stages: List[Stage] = []
+
+    def _count(self, datasets: Sequence[str]) -> Optional[int]:
+        if not datasets or self.count_rows is None:
+            return None
+        return sum(self.count_rows(dataset) for dataset in datasets)
+
+    @contextmanager
+    def stage(
+        self, name: str, inputs: Sequence[str] = (), outputs: Sequence[str] = ()
+    ) -> Iterator[Stage]:
+        """Measure a stage. The rows of the `inputs` datasets are counted
+        before the stage and the rows of the `outputs` datasets after it."""
+        stage = Stage(name)
+        stage.rows_in = self._count(inputs)
+        stage.started = datetime.now().isoformat(timespec="seconds")
+        memory = MemorySampler()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with memory:
+                yield stage
+            stage.succeeded = True
+        finally:
+            stage.wall_seconds = time.perf_counter() - wall_start
+            stage.cpu_seconds = time.process_time() - cpu_start
+            stage.stage_peak_memory_bytes = memory.peak_bytes
+            stage.memory_change_bytes = memory.end_bytes - memory.start_bytes
+            self.stages.append(stage)
+
+        if stage.rows_out is None:
+            stage.rows_out = self._count(outputs)
+        self.message(stage.summary())
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Return the measurements of the stages as report rows."""
+        return [
+            {
+                "run": self.run,
+                "tool": self.tool,
+                "stage": stage.name,
+                "started": stage.started,
+                "wall_seconds": round(stage.wall_seconds, 3),
+                "cpu_seconds": round(stage.cpu_seconds, 3),
+                "rows_in": stage.rows_in,
+                "rows_out": stage.rows_out,
+                "stage_peak_memory_bytes": stage.stage_peak_memory_bytes,
+                "memory_change_bytes": stage.memory_change_bytes,
+                "succeeded": stage.succeeded,
+            }
+            for stage in self.stages
+        ]
+
+    def write_report(self, path: str):
+        """Append the stages of this run to a .json or .csv report."""
+        self.message(f"   💾 Run report: {path}")
+        if os.path.splitext(path)[1].lower() == ".json":
+            runs = []
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as file:
+                    runs = json.load(file)
+            runs.extend(self.records())
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(runs, file, indent=2)
+            return
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new_file:
+            with open(path, "r", encoding="utf-8", newline="") as file:
+                header = next(csv.reader(file), [])
+            if header != REPORT_FIELDS:
+                # a report with other columns (from an earlier version of the
+                # tools) is kept under another name and a new one is started
+                base, extension = os.path.splitext(path)
+                old_path = f"{base}_{datetime.now():%Y%m%d_%H%M%S}{extension}"
+                os.replace(path, old_path)
+                self.message(f"   💾 Report with other columns moved to {old_path}")
+                new_file = True
+        with open(path, "a", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=REPORT_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(self.records())
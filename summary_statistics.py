@@ -0,0 +1,125 @@
+"""Streaming summary statistics of census attributes per buffer.
+
+Joined `(buffer row, values)` records are streamed through the engine in
+chunks, and every statistic is updated in the same pass:
+
+- SUM: the weighted sum
+- MEAN: the mean, weighted by the membership weights
+- MIN, MAX: the smallest and largest value
+- STDEV: the (weighted, population) standard deviation, from Welford's
+  running mean and sum of squared deviations; chunks are merged with Chan's
+  formula, so there is no catastrophic cancellation on large values
+- COUNT: the number of non-null values
+- POP_MEAN: the mean weighted by a population field (times the membership
+  weight)
+
+Null values (NaN) are ignored. Memory use depends on the number of rows and
+fields, not on the number of records.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+STATISTICS = ["SUM", "MEAN", "MIN", "MAX", "STDEV", "COUNT", "POP_MEAN"]
+
+
+def _row_sums(rows: np.ndarray, values: np.ndarray, row_count: int) -> np.ndarray:
+    """Sum the columns of `values` per row."""
+    return np.stack(
+        [np.bincount(rows, weights=column, minlength=row_count) for column in values.T],
+        axis=1,
+    ).reshape(row_count, values.shape[1])
+
+
+class StreamingSummary(object):
+    """Running statistics of `field_count` fields for `row_count` rows."""
+
+    def __init__(self, row_count: int, field_count: int):
+        shape = (row_count, field_count)
+        self.row_count = row_count
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.weight = np.zeros(shape)
+        self.sum = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+        self.population = np.zeros(shape)
+        self.population_sum = np.zeros(shape)
+
+    def add(
+        self,
+        rows: np.ndarray,
+        values: np.ndarray,
+        weights: Optional[np.ndarray] = None,
+        populations: Optional[np.ndarray] = None,
+    ):
+        """Add a chunk of records: the row of each record, its values (one
+        column per field), its membership weight and its population."""
+        rows = np.asarray(rows, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(rows), -1)
+        weights = (
+            np.ones(len(rows)) if weights is None else np.asarray(weights, np.float64)
+        )
+        valid = ~np.isnan(values)
+        clean = np.where(valid, values, 0.0)
+        record_weights = np.where(valid, weights[:, np.newaxis], 0.0)
+
+        self.count += _row_sums(rows, valid.astype(np.float64), self.row_count).astype(
+            np.int64
+        )
+        np.minimum.at(self.min, rows, np.where(valid, values, np.inf))
+        np.maximum.at(self.max, rows, np.where(valid, values, -np.inf))
+
+        if populations is not None:
+            populations = np.nan_to_num(np.asarray(populations, dtype=np.float64))
+            population_weights = record_weights * populations[:, np.newaxis]
+            self.population += _row_sums(rows, population_weights, self.row_count)
+            self.population_sum += _row_sums(
+                rows, population_weights * clean, self.row_count
+            )
+
+        # mean and squared deviations of the chunk, per row
+        chunk_weight = _row_sums(rows, record_weights, self.row_count)
+        chunk_sum = _row_sums(rows, record_weights * clean, self.row_count)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            chunk_mean = np.where(chunk_weight > 0, chunk_sum / chunk_weight, 0.0)
+        deviations = np.where(valid, clean - chunk_mean[rows], 0.0)
+        chunk_m2 = _row_sums(rows, record_weights * deviations**2, self.row_count)
+
+        # merge the chunk into the running statistics (Chan et al.)
+        total = self.weight + chunk_weight
+        delta = chunk_mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(total > 0, chunk_weight / total, 0.0)
+        self.mean += delta * share
+        self.m2 += chunk_m2 + delta**2 * self.weight * share
+        self.weight = total
+        self.sum += chunk_sum
+
+    def result(self, statistic: str) -> np.ndarray:
+        """Return a statistic for every row and field. Rows without values
+        get NaN, except for SUM and COUNT, which are 0."""
+        if statistic not in STATISTICS:
+            raise ValueError(f"Unknown statistic: {statistic}")
+
+        empty = self.count == 0
+        if statistic == "SUM":
+            return self.sum.copy()
+        if statistic == "COUNT":
+            return self.count.copy()
+        if statistic == "MIN":
+            return np.where(empty, np.nan, self.min)
+        if statistic == "MAX":
+            return np.where(empty, np.nan, self.max)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if statistic == "MEAN":
+                return np.where(empty | (self.weight == 0), np.nan, self.mean)
+            if statistic == "STDEV":
+                return np.where(
+                    empty | (self.weight == 0), np.nan, np.sqrt(self.m2 / self.weight)
+                )
+            return np.where(
+                self.population > 0, self.population_sum / self.population, np.nan
+            )
@@ -0,0 +1,480 @@
+"""The labels, descriptions and parameters of the tools.
+
+ArcGIS Pro lists the tools and opens their dialogs with these alone, so this
+module imports neither the tool modules nor their helper modules, and imports
+arcpy only when the parameters of a tool are defined. The tool classes and
+their lazy stand-ins in `Trails Tools.pyt` (see `lazy_tools`) both read it.
+"""
+
+from typing import Callable, Dict
+
+from attribute_aggregation import RULES
+
+
+class ToolInfo(object):
+    """The label, description and parameter definitions of a tool."""
+
+    def __init__(self, label: str, description: str, parameter_info: Callable):
+        self.label = label
+        self.description = description
+        self.parameter_info = parameter_info
+
+
+def summarize_census_parameters() -> list:
+    """Define the parameters of Summarize Census As Buffer Along Lines."""
+    import arcpy
+
+    paramCensus = arcpy.Parameter(
+        displayName="Census Polygons",
+        name="INPUT_CENSUS",
+        datatype="GPFeatureLayer",
+        parameterType="Required",
+        direction="Input",
+    )
+
+    paramCensusData = arcpy.Parameter(
+        displayName="Census Data",
+        name="INPUT_CENSUS_DATA",
+        datatype="GPTableView",
+        multiValue=True,
+        parameterType="Required",
+        direction="Input",
+    )
+
+    paramLines = arcpy.Parameter(
+        displayName="Lines",
+        name="INPUT_LINES",
+        datatype="GPFeatureLayer",
+        parameterType="Required",
+        direction="Input",
+    )
+
+    paramBufferDistance = arcpy.Parameter(
+        displayName="Buffer Distances",
+        name="INPUT_BUFFER_DISTANCE",
+        datatype="GPLinearUnit",
+        multiValue=True,
+        parameterType="Required",
+        direction="Input",
+    )
+    paramBufferDistance.value = "1 Kilometers"
+
+    paramBufferDissolve = arcpy.Parameter(
+        displayName="Buffer Dissolve Field",
+        name="INPUT_BUFFER_DISSOLVE",
+        datatype="Field",
+        parameterType="Optional",
+        direction="Input",
+    )
+    paramBufferDissolve.parameterDependencies = [paramLines.name]
+
+    paramCensusFields = arcpy.Parameter(
+        displayName="Summary Fields",
+        name="INPUT_SUMMARY_FIELDS",
+        datatype="GPValueTable",
+        parameterType="Required",
+        direction="Input",
+    )
+    paramCensusFields.parameterDependencies = [paramCensusData.name]
+    paramCensusFields.columns = [
+        ["Field", "Field"],
+        ["GPString", "Label"],
+        ["GPString", "Statistic Type"],
+    ]
+    paramCensusFields.filters[2].type = "ValueList"
+    paramCensusFields.filters[2].list = [
+        "SUM",
+        "MEAN",
+        "MIN",
+        "MAX",
+        "STDEV",
+        "COUNT",
+        "POP_MEAN",
+    ]
+
+    paramSummaryBuffer = arcpy.Parameter(
+        displayName="Summary Buffer",
+        name="OUTPUT_SUMMARY_BUFFER",
+        datatype="DEFeatureClass",
+        parameterType="Required",
+        direction="Output",
+    )
+
+    paramCentroids = arcpy.Parameter(
+        displayName="Centroids",
+        name="OUTPUT_I_CENTROIDS",
+        datatype="DEFeatureClass",
+        parameterType="Optional",
+        direction="Output",
+        category="Intermediate Outputs",
+    )
+
+    paramCacheFolder = arcpy.Parameter(
+        displayName="Census Data Cache Folder",
+        name="INPUT_CACHE_FOLDER",
+        datatype="DEFolder",
+        parameterType="Optional",
+        direction="Input",
+        category="Performance",
+    )
+
+    paramStageCache = arcpy.Parameter(
+        displayName="Reuse Buffer And Intersection Results",
+        name="INPUT_STAGE_CACHE",
+        datatype="GPBoolean",
+        parameterType="Optional",
+        direction="Input",
+        category="Performance",
+    )
+    paramStageCache.value = False
+
+    paramStageCacheSize = arcpy.Parameter(
+        displayName="Result Cache Size Limit (MB)",
+        name="INPUT_STAGE_CACHE_SIZE",
+        datatype="GPLong",
+        parameterType="Optional",
+        direction="Input",
+        category="Performance",
+        enabled=False,
+    )
+    paramStageCacheSize.value = 2048
+
+    paramMembershipWeights = arcpy.Parameter(
+        displayName="Census Area Membership",
+        name="INPUT_MEMBERSHIP_WEIGHTS",
+        datatype="GPString",
+        parameterType="Optional",
+        direction="Input",
+    )
+    paramMembershipWeights.filter.type = "ValueList"
+    paramMembershipWeights.filter.list = ["CENTROID", "AREA"]
+    paramMembershipWeights.value = "CENTROID"
+
+    paramDistanceBands = arcpy.Parameter(
+        displayName="Distance Bands",
+        name="INPUT_DISTANCE_BANDS",
+        datatype="GPString",
+        parameterType="Optional",
+        direction="Input",
+        enabled=False,
+    )
+    paramDistanceBands.filter.type = "ValueList"
+    paramDistanceBands.filter.list = ["CUMULATIVE", "RING"]
+    paramDistanceBands.value = "CUMULATIVE"
+
+    paramGroupWithoutDissolve = arcpy.Parameter(
+        displayName="Summarize Dissolve Groups Without Dissolving Buffers",
+        name="INPUT_GROUP_WITHOUT_DISSOLVE",
+        datatype="GPBoolean",
+        parameterType="Optional",
+        direction="Input",
+        enabled=False,
+    )
+    paramGroupWithoutDissolve.value = False
+
+    paramGroupShapes = arcpy.Parameter(
+        displayName="Group Output Shapes",
+        name="INPUT_GROUP_SHAPES",
+        datatype="GPString",
+        parameterType="Optional",
+        direction="Input",
+        enabled=False,
+    )
+    paramGroupShapes.filter.type = "ValueList"
+    paramGroupShapes.filter.list = ["LINES", "BUFFERS"]
+    paramGroupShapes.value = "LINES"
+
+    paramWorkers = arcpy.Parameter(
+        displayName="Parallel Workers",
+        name="PARALLEL_WORKERS",
+        datatype="GPLong",
+        parameterType="Optional",
+        direction="Input",
+        category="Performance",
+    )
+    paramWorkers.value = 1
+
+    paramPartitionField = arcpy.Parameter(
+        displayName="Partition Field (e.g. state or county FIPS of the lines)",
+        name="INPUT_PARTITION_FIELD",
+        datatype="Field",
+        parameterType="Optional",
+        direction="Input",
+        category="Performance",
+        enabled=False,
+    )
+    paramPartitionField.parameterDependencies = [paramLines.name]
+
+    paramPartitionTileSize = arcpy.Parameter(
+        displayName="Partition Tile Size (used without a partition field)",
+        name="INPUT_PARTITION_TILE_SIZE",
+        datatype="GPLinearUnit",
+        parameterType="Optional",
+        direction="Input",
+        category="Performance",
+        enabled=False,
+    )
+
+    paramPopulationField = arcpy.Parameter(
+        displayName="Population Field (for POP_MEAN)",
+        name="INPUT_POPULATION_FIELD",
+        datatype="Field",
+        parameterType="Optional",
+        direction="Input",
+    )
+    paramPopulationField.parameterDependencies = [paramCensusData.name]
+
+    paramRunReport = arcpy.Parameter(
+        displayName="Run Report (.json or .csv, appended to)",
+        name="OUTPUT_RUN_REPORT",
+        datatype="DEFile",
+        parameterType="Optional",
+        direction="Output",
+        category="Performance",
+    )
+    paramRunReport.filter.list = ["json", "csv"]
+
+    params = [
+        paramCensus,
+        paramCensusData,
+        paramLines,
+        paramBufferDistance,
+        paramBufferDissolve,
+        paramCensusFields,
+        paramSummaryBuffer,
+        paramCentroids,
+        paramCacheFolder,
+        paramStageCache,
+        paramStageCacheSize,
+        paramMembershipWeights,
+        paramDistanceBands,
+        paramGroupWithoutDissolve,
+        paramGroupShapes,
+        paramWorkers,
+        paramPartitionField,
+        paramPartitionTileSize,
+        paramPopulationField,
+        paramRunReport,
+    ]
+    return params
+
+
+def merge_connecting_trails_parameters() -> list:
+    """Define the parameters of Merge Connecting Trails."""
+    import arcpy
+
+    paramInput = arcpy.Parameter(
+        displayName="Census Polygons",
+        name="INPUT",
+        datatype="GPFeatureLayer",
+        parameterType="Required",
+        direction="Input",
+    )
+
+    paramOutput = arcpy.Parameter(
+        displayName="Census Data",
+        name="OUTPUT",
+        datatype="GPFeatureLayer",
+        multiValue=True,
+        parameterType="Required",
+        direction="Output",
+    )
+    paramOutput.parameterDependencies = [paramInput.name]
+
+    paramMethod = arcpy.Parameter(
+        displayName="Merge Method",
+        name="MERGE_METHOD",
+        datatype="GPString",
+        parameterType="Required",
+        direction="Input",
+    )
+    paramMethod.filter.type = "ValueList"
+    paramMethod.filter.list = ["CENTERLINE", "ENDPOINT_GRAPH"]
+    paramMethod.value = "CENTERLINE"
+
+    paramSnapTolerance = arcpy.Parameter(
+        displayName="Endpoint Snap Tolerance",
+        name="SNAP_TOLERANCE",
+        datatype="GPLinearUnit",
+        parameterType="Optional",
+        direction="Input",
+        enabled=False,
+    )
+    paramSnapTolerance.value = "2 Meters"
+
+    paramWorkers = arcpy.Parameter(
+        displayName="Parallel Workers",
+        name="PARALLEL_WORKERS",
+        datatype="GPLong",
+        parameterType="Optional",
+        direction="Input",
+        category="Performance",
+    )
+    paramWorkers.value = 1
+
+    paramIntermediateWorkspace = arcpy.Parameter(
+        displayName="Intermediate Workspace",
+        name="INTERMEDIATE_WORKSPACE",
+        datatype="GPString",
+        parameterType="Optional",
+        direction="Input",
+        category="Performance",
+    )
+    paramIntermediateWorkspace.filter.type = "ValueList"
+    paramIntermediateWorkspace.filter.list = ["AUTO", "MEMORY", "SCRATCH_GDB"]
+    paramIntermediateWorkspace.value = "AUTO"
+
+    paramAttributeRules = arcpy.Parameter(
+        displayName="Attribute Rules (defaults to joining text fields)",
+        name="ATTRIBUTE_RULES",
+        datatype="GPValueTable",
+        parameterType="Optional",
+        direction="Input",
+    )
+    paramAttributeRules.parameterDependencies = [paramInput.name]
+    paramAttributeRules.columns = [["Field", "Field"], ["GPString", "Rule"]]
+    paramAttributeRules.filters[1].type = "ValueList"
+    paramAttributeRules.filters[1].list = RULES
+
+    paramIncremental = arcpy.Parameter(
+        displayName="Only Update Changed Trails (Incremental)",
+        name="INCREMENTAL",
+        datatype="GPBoolean",
+        parameterType="Optional",
+        direction="Input",
+        enabled=False,
+    )
+    paramIncremental.value = False
+
+    paramTrailId = arcpy.Parameter(
+        displayName="Trail ID Field (defaults to the object ID)",
+        name="TRAIL_ID_FIELD",
+        datatype="Field",
+        parameterType="Optional",
+        direction="Input",
+        enabled=False,
+    )
+    paramTrailId.parameterDependencies = [paramInput.name]
+
+    paramRunReport = arcpy.Parameter(
+        displayName="Run Report (.json or .csv, appended to)",
+        name="OUTPUT_RUN_REPORT",
+        datatype="DEFile",
+        parameterType="Optional",
+        direction="Output",
+        category="Performance",
+    )
+    paramRunReport.filter.list = ["json", "csv"]
+
+    params = [
+        paramInput,
+        paramOutput,
+        paramMethod,
+        paramSnapTolerance,
+        paramWorkers,
+        paramIntermediateWorkspace,
+        paramAttributeRules,
+        paramIncremental,
+        paramTrailId,
+        paramRunReport,
+    ]
+    return params
+
+
+def extend_lines_parameters() -> list:
+    """Define the parameters of Extend Lines."""
+    import arcpy
+
+    paramPolylineLayer = arcpy.Parameter(
+        displayName="Polyline Layer (modified by this tool)",
+        name="INPUT_POLYLINE_LAYER",
+        datatype="GPFeatureLayer",
+        parameterType="Required",
+        direction="Input",
+    )
+
+    paramDistance = arcpy.Parameter(
+        displayName="Distance To Extend Line",
+        name="INPUT_LINE_EXTEND_DISTANCE",
+        datatype="GPLinearUnit",
+        parameterType="Required",
+        direction="Input",
+    )
+
+    paramBothDirections = arcpy.Parameter(
+        displayName="Extend in Both Directions",
+        name="INPUT_EXTEND_BOTH_DIRECTIONS",
+        datatype="GPBoolean",
+        parameterType="Required",
+        direction="Input",
+    )
+    paramBothDirections.value = False
+
+    paramStartDistance = arcpy.Parameter(
+        displayName="Distance To Extend Line Start",
+        name="INPUT_LINE_START_EXTEND_DISTANCE",
+        datatype="GPLinearUnit",
+        parameterType="Optional",
+        direction="Input",
+        enabled=False,
+    )
+
+    paramDistanceField = arcpy.Parameter(
+        displayName="Distance Field (same units as Distance To Extend Line)",
+        name="INPUT_LINE_EXTEND_DISTANCE_FIELD",
+        datatype="Field",
+        parameterType="Optional",
+        direction="Input",
+    )
+    paramDistanceField.parameterDependencies = [paramPolylineLayer.name]
+    paramDistanceField.filter.list = ["Short", "Long", "Float", "Double"]
+
+    paramBatchSize = arcpy.Parameter(
+        displayName="Features Per Batch (leave empty to process all at once)",
+        name="INPUT_BATCH_SIZE",
+        datatype="GPLong",
+        parameterType="Optional",
+        direction="Input",
+        category="Performance",
+    )
+
+    paramRunReport = arcpy.Parameter(
+        displayName="Run Report (.json or .csv, appended to)",
+        name="OUTPUT_RUN_REPORT",
+        datatype="DEFile",
+        parameterType="Optional",
+        direction="Output",
+        category="Performance",
+    )
+    paramRunReport.filter.list = ["json", "csv"]
+
+    params = [
+        paramPolylineLayer,
+        paramDistance,
+        paramBothDirections,
+        paramStartDistance,
+        paramDistanceField,
+        paramBatchSize,
+        paramRunReport,
+    ]
+    return params
+
+
+# the tools by the name of their class
+TOOLS: Dict[str, ToolInfo] = {
+    "SummarizeCensusAsBufferAlongLines": ToolInfo(
+        "Summarize Census As Buffer Along Lines",
+        "Creates centroids for census areas and summarizes chosen attributes to a buffer around the input feature class.",
+        summarize_census_parameters,
+    ),
+    "MergeConnectingTrails": ToolInfo(
+        "Merge Connecting Trails",
+        "Merges trails that are next to each other but not seen as a single multipart line. The output schema is generated from the input lines, so any line dataset is supported; by default, the Rails to Trails Conservancy's OpenTrails account fields are left out.",
+        merge_connecting_trails_parameters,
+    ),
+    "ExtendLines": ToolInfo(
+        "Extend Lines",
+        "Extends input lines by a specified distance. Distances can be positive or negative.",
+        extend_lines_parameters,
+    ),
+}
@@ -0,0 +1,147 @@
+"""Grouping of connected trails by their endpoints.
+
+Endpoints are snapped together with a grid (spatial hash) whose cells are as
+wide as the snapping tolerance, so only the points in the 3x3 block of cells
+around a point need to be compared. Features that share a snapped endpoint
+are joined with a disjoint-set (union-find) structure. Both steps are
+near-linear in the number of trails.
+"""
+
+from math import floor, hypot
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+class DisjointSet(object):
+    """Union-find over the integers `0..size - 1` with path compression and
+    union by size."""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+
+        # point every item on the path directly at the root
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+
+        return root
+
+    def union(self, a: int, b: int) -> int:
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a == root_b:
+            return root_a
+
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return root_a
+
+    def labels(self) -> List[int]:
+        """Number the sets `0..n - 1` in the order in which their first item
+        appears, so labels are stable for the same input order."""
+        label_of_root: Dict[int, int] = {}
+        labels = []
+        for item in range(len(self.parent)):
+            root = self.find(item)
+            if root not in label_of_root:
+                label_of_root[root] = len(label_of_root)
+            labels.append(label_of_root[root])
+        return labels
+
+
+def connected_groups(
+    endpoints: Iterable[Tuple[int, float, float]],
+    feature_count: int,
+    tolerance: float,
+) -> List[int]:
+    """Group features whose endpoints are within `tolerance` of each other.
+
+    `endpoints` yields `(feature_index, x, y)` for every endpoint of every
+    feature (a multipart feature may contribute the endpoints of each of its
+    parts). Returns the group label of each feature; features without
+    endpoints form groups of their own.
+    """
+    groups = DisjointSet(feature_count)
+
+    if tolerance <= 0:
+        # only exactly coincident endpoints are connected
+        owner_of_point: Dict[Tuple[float, float], int] = {}
+        for feature, x, y in endpoints:
+            owner = owner_of_point.setdefault((x, y), feature)
+            if owner != feature:
+                groups.union(owner, feature)
+        return groups.labels()
+
+    grid: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
+    for feature, x, y in endpoints:
+        column = floor(x / tolerance)
+        row = floor(y / tolerance)
+
+        for neighbor_column in (column - 1, column, column + 1):
+            for neighbor_row in (row - 1, row, row + 1):
+                for other, other_x, other_y in grid.get(
+                    (neighbor_column, neighbor_row), ()
+                ):
+                    if (
+                        other != feature
+                        and hypot(x - other_x, y - other_y) <= tolerance
+                    ):
+                        groups.union(other, feature)
+
+        grid.setdefault((column, row), []).append((feature, x, y))
+
+    return groups.labels()
+
+
+def features_near(
+    features: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    sources: Sequence[int],
+    feature_count: int,
+    tolerance: float,
+) -> np.ndarray:
+    """Find the features that may be connected to the `sources` features.
+
+    `features`, `x` and `y` are the endpoints as in `connected_groups`.
+    Returns a mask of the features with an endpoint in the 3x3 block of grid
+    cells around an endpoint of a source (which includes the sources). The
+    mask may include features that turn out not to be connected, but never
+    misses one that is.
+    """
+    near = np.zeros(feature_count, dtype=bool)
+    features = np.asarray(features, dtype=np.int64)
+    is_source = np.zeros(feature_count, dtype=bool)
+    is_source[np.asarray(sources, dtype=np.int64)] = True
+    source_points = is_source[features]
+    if not source_points.any():
+        return near
+
+    # exactly coincident endpoints share a cell of any size
+    size = tolerance if tolerance > 0 else 1.0
+    columns = np.floor(np.asarray(x) / size).astype(np.int64)
+    rows = np.floor(np.asarray(y) / size).astype(np.int64)
+
+    # cells are compared by a single integer; a collision only adds features
+    def cell_keys(columns: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        return (columns << 32) ^ (rows & 0xFFFFFFFF)
+
+    source_cells = np.unique(
+        np.concatenate(
+            [
+                cell_keys(columns[source_points] + dx, rows[source_points] + dy)
+                for dx in (-1, 0, 1)
+                for dy in (-1, 0, 1)
+            ]
+        )
+    )
+    near[features[np.isin(cell_keys(columns, rows), source_cells)]] = True
+    return near